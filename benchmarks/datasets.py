@@ -0,0 +1,61 @@
+"""
+Summary: This file contains the synthetic datasets the benchmarks run on.
+
+Every dataset is generated locally from data/schedule.csv: the season is copied once per unit of scale, each copy
+moved back one year, and the scores redrawn from a seeded generator, so the same scale and seed always give the
+same games. Datasets are produced as a Sports-Reference CSV export and as the matching schedule page HTML.
+"""
+#IMPORTS
+import html
+import os
+import numpy as np
+import pandas as pd
+
+SOURCE_SCHEDULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "schedule.csv")
+SCALES = (1, 10, 100)
+
+
+def generate_schedule_csv(scale: int, seed: int = 0, source_path: str = SOURCE_SCHEDULE_PATH) -> pd.DataFrame:
+    """_summary_
+    Generates a multi-season schedule export with scale seasons, the newest being the source season.
+    Args:
+        scale (int): Number of seasons, 1 is the source season alone.
+        seed (int, optional): Seed of the score generator. Defaults to 0.
+        source_path (str, optional): Sports-Reference CSV export to copy. Defaults to data/schedule.csv.
+
+    Returns:
+        pd.DataFrame: Schedule in the Sports-Reference CSV export layout.
+    """
+    source = pd.read_csv(source_path)
+    generator = np.random.default_rng(seed)
+    date_parts = source["Date"].str.replace(",", "", regex=False).str.split(" ", expand=True)
+    seasons = []
+    for years_back in range(scale):
+        season = source.copy()
+        season["Date"] = date_parts[0] + " " + date_parts[1] + " " + (date_parts[2].astype(int) - years_back).astype(str)
+        if years_back:
+            loser_points = generator.integers(0, 45, len(season))
+            season["Pts.1"] = loser_points
+            season["Pts"] = loser_points + generator.integers(1, 50, len(season))
+        seasons.append(season)
+    schedule = pd.concat(seasons, ignore_index=True)
+    schedule["Rk"] = np.arange(1, len(schedule) + 1)
+    return schedule
+
+
+def schedule_html(schedule: pd.DataFrame) -> str:
+    """_summary_
+    Renders a schedule export as a Sports-Reference schedule page with a table#schedule.
+    Args:
+        schedule (pd.DataFrame): Schedule in the Sports-Reference CSV export layout.
+
+    Returns:
+        str: The page.
+    """
+    rows = []
+    columns = ["Wk", "Date", "Time", "Day", "Winner", "Pts", "Unnamed: 7", "Loser", "Pts.1", "Notes"]
+    for rank, values in zip(schedule["Rk"], schedule[columns].itertuples(index=False)):
+        cells = "".join(f"<td>{'' if pd.isna(value) else html.escape(str(value))}</td>" for value in values)
+        rows.append(f"<tr><th>{rank}</th>{cells}</tr>")
+    header = "<tr><th>Rk</th><th>Wk</th><th>Date</th><th>Time</th><th>Day</th><th>Winner</th><th>Pts</th><th></th><th>Loser</th><th>Pts</th><th>Notes</th></tr>"
+    return f"<html><body><table id=\"schedule\"><thead>{header}</thead><tbody>{''.join(rows)}</tbody></table></body></html>"
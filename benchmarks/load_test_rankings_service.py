@@ -0,0 +1,171 @@
+"""
+Summary: This file contains the load test of the rankings service.
+
+The service is started as a subprocess on a free port, pinned to one core when the machine has more than one, and
+the load generator runs on the other cores. Each client is a keep-alive connection sending one request at a time,
+cycling through season rankings, name resolution, and health requests, so most rankings requests are cache hits as
+in normal use. The request rate, latency percentiles, and the service's cache statistics are printed at the end.
+On a single-core machine the load generator shares the core, so the reported rate is a lower bound.
+
+Usage:
+    python benchmarks/load_test_rankings_service.py                        # 5 seconds against db/schools.db
+    python benchmarks/load_test_rankings_service.py --connections 64 --duration 10 --min-rate 2000
+"""
+#IMPORTS
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.db import resolve_db_path
+from ranking_system import season_expression
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_PATH = os.path.join(REPO_ROOT, "rankings_service.py")
+DEFAULT_CONNECTIONS = 32
+DEFAULT_DURATION = 5.0
+# Seconds to wait for the service to print its address
+STARTUP_TIMEOUT = 30.0
+
+
+def default_paths(db_name: str) -> list:
+    """_summary_
+    Builds the request mix from the database: the rankings of the latest seasons under each policy, name
+    resolutions of a few scheduled teams, and a health check.
+    """
+    conn = sqlite3.connect(f"file:{resolve_db_path(db_name)}?mode=ro", uri=True)
+    try:
+        season_sql = season_expression(conn)
+        seasons = [row[0] for row in conn.execute(f"SELECT DISTINCT {season_sql} FROM schedule WHERE {season_sql} IS NOT NULL ORDER BY 1 DESC LIMIT 3")]
+        teams = [row[0] for row in conn.execute("SELECT DISTINCT Winner FROM schedule WHERE Winner IS NOT NULL LIMIT 5")]
+    finally:
+        conn.close()
+    paths = []
+    for season in seasons:
+        paths += [f"/rankings/{season}?limit=25", f"/rankings/{season}?policy=log&limit=25", f"/rankings/{season}"]
+    paths += [f"/resolve?name={team.replace(' ', '%20')}" for team in teams]
+    paths.append("/health")
+    return paths
+
+
+def start_service(db_name: str, core: int = None) -> tuple:
+    """_summary_
+    Starts the service on a free port and waits for it to listen.
+
+    Returns:
+        tuple: The service process and its base URL host and port.
+    """
+    process = subprocess.Popen([sys.executable, SERVICE_PATH, "--port", "0", "--db", db_name], stdout=subprocess.PIPE, text=True, cwd=REPO_ROOT)
+    if core is not None:
+        os.sched_setaffinity(process.pid, {core})
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if not line:
+            break
+        if line.startswith("Serving rankings"):
+            host, port = line.strip().rsplit("//", 1)[1].rsplit(":", 1)
+            return process, host, int(port)
+    process.kill()
+    raise RuntimeError("The rankings service did not start")
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, path: str) -> tuple:
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    status = int((await reader.readline()).split()[1])
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            content_length = int(line.split(b":", 1)[1])
+    return status, await reader.readexactly(content_length)
+
+
+async def _client(host: str, port: int, paths: list, offset: int, deadline: float, latencies: list, statuses: dict) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        index = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, paths[index % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            index += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, paths: list, connections: int = DEFAULT_CONNECTIONS, duration: float = DEFAULT_DURATION) -> dict:
+    """_summary_
+    Sends requests over the given number of keep-alive connections for the given number of seconds.
+
+    Returns:
+        dict: Requests sent, request rate, latency percentiles in milliseconds, status counts, and the service's cache statistics.
+    """
+    latencies = []
+    statuses = {}
+    # One untimed pass over every path, so the rankings are computed before the clock starts
+    reader, writer = await asyncio.open_connection(host, port)
+    for path in paths:
+        await _request(reader, writer, host, path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, paths, offset, start + duration, latencies, statuses) for offset in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    _, body = await _request(reader, writer, host, "/health")
+    writer.close()
+    latencies.sort()
+    percentile = lambda fraction: 1000 * latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "mean_ms": 1000 * statistics.fmean(latencies),
+        "statuses": statuses,
+        "cache": json.loads(body)["cache"],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the rankings service.")
+    parser.add_argument("--db", default="db/schools.db", help="database to serve")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds of load")
+    parser.add_argument("--min-rate", type=float, help="exit with status 1 below this many requests per second")
+    args = parser.parse_args(argv)
+
+    paths = default_paths(args.db)
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    service_core = cores[0] if len(cores) > 1 else None
+    process, host, port = start_service(args.db, service_core)
+    try:
+        if service_core is not None:
+            os.sched_setaffinity(0, set(cores[1:]))
+        results = asyncio.run(run_load(host, port, paths, args.connections, args.duration))
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"Service on {'core ' + str(service_core) if service_core is not None else 'the shared core'}, {args.connections} connections, {len(paths)} paths")
+    print(f"{results['requests']} requests in {results['seconds']:.1f} s: {results['requests_per_second']:.0f} requests/s")
+    print(f"Latency: p50 {results['p50_ms']:.2f} ms, p90 {results['p90_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms")
+    print(f"Statuses: {results['statuses']}, cache: {results['cache']}")
+    if args.min_rate is not None and results["requests_per_second"] < args.min_rate:
+        print(f"Below the minimum rate of {args.min_rate:.0f} requests/s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Summary: This file contains the benchmark suite for the ingest -> resolve -> rank pipeline.
+
+Each stage is timed on the synthetic datasets from benchmarks/datasets.py at every scale, against a scratch database
+holding a copy of the schools table. Names are resolved by a resolver bound to the scratch database that never
+learns aliases, and every scale checks that db/schools.db is byte for byte unchanged afterwards. Every benchmark is run several times after a warm-up run and the
+fastest and median times are reported. Results can be saved as the baseline and later runs compared against it,
+exiting with status 1 when a benchmark got slower than the allowed ratio.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # run and print
+    python benchmarks/run_benchmarks.py --save-baseline       # run and write benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare             # run and fail on regressions against the baseline
+"""
+#IMPORTS
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pandas as pd
+from benchmarks.datasets import SCALES, generate_schedule_csv, schedule_html
+from db.db import *
+from ranking_system import calculate_rankings_with_previous_year, calculate_running_rankings
+from schedule_parser import parse_schedule
+from school_naming_information import SchoolNameResolver, normalize_school_name, update_schedule_with_ID_information
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+REAL_DB_NAME = "db/schools.db"
+DEFAULT_REPEAT = 5
+# A benchmark regresses when its fastest run is this many times the baseline's
+DEFAULT_THRESHOLD = 1.5
+# Differences below this many milliseconds are timer noise and never count as regressions
+NOISE_FLOOR_MS = 1.0
+
+
+def time_call(function, repeat: int = DEFAULT_REPEAT, setup=None) -> dict:
+    """_summary_
+    Times a function after one untimed warm-up run, silencing anything it prints.
+    Args:
+        function (callable): Function to time, called without arguments.
+        repeat (int, optional): Number of timed runs. Defaults to DEFAULT_REPEAT.
+        setup (callable, optional): Untimed function called before every run, e.g. to empty a table. Defaults to None.
+
+    Returns:
+        dict: Fastest and median time in milliseconds.
+    """
+    timings = []
+    for run in range(repeat + 1):
+        if setup is not None:
+            setup()
+        with redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            function()
+            time_taken_ms = (time.perf_counter() - start_time) * 1000
+        if run:
+            timings.append(time_taken_ms)
+    return {"min_ms": round(min(timings), 3), "median_ms": round(statistics.median(timings), 3)}
+
+
+def _reset_schedule(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS schedule")
+    conn.commit()
+    migrate_schedule_table(conn)
+
+
+def database_fingerprint(db_name: str = REAL_DB_NAME) -> str:
+    """_summary_
+    Hashes a database file and its write-ahead log, to check that a benchmark did not write to it.
+    Args:
+        db_name (str, optional): Name or path of the database. Defaults to db/schools.db.
+
+    Returns:
+        str: SHA-256 of the files, or None if the database does not exist.
+    """
+    db_path = resolve_db_path(db_name)
+    if not os.path.exists(db_path):
+        return None
+    digest = hashlib.sha256()
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def copy_schools_table(conn: sqlite3.Connection, db_name: str = REAL_DB_NAME) -> int:
+    """_summary_
+    Copies the schools table of the real database into a scratch database, reading the real one read-only.
+    Learned aliases are not copied, so every benchmark run resolves names the same way.
+    Args:
+        conn (sqlite3.Connection): Connection to the scratch database.
+        db_name (str, optional): Name or path of the real database. Defaults to db/schools.db.
+
+    Returns:
+        int: Number of schools copied.
+    """
+    source = sqlite3.connect(f"file:{resolve_db_path(db_name)}?mode=ro", uri=True)
+    try:
+        schools = source.execute('SELECT "ID", "Canonical Name", "Aliases" FROM schools ORDER BY ROWID').fetchall()
+    finally:
+        source.close()
+    create_table(conn, ["ID", "Canonical Name", "Aliases"], "schools")
+    conn.executemany("INSERT INTO schools VALUES (?, ?, ?)", schools)
+    conn.commit()
+    return len(schools)
+
+
+def benchmark_scale(scale: int, repeat: int = DEFAULT_REPEAT, seed: int = 0) -> dict:
+    """_summary_
+    Runs every pipeline benchmark on the synthetic dataset of the given scale.
+    Args:
+        scale (int): Number of seasons in the dataset.
+        repeat (int, optional): Number of timed runs per benchmark. Defaults to DEFAULT_REPEAT.
+        seed (int, optional): Seed of the dataset's scores. Defaults to 0.
+
+    Returns:
+        dict: Dictionary mapping each benchmark name to its timings and the number of rows it processed.
+    """
+    real_db_fingerprint = database_fingerprint()
+    schedule = generate_schedule_csv(scale, seed)
+    page = schedule_html(schedule)
+    # The ingest paths strip the (rank) prefixes before resolving, so the lookups are timed on the stripped names
+    team_names = [normalize_school_name(name) for name in schedule["Winner"].tolist() + schedule["Loser"].tolist()]
+    dates = pd.to_datetime(schedule["Date"].str.replace(",", "", regex=False), format="%b %d %Y")
+    # Seasons start in August, so January bowl games belong to the previous year's season
+    last_season = int((dates.dt.year - (dates.dt.month < 8)).max())
+    seasons = list(range(last_season - scale + 1, last_season + 1))
+    number_of_games = len(schedule)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "schedule.csv")
+        schedule.to_csv(csv_path, index=False)
+        conn = sqlite3.connect(os.path.join(directory, "benchmark.db"))
+        try:
+            copy_schools_table(conn)
+            resolver = SchoolNameResolver(learn_aliases=False)
+            resolver.load(conn)
+
+            # Ingest
+            results["parse_schedule"] = {**time_call(lambda: list(parse_schedule(page)), repeat), "rows": number_of_games}
+            results["SchoolNameResolver.lookup"] = {**time_call(lambda: [resolver.lookup(name) for name in team_names], repeat), "rows": len(team_names)}
+            results["update_schedule_with_ID_information"] = {**time_call(lambda: update_schedule_with_ID_information(csv_path, conn, resolver), repeat, lambda: _reset_schedule(conn)), "rows": number_of_games}
+            if get_table_columns(conn, "school_aliases_learned"):
+                raise RuntimeError("The benchmark resolver learned aliases")
+
+            # The last ingest run left the full dataset in the schedule table
+            # Season is generated from Year and Month, so it is left out of the rows to insert
+            insert_columns = ', '.join([f'"{name}"' for name in SCHEDULE_COLUMN_TYPES])
+            games = query_db(conn, f"SELECT {insert_columns} FROM schedule", result_format="dataframe")
+            inserted = []
+
+            def empty_schedule():
+                # Committed, so the insert runs and commits its own chunks rather than joining an open transaction
+                conn.execute("DELETE FROM schedule")
+                conn.commit()
+            results["insert_data_into_table"] = {**time_call(lambda: inserted.append(insert_data_into_table(conn, games, "schedule", bulk=True)), repeat, empty_schedule), "rows": number_of_games}
+            if inserted[-1] != (number_of_games, 0):
+                raise RuntimeError(f"insert_data_into_table inserted and rejected {inserted[-1]}, expected {(number_of_games, 0)}")
+            results["query_db"] = {**time_call(lambda: query_db(conn, "SELECT * FROM schedule"), repeat), "rows": number_of_games}
+
+            # Rank
+            results["calculate_running_rankings"] = {**time_call(lambda: calculate_running_rankings(last_season, conn), repeat), "rows": number_of_games // scale}
+
+            def chain_seasons():
+                running_rankings = calculate_running_rankings(seasons[0], conn)
+                for season in seasons[1:]:
+                    running_rankings = calculate_rankings_with_previous_year(season, running_rankings, conn)
+            results["calculate_rankings_with_previous_year"] = {**time_call(chain_seasons, repeat), "rows": number_of_games}
+        finally:
+            conn.close()
+    if database_fingerprint() != real_db_fingerprint:
+        raise RuntimeError(f"The benchmark changed {REAL_DB_NAME}")
+    return results
+
+
+def run_benchmarks(scales=SCALES, repeat: int = DEFAULT_REPEAT, seed: int = 0) -> dict:
+    """_summary_
+    Runs the benchmarks at every scale.
+    Args:
+        scales (iterable, optional): Dataset scales to run. Defaults to (1, 10, 100).
+        repeat (int, optional): Number of timed runs per benchmark. Defaults to DEFAULT_REPEAT.
+        seed (int, optional): Seed of the datasets' scores. Defaults to 0.
+
+    Returns:
+        dict: The run's environment and a dictionary mapping "<benchmark>[<scale>x]" to its timings.
+    """
+    results = {}
+    for scale in scales:
+        for name, result in benchmark_scale(scale, repeat, seed).items():
+            results[f"{name}[{scale}x]"] = result
+    environment = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "repeat": repeat,
+        "seed": seed,
+    }
+    return {"environment": environment, "results": results}
+
+
+def compare_to_baseline(run: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """_summary_
+    Finds the benchmarks whose fastest run is more than threshold times the baseline's.
+    Args:
+        run (dict): Results of run_benchmarks.
+        baseline (dict): Saved results of an earlier run_benchmarks.
+        threshold (float, optional): Largest allowed ratio to the baseline. Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        list: List of (benchmark, baseline ms, current ms, ratio) tuples of the regressions.
+    """
+    regressions = []
+    for name, result in run["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+        before, after = baseline_result["min_ms"], result["min_ms"]
+        if after - before > NOISE_FLOOR_MS and after > before * threshold:
+            regressions.append((name, before, after, after / before))
+    return regressions
+
+
+def print_results(run: dict, baseline: dict = None) -> None:
+    """_summary_
+    Prints the results as a table, with the ratio to the baseline when one is given.
+    """
+    print(f"{'benchmark':<50}{'rows':>8}{'min ms':>12}{'median ms':>12}{'rows/s':>14}{'vs baseline':>13}")
+    for name, result in run["results"].items():
+        rows_per_second = result["rows"] / result["min_ms"] * 1000 if result["min_ms"] else float("inf")
+        ratio = ""
+        if baseline is not None and name in baseline["results"] and baseline["results"][name]["min_ms"]:
+            ratio = f"{result['min_ms'] / baseline['results'][name]['min_ms']:.2f}x"
+        print(f"{name:<50}{result['rows']:>8}{result['min_ms']:>12.2f}{result['median_ms']:>12.2f}{rows_per_second:>14,.0f}{ratio:>13}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ingest -> resolve -> rank pipeline on synthetic datasets.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="dataset scales in seasons (default: 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic scores")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to save or compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="exit with status 1 if a benchmark regressed against the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="largest allowed ratio to the baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    elif args.compare:
+        print(f"No baseline at {args.baseline}, run with --save-baseline first")
+        return 2
+
+    run = run_benchmarks(args.scales, args.repeat, args.seed)
+    print_results(run, baseline)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        print(f"Results written to {path}")
+
+    if args.compare:
+        regressions = compare_to_baseline(run, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,6 @@
-import requests
-from db.db import *
-import pandas as pd
+from http_cache import get_response_cache
 
-def download_college_names_file(url, filename="names.txt"):
+def download_college_names_file(url, filename="names.txt", use_cache=True):
     """
     Saves the college names file to the current directory.
 
@@ -11,7 +9,15 @@ def download_college_names_file(url, filename="names.txt"):
     Args:
         url: The URL of the college names file.
         filename: The name of the file to save the college names to. Defaults to "names.txt".
+        use_cache: Serve the file from the response cache, revalidating it with a conditional request. Defaults to True.
     """
-    response = requests.get(url)
+    if use_cache:
+        text = get_response_cache().fetch(url)
+        if text is None:
+            return
+    else:
+        import requests
+
+        text = requests.get(url).text
     with open(filename, "w") as f:
-        f.write(response.text)
+        f.write(text)
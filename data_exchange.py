@@ -0,0 +1,391 @@
+"""
+Summary: This file contains the columnar export and import of the schedule, schools, and ranking tables.
+
+Each table is written as a dataset directory partitioned by season (Season=2024/part-0.parquet, ...), so readers
+can memory-map it and read only the seasons and columns they need instead of re-parsing a CSV and re-inferring its
+types. Column types come from the SQLite declared types and the table's CREATE statements are stored in the file
+metadata, so an import recreates the table exactly. Parquet needs pyarrow.parquet, without it the datasets are
+written as Arrow IPC (Feather v2) files with the same layout. pyarrow is only imported when a dataset is written or read.
+
+Usage:
+    python data_exchange.py export                          # every table to data/exchange as Parquet
+    python data_exchange.py export --format feather --tables schedule
+    python data_exchange.py import --dir data/exchange --seasons 2023 2024
+"""
+#IMPORTS
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from db.db import *
+import instrumentation
+
+DEFAULT_EXCHANGE_DIR = os.path.join(REPO_ROOT, "data", "exchange")
+EXCHANGE_FORMATS = ("parquet", "feather")
+FILE_EXTENSIONS = {"parquet": ".parquet", "feather": ".feather"}
+# Column each table is partitioned by, None for tables written as a single file
+EXCHANGE_TABLES = {
+    "schedule": "Season",
+    "schools": None,
+    "rankings_history": "season",
+    "ranking_totals": "Season",
+}
+BATCH_SIZE = 50000
+TABLE_SQL_METADATA_KEY = b"sqlite.table_sql"
+INDEX_SQL_METADATA_KEY = b"sqlite.index_sql"
+HIVE_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is not installed")
+    return pyarrow
+
+
+def resolve_exchange_format(file_format: str = "parquet") -> str:
+    """_summary_
+    Gets the format datasets are written in: Parquet when pyarrow.parquet is available, otherwise Feather.
+    Args:
+        file_format (str, optional): "parquet" or "feather". Defaults to "parquet".
+
+    Returns:
+        str: "parquet" or "feather".
+    """
+    if file_format not in EXCHANGE_FORMATS:
+        raise ValueError(f"Unknown format {file_format!r}, expected one of {EXCHANGE_FORMATS}")
+    _require_pyarrow()
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            print("pyarrow was built without Parquet support, writing Arrow IPC (Feather) files instead")
+            return "feather"
+    return file_format
+
+
+def _dataset_format(file_format: str) -> str:
+    # pyarrow.dataset calls the Feather v2 file format "ipc"
+    return "ipc" if file_format == "feather" else file_format
+
+
+def arrow_type(declared_type: str):
+    """_summary_
+    Gets the Arrow type of a column from its SQLite declared type, following SQLite's type affinity rules.
+    Columns without a declared type are exported as strings.
+    """
+    pa = _require_pyarrow()
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return pa.int64()
+    if any(name in declared_type for name in ("CHAR", "CLOB", "TEXT")):
+        return pa.string()
+    if "BLOB" in declared_type:
+        return pa.binary()
+    if any(name in declared_type for name in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+def _table_info(conn: sqlite3.Connection, table_name: str) -> list:
+    # (name, declared type, generated) of every column, generated columns included
+    c = conn.cursor()
+    c.execute(f'PRAGMA table_xinfo("{table_name}")')
+    return [(column[1], column[2], column[6] in (2, 3)) for column in c.fetchall()]
+
+
+def _partitioning(table_name: str):
+    import pyarrow.dataset as ds
+
+    partition_column = EXCHANGE_TABLES.get(table_name)
+    if partition_column is None:
+        return None
+    pa = _require_pyarrow()
+    return ds.partitioning(pa.schema([(partition_column, pa.int64())]), flavor="hive")
+
+
+def _open_writer(path: str, schema, file_format: str):
+    pa = _require_pyarrow()
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+def _if_not_exists(sql: str) -> str:
+    return re.sub(r"^CREATE\s+(UNIQUE\s+)?(TABLE|INDEX)\s+(IF NOT EXISTS\s+)?", lambda match: f"CREATE {match.group(1) or ''}{match.group(2)} IF NOT EXISTS ", sql, flags=re.IGNORECASE)
+
+
+@instrumentation.timed()
+def export_table(conn: sqlite3.Connection, table_name: str, output_dir: str = DEFAULT_EXCHANGE_DIR, file_format: str = "parquet", batch_size: int = BATCH_SIZE) -> int:
+    """_summary_
+    Exports a table to output_dir/table_name, partitioned by season for the tables that have one. Rows are streamed
+    from the cursor in batches, so the table is never loaded at once. The schedule is migrated to the typed schema
+    first, so it has a Season column to partition by. The export is written to a temporary directory next to the
+    existing export of the table, which is only replaced once the new export is complete.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        table_name (str): Name of the table to export.
+        output_dir (str, optional): Directory to write the dataset under. Defaults to data/exchange.
+        file_format (str, optional): "parquet" or "feather". Defaults to "parquet".
+        batch_size (int, optional): Rows per record batch. Defaults to BATCH_SIZE.
+
+    Returns:
+        int: Number of rows exported, or None if the table does not exist or could not be exported.
+    """
+    file_format = resolve_exchange_format(file_format)
+    pa = _require_pyarrow()
+    if not _table_info(conn, table_name):
+        print(f"Table {table_name} does not exist")
+        return None
+    if table_name == "schedule" and not migrate_schedule_table(conn):
+        return None
+    columns = _table_info(conn, table_name)
+    schema_sql = conn.execute("SELECT type, sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL", (table_name,)).fetchall()
+    metadata = {
+        TABLE_SQL_METADATA_KEY: next(sql for sql_type, sql in schema_sql if sql_type == "table"),
+        INDEX_SQL_METADATA_KEY: json.dumps([sql for sql_type, sql in schema_sql if sql_type == "index"]),
+    }
+    schema = pa.schema([(name, arrow_type(declared_type)) for name, declared_type, _ in columns], metadata=metadata)
+    partition_column = EXCHANGE_TABLES.get(table_name)
+    # Like pyarrow's hive partitioning, the season is stored in the directory name and not in the files
+    file_schema = schema.remove(schema.get_field_index(partition_column)) if partition_column else schema
+    # Values in untyped columns can be of any type, casting them gives the string column every row
+    select_columns = ", ".join(f'CAST("{field.name}" AS TEXT)' if field.type == pa.string() else f'"{field.name}"' for field in file_schema)
+    if partition_column:
+        select_columns = f'"{partition_column}", {select_columns}'
+    order_by = f'"{partition_column}", ROWID' if partition_column else "ROWID"
+    extension = FILE_EXTENSIONS[file_format]
+    table_dir = os.path.join(output_dir, table_name)
+    exported = 0
+    writer = None
+    staging_dir = None
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        # Written next to the existing export, so a failed export leaves it in place and the swap is a rename
+        staging_dir = tempfile.mkdtemp(prefix=f".{table_name}-", dir=output_dir)
+        # Rows are ordered by season, so each season's file is written from start to end before the next is opened
+        cursor = conn.execute(f"SELECT {select_columns} FROM {table_name} ORDER BY {order_by}")
+        season = object()
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            groups = groupby(rows, key=itemgetter(0)) if partition_column else [(None, rows)]
+            for group_season, group in groups:
+                group = [row[1:] for row in group] if partition_column else group
+                if writer is None or group_season != season:
+                    if writer is not None:
+                        writer.close()
+                    season = group_season
+                    season_dir = os.path.join(staging_dir, f"{partition_column}={HIVE_NULL_PARTITION if season is None else season}") if partition_column else staging_dir
+                    os.makedirs(season_dir, exist_ok=True)
+                    writer = _open_writer(os.path.join(season_dir, "part-0" + extension), file_schema, file_format)
+                writer.write_batch(pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(zip(*group), file_schema)], schema=file_schema))
+                exported += len(group)
+        if writer is None:
+            # An empty table still gets a file, so its schema and CREATE statements can be imported
+            writer = _open_writer(os.path.join(staging_dir, "part-0" + extension), file_schema, file_format)
+        writer.close()
+        writer = None
+        # os.replace cannot overwrite a non-empty directory, so the old export is moved aside first. Seasons deleted
+        # from the table do not survive from it.
+        previous_dir = None
+        if os.path.isdir(table_dir):
+            previous_dir = tempfile.mkdtemp(prefix=f".{table_name}-previous-", dir=output_dir)
+            os.replace(table_dir, os.path.join(previous_dir, table_name))
+        try:
+            os.replace(staging_dir, table_dir)
+        except OSError:
+            if previous_dir is not None:
+                os.replace(os.path.join(previous_dir, table_name), table_dir)
+                os.rmdir(previous_dir)
+            raise
+        staging_dir = None
+        if previous_dir is not None:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+    except Exception as e:
+        if writer is not None:
+            writer.close()
+        if staging_dir is not None:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        print(f"Error exporting {table_name}: {e}")
+        return None
+    instrumentation.log("exchange.export", table=table_name, format=file_format, rows=exported)
+    return exported
+
+
+def export_tables(conn: sqlite3.Connection, output_dir: str = DEFAULT_EXCHANGE_DIR, file_format: str = "parquet", tables: list = None) -> dict:
+    """_summary_
+    Exports the schedule, schools, and ranking tables that exist in the database.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        output_dir (str, optional): Directory to write the datasets under. Defaults to data/exchange.
+        file_format (str, optional): "parquet" or "feather". Defaults to "parquet".
+        tables (list, optional): Tables to export. Defaults to every table of EXCHANGE_TABLES in the database.
+
+    Returns:
+        dict: Dictionary mapping each table to the number of rows exported, None if it failed.
+    """
+    if tables is None:
+        tables = [table_name for table_name in EXCHANGE_TABLES if get_table_columns(conn, table_name)]
+    return {table_name: export_table(conn, table_name, output_dir, file_format) for table_name in tables}
+
+
+def open_exchange_dataset(table_name: str, input_dir: str = DEFAULT_EXCHANGE_DIR):
+    """_summary_
+    Opens an exported table as a memory-mapped pyarrow dataset, in the format it was written in.
+    Args:
+        table_name (str): Name of the exported table.
+        input_dir (str, optional): Directory the datasets were written under. Defaults to data/exchange.
+
+    Returns:
+        pyarrow.dataset.Dataset: The dataset, or None if the table was not exported there.
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    table_dir = os.path.abspath(os.path.join(input_dir, table_name))
+    file_formats = {file_format for file_format, extension in FILE_EXTENSIONS.items()
+                    for _, _, files in os.walk(table_dir) for file in files if file.endswith(extension)}
+    if not file_formats:
+        print(f"No export of {table_name} in {input_dir}")
+        return None
+    return ds.dataset(table_dir, format=_dataset_format(file_formats.pop()), partitioning=_partitioning(table_name),
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def _season_filter(table_name: str, seasons):
+    import pyarrow.dataset as ds
+
+    partition_column = EXCHANGE_TABLES.get(table_name)
+    if seasons is None or partition_column is None:
+        return None
+    return ds.field(partition_column).isin(list(seasons))
+
+
+def read_exchange_table(table_name: str, input_dir: str = DEFAULT_EXCHANGE_DIR, seasons: list = None, columns: list = None):
+    """_summary_
+    Reads an exported table. Only the files of the given seasons and the given columns are read.
+    Args:
+        table_name (str): Name of the exported table.
+        input_dir (str, optional): Directory the datasets were written under. Defaults to data/exchange.
+        seasons (list, optional): Seasons to read, ignored for tables without seasons. Defaults to every season.
+        columns (list, optional): Columns to read. Defaults to every column.
+
+    Returns:
+        pyarrow.Table: The rows read, or None if the table was not exported there.
+    """
+    dataset = open_exchange_dataset(table_name, input_dir)
+    if dataset is None:
+        return None
+    return dataset.to_table(columns=columns, filter=_season_filter(table_name, seasons))
+
+
+@instrumentation.timed()
+def import_table(conn: sqlite3.Connection, table_name: str, input_dir: str = DEFAULT_EXCHANGE_DIR, seasons: list = None, batch_size: int = BATCH_SIZE) -> int:
+    """_summary_
+    Imports an exported table, creating the table and its indexes from the stored CREATE statements if it does not
+    exist. Each season in the export replaces that season in the table (the whole table for tables without seasons),
+    so importing the same export twice changes nothing. Runs in one transaction.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        table_name (str): Name of the table to import.
+        input_dir (str, optional): Directory the datasets were written under. Defaults to data/exchange.
+        seasons (list, optional): Seasons to import, ignored for tables without seasons. Defaults to every season.
+        batch_size (int, optional): Rows per record batch. Defaults to BATCH_SIZE.
+
+    Returns:
+        int: Number of rows imported, or None if the import failed.
+    """
+    dataset = open_exchange_dataset(table_name, input_dir)
+    if dataset is None:
+        return None
+    metadata = dataset.schema.metadata or {}
+    partition_column = EXCHANGE_TABLES.get(table_name)
+    imported = 0
+    try:
+        if not _table_info(conn, table_name):
+            conn.execute(_if_not_exists(metadata[TABLE_SQL_METADATA_KEY].decode()))
+            for index_sql in json.loads(metadata.get(INDEX_SQL_METADATA_KEY, b"[]")):
+                conn.execute(_if_not_exists(index_sql))
+        # Generated columns such as the schedule's Season are recomputed by SQLite
+        insert_columns = [name for name, _, generated in _table_info(conn, table_name) if not generated and name in dataset.schema.names]
+        quoted_columns = ', '.join([f'"{name}"' for name in insert_columns])
+        statement = f"INSERT INTO {table_name} ({quoted_columns}) VALUES ({', '.join(['?'] * len(insert_columns))})"
+        read_columns = insert_columns + ([partition_column] if partition_column and partition_column not in insert_columns else [])
+
+        c = conn.cursor()
+        if partition_column is None:
+            c.execute(f"DELETE FROM {table_name}")
+        replaced_seasons = set()
+        for batch in dataset.to_batches(columns=read_columns, filter=_season_filter(table_name, seasons), batch_size=batch_size):
+            if partition_column is not None:
+                for season in set(batch.column(partition_column).to_pylist()) - replaced_seasons:
+                    c.execute(f'DELETE FROM {table_name} WHERE "{partition_column}" IS ?', (season,))
+                    replaced_seasons.add(season)
+            rows = list(zip(*(batch.column(name).to_pylist() for name in insert_columns)))
+            c.executemany(statement, rows)
+            imported += len(rows)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error importing {table_name}: {e}")
+        return None
+    instrumentation.count(instrumentation.ROWS_INSERTED, imported)
+    instrumentation.log("exchange.import", table=table_name, rows=imported)
+    return imported
+
+
+def import_tables(conn: sqlite3.Connection, input_dir: str = DEFAULT_EXCHANGE_DIR, tables: list = None, seasons: list = None) -> dict:
+    """_summary_
+    Imports every exported table found in input_dir.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        input_dir (str, optional): Directory the datasets were written under. Defaults to data/exchange.
+        tables (list, optional): Tables to import. Defaults to every table of EXCHANGE_TABLES exported there.
+        seasons (list, optional): Seasons to import. Defaults to every season.
+
+    Returns:
+        dict: Dictionary mapping each table to the number of rows imported, None if it failed.
+    """
+    if tables is None:
+        tables = [table_name for table_name in EXCHANGE_TABLES if os.path.isdir(os.path.join(input_dir, table_name))]
+    return {table_name: import_table(conn, table_name, input_dir, seasons) for table_name in tables}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export the schedule, schools, and ranking tables to partitioned Parquet or Feather, or import them back.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--db", default="db/schools.db", help="database to export from or import into")
+    parser.add_argument("--dir", default=DEFAULT_EXCHANGE_DIR, help="directory the datasets are written under (default: data/exchange)")
+    parser.add_argument("--format", choices=EXCHANGE_FORMATS, default="parquet", help="export file format")
+    parser.add_argument("--tables", nargs="+", help="tables to export or import (default: all)")
+    parser.add_argument("--seasons", type=int, nargs="+", help="seasons to import (default: all)")
+    args = parser.parse_args(argv)
+
+    conn = connect_to_db(args.db)
+    if conn is None:
+        return 1
+    try:
+        if args.command == "export":
+            results = export_tables(conn, args.dir, args.format, args.tables)
+        else:
+            results = import_tables(conn, args.dir, args.tables, args.seasons)
+    finally:
+        close_connection(conn)
+    for table_name, rows in results.items():
+        print(f"{table_name}: {'failed' if rows is None else f'{rows} rows'}")
+    return 1 if None in results.values() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
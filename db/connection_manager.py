@@ -0,0 +1,143 @@
+"""
+Summary: This file contains the shared SQLite connection manager.
+
+Each database gets one manager and each thread gets its own long-lived connection from it, so scrapers running on a
+thread pool never share a connection and no code path reconnects per lookup. Connections are opened in WAL mode so
+ranking reads keep running while the ingest writer inserts, with synchronous, cache, and memory-map settings tuned
+for this workload and a large prepared-statement cache so repeated queries are compiled once per connection.
+"""
+#IMPORTS
+import sqlite3
+import threading
+from contextlib import contextmanager
+import instrumentation
+from db.db import resolve_db_path
+
+DEFAULT_DB_NAME = "db/schools.db"
+DEFAULT_PRAGMAS = {
+    # Readers see the last committed snapshot while a writer appends to the log, instead of waiting for it
+    "journal_mode": "WAL",
+    # Safe with WAL: a power loss can lose the last transactions but cannot corrupt the database
+    "synchronous": "NORMAL",
+    # Negative sizes are in KiB, so 64 MiB of page cache per connection
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+# Compiled statements kept per connection, enough for every query the modules run
+CACHED_STATEMENTS = 256
+# Seconds a writer waits for another writer's lock before failing
+BUSY_TIMEOUT = 30.0
+
+
+class ConnectionManager:
+    """_summary_
+    Hands out one connection per thread for a database and keeps them open until closed.
+    Args:
+        db_name (str, optional): Database path, relative to the repository root. Defaults to "db/schools.db".
+        pragmas (dict, optional): PRAGMA settings applied to every new connection. Defaults to DEFAULT_PRAGMAS.
+        cached_statements (int, optional): Size of each connection's prepared-statement cache. Defaults to CACHED_STATEMENTS.
+    """
+
+    def __init__(self, db_name: str = DEFAULT_DB_NAME, pragmas: dict = None, cached_statements: int = CACHED_STATEMENTS):
+        self.db_path = resolve_db_path(db_name)
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread is off only so close_all can close every thread's connection from one thread
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, cached_statements=self.cached_statements, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        instrumentation.trace_connection(conn)
+        return conn
+
+    def get_connection(self) -> sqlite3.Connection:
+        """_summary_
+        Gets the calling thread's connection, opening and configuring it on first use.
+
+        Returns:
+            sqlite3.Connection: sqlite3 connection object for the database, or None if it could not be opened.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = self._open()
+            except sqlite3.Error as e:
+                print(e)
+                return None
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """_summary_
+        Context manager yielding the calling thread's connection. The connection stays open afterwards.
+        """
+        yield self.get_connection()
+
+    @contextmanager
+    def transaction(self):
+        """_summary_
+        Context manager yielding the calling thread's connection inside a transaction, committed when the block
+        finishes and rolled back if it raises.
+        """
+        conn = self.get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self) -> None:
+        """_summary_
+        Closes the calling thread's connection. The next get_connection opens a new one.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.remove(conn)
+            conn.close()
+
+    def close_all(self) -> None:
+        """_summary_
+        Closes the connections of every thread. Only call this once the threads using them are done.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_CONNECTION_MANAGERS = {}
+_CONNECTION_MANAGERS_LOCK = threading.Lock()
+
+
+def get_connection_manager(db_name: str = DEFAULT_DB_NAME) -> ConnectionManager:
+    """_summary_
+    Gets the shared manager of the given database, creating it on first use.
+    Args:
+        db_name (str, optional): Database path, relative to the repository root. Defaults to "db/schools.db".
+    """
+    db_path = resolve_db_path(db_name)
+    with _CONNECTION_MANAGERS_LOCK:
+        if db_path not in _CONNECTION_MANAGERS:
+            _CONNECTION_MANAGERS[db_path] = ConnectionManager(db_path)
+        return _CONNECTION_MANAGERS[db_path]
+
+
+def get_connection(db_name: str = DEFAULT_DB_NAME) -> sqlite3.Connection:
+    """_summary_
+    Gets the calling thread's shared connection to the given database.
+    Args:
+        db_name (str, optional): Database path, relative to the repository root. Defaults to "db/schools.db".
+    """
+    return get_connection_manager(db_name).get_connection()
@@ -8,19 +8,41 @@ Date-Latest-Update: 2024-10-10
 #IMPORTS
 import sqlite3
 import os
-import pandas as pd
+from contextlib import contextmanager
+from itertools import islice
+import numpy as np
+import instrumentation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def resolve_db_path(db_name: str) -> str:
+    """_summary_
+    Resolves a database path. Relative paths are taken from the repository root, so "db/schools.db" (or
+    "db\\schools.db") opens the same file whatever the working directory is. ":memory:" and absolute paths are kept.
+    Args:
+        db_name (str): Name or path of the database.
+
+    Returns:
+        str: Absolute path of the database, or ":memory:".
+    """
+    if db_name == ":memory:" or os.path.isabs(db_name):
+        return db_name
+    return os.path.normpath(os.path.join(REPO_ROOT, *db_name.replace("\\", "/").split("/")))
+
 
 def connect_to_db(db_name: str) -> sqlite3.Connection:
     """_summary_
     Connects to the sqlite database with the given name.
     Args:
-        db_name (str): Name of the database to connect to.
+        db_name (str): Name of the database to connect to, relative to the repository root.
 
     Returns:
         sqlite3.Connection: sqlite3 connection object for the database.
     """
     try:
-        conn = sqlite3.connect(f"{os.getcwd()}/{db_name}")
+        conn = sqlite3.connect(resolve_db_path(db_name))
+        instrumentation.trace_connection(conn)
         return conn
     except sqlite3.Error as e:
         print(e)
@@ -43,14 +65,425 @@ def create_table(conn: sqlite3.Connection, column_names: list, table_name: str)
     except sqlite3.Error as e:
         print(e)
         
-def insert_data_into_table(conn: sqlite3.Connection, data_dic: dict, table_name: str) -> None:
+SCHEDULE_COLUMN_TYPES = {
+    "Winner": "TEXT",
+    "Loser": "TEXT",
+    "Winner Points": "INTEGER",
+    "Loser Points": "INTEGER",
+    "Location": "TEXT",
+    "Date": "TEXT",
+    "Time": "TEXT",
+    "Day": "TEXT",
+    "Week": "INTEGER",
+    "Year": "INTEGER",
+    "Month": "INTEGER",
+    "Winner ID": "TEXT",
+    "Loser ID": "TEXT",
+}
+# A season runs from August through July, so January bowl games belong to the previous year's season
+SCHEDULE_SEASON_EXPRESSION = 'CASE WHEN "Month" >= 8 THEN "Year" ELSE "Year" - 1 END'
+SCHEDULE_INDEXES = {
+    "schedule_season_week_idx": ["Season", "Week"],
+    "schedule_winner_id_idx": ["Winner ID"],
+    "schedule_loser_id_idx": ["Loser ID"],
+}
+
+
+def get_table_columns(conn: sqlite3.Connection, table_name: str) -> list:
+    """_summary_
+    Gets the column names of the given table, including generated columns.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        table_name (str): Name of the table to get the columns of.
+
+    Returns:
+        list: Column names of the table, empty if the table does not exist.
+    """
+    try:
+        c = conn.cursor()
+        c.execute(f'PRAGMA table_xinfo("{table_name}")')
+        return [column[1] for column in c.fetchall()]
+    except sqlite3.Error as e:
+        print(e)
+        return []
+
+
+def create_schedule_table(conn: sqlite3.Connection, table_name: str = "schedule") -> None:
+    """_summary_
+    Creates the schedule table with typed columns, a generated Season column, and the season and team ID indexes.
+    Does nothing if the table already exists.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        table_name (str, optional): Name of the table to create. Defaults to "schedule".
+    """
+    columns = [f'"{name}" {column_type}' for name, column_type in SCHEDULE_COLUMN_TYPES.items()]
+    columns.append(f'"Season" INTEGER GENERATED ALWAYS AS ({SCHEDULE_SEASON_EXPRESSION}) STORED')
+    try:
+        c = conn.cursor()
+        c.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)})")
+        create_schedule_indexes(conn, table_name)
+    except sqlite3.Error as e:
+        print(e)
+
+
+def create_schedule_indexes(conn: sqlite3.Connection, table_name: str = "schedule") -> None:
+    """_summary_
+    Creates the Season/Week and Winner ID/Loser ID indexes on the schedule table if they do not exist.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        table_name (str, optional): Name of the schedule table. Defaults to "schedule".
+    """
+    try:
+        c = conn.cursor()
+        for index_name, index_columns in SCHEDULE_INDEXES.items():
+            columns = ', '.join([f'"{name}"' for name in index_columns])
+            c.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+    except sqlite3.Error as e:
+        print(e)
+
+
+@contextmanager
+def savepoint(conn: sqlite3.Connection, name: str):
+    """_summary_
+    Runs a block of statements as a unit inside a SAVEPOINT and yields a cursor. If the block raises, only its own
+    changes are rolled back. When the connection had no transaction open, leaving the block commits the changes;
+    inside a caller's transaction they become part of it and committing is left to the caller.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        name (str): Name of the savepoint.
+    """
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
+
+
+def migrate_schedule_table(conn: sqlite3.Connection) -> bool:
+    """_summary_
+    Migrates the schedule table to the typed schema. Points, week, year, and month are cast to INTEGER, the
+    Season column is derived from Year and Month, and the indexes are created. The table is created if it does
+    not exist. Safe to call repeatedly; a table that already has the Season column is left as is. Runs in a
+    savepoint, so a caller's uncommitted changes are neither committed nor lost if the migration fails.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+    Returns:
+        bool: True if the table is on the typed schema after the call, False if the migration failed.
+    """
+    existing_columns = get_table_columns(conn, "schedule")
+    if not existing_columns or "Season" in existing_columns:
+        try:
+            with savepoint(conn, "schedule_migration"):
+                if existing_columns:
+                    create_schedule_indexes(conn)
+                else:
+                    create_schedule_table(conn)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error migrating schedule table: {e}")
+            return False
+
+    select_list = []
+    for name, column_type in SCHEDULE_COLUMN_TYPES.items():
+        if name not in existing_columns:
+            select_list.append("NULL")
+        elif column_type == "INTEGER":
+            select_list.append(f"CAST(NULLIF(TRIM(\"{name}\"), '') AS INTEGER)")
+        else:
+            select_list.append(f'"{name}"')
+    columns = ', '.join([f'"{name}"' for name in SCHEDULE_COLUMN_TYPES])
+
+    try:
+        with savepoint(conn, "schedule_migration") as c:
+            c.execute("DROP TABLE IF EXISTS schedule_migration")
+            for index_name in SCHEDULE_INDEXES:
+                c.execute(f"DROP INDEX IF EXISTS {index_name}")
+            # Indexes keep their names when the table they are on is renamed
+            create_schedule_table(conn, "schedule_migration")
+            c.execute(f"INSERT INTO schedule_migration ({columns}) SELECT {', '.join(select_list)} FROM schedule ORDER BY ROWID")
+            c.execute("DROP TABLE schedule")
+            c.execute("ALTER TABLE schedule_migration RENAME TO schedule")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error migrating schedule table: {e}")
+        return False
+
+
+# Triggers that bump the schedule version on every change to the schedule table
+SCHEDULE_VERSION_TRIGGERS = {
+    "schedule_version_insert": "INSERT",
+    "schedule_version_update": "UPDATE",
+    "schedule_version_delete": "DELETE",
+}
+
+
+def ensure_schedule_version_tracking(conn: sqlite3.Connection) -> bool:
+    """_summary_
+    Creates the schedule_version table and the triggers that bump it whenever the schedule table changes.
+    Triggers are dropped with their table, so they are recreated after migrate_schedule_table rebuilds the
+    schedule; changes made while they were missing cannot be known, so the version is bumped when they are created.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+    Returns:
+        bool: True if the schedule is tracked after the call, False if there is no schedule table or it failed.
+    """
+    if not get_table_columns(conn, "schedule"):
+        return False
+    try:
+        with savepoint(conn, "schedule_version_tracking") as c:
+            c.execute("CREATE TABLE IF NOT EXISTS schedule_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+            c.execute("INSERT OR IGNORE INTO schedule_version (id, version) VALUES (0, 0)")
+            c.execute(f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'schedule' AND name IN ({', '.join(['?'] * len(SCHEDULE_VERSION_TRIGGERS))})", tuple(SCHEDULE_VERSION_TRIGGERS))
+            existing_triggers = {row[0] for row in c.fetchall()}
+            missing_triggers = [name for name in SCHEDULE_VERSION_TRIGGERS if name not in existing_triggers]
+            for trigger_name in missing_triggers:
+                c.execute(f"CREATE TRIGGER {trigger_name} AFTER {SCHEDULE_VERSION_TRIGGERS[trigger_name]} ON schedule BEGIN UPDATE schedule_version SET version = version + 1 WHERE id = 0; END")
+            if missing_triggers:
+                c.execute("UPDATE schedule_version SET version = version + 1 WHERE id = 0")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error tracking schedule version: {e}")
+        return False
+
+
+def get_schedule_version(conn: sqlite3.Connection) -> int:
+    """_summary_
+    Gets the schedule version, a counter that changes whenever a row of the schedule table is inserted, updated, or deleted.
+    Starts tracking the schedule if it is not tracked yet.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+    Returns:
+        int: The schedule version, or None if the schedule is not tracked.
+    """
+    if not ensure_schedule_version_tracking(conn):
+        return None
+    c = conn.cursor()
+    c.execute("SELECT version FROM schedule_version WHERE id = 0")
+    return c.fetchone()[0]
+
+
+SCHEDULE_GAME_KEY_INDEX = "schedule_game_key_idx"
+
+
+def schedule_game_key(table_alias: str = None) -> list:
+    """_summary_
+    Gets the SQL expressions of a game's natural key: its calendar date and the two teams, by school ID or by name
+    when the ID is missing. Year/Month/Day are used rather than the Date text, which has been scraped both with and
+    without a comma.
+    Args:
+        table_alias (str, optional): Alias to qualify the columns with. Defaults to None.
+
+    Returns:
+        list: The key expressions.
+    """
+    prefix = f"{table_alias}." if table_alias else ""
+    return [f'{prefix}"Year"', f'{prefix}"Month"', f'{prefix}"Day"', f'COALESCE({prefix}"Winner ID", {prefix}"Winner")', f'COALESCE({prefix}"Loser ID", {prefix}"Loser")']
+
+
+def same_date_and_teams(stored_alias: str, incoming_alias: str) -> str:
     """_summary_
-    Inserts the given DataFrame into the given table in the database using the given connection.
+    Gets the SQL condition matching two schedule rows played on the same date by the same teams, by name. Used to
+    find a stored game whose key changed because a team's ID was resolved after it was first stored.
+    Args:
+        stored_alias (str): Alias of the first table.
+        incoming_alias (str): Alias of the second table.
+
+    Returns:
+        str: The condition.
+    """
+    return ' AND '.join([f'{stored_alias}."{name}" = {incoming_alias}."{name}"' for name in ("Year", "Month", "Day", "Winner", "Loser")])
+
+
+def ensure_schedule_game_key(conn: sqlite3.Connection) -> bool:
+    """_summary_
+    Creates the unique index on the game key if it does not exist. Rows are never deleted here; if the table
+    already holds duplicate games the index cannot be created, and deduplicate_schedule has to be run first.
     Args:
         conn (sqlite3.Connection): sqlite3 connection object for the database.
-        df (pd.DataFrame): DataFrame to insert into the table.
+
+    Returns:
+        bool: True if the index exists after the call, False otherwise.
+    """
+    key = ', '.join(schedule_game_key())
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = '{SCHEDULE_GAME_KEY_INDEX}'")
+        if c.fetchone() is not None:
+            return True
+        with savepoint(conn, "schedule_game_key") as c:
+            c.execute(f"CREATE UNIQUE INDEX {SCHEDULE_GAME_KEY_INDEX} ON schedule ({key})")
+        return True
+    except sqlite3.IntegrityError:
+        print("The schedule table has duplicate games, run deduplicate_schedule(conn) to remove them")
+        return False
+    except sqlite3.Error as e:
+        print(f"Error creating the schedule game key: {e}")
+        return False
+
+
+def deduplicate_schedule(conn: sqlite3.Connection) -> int:
+    """_summary_
+    Migration that removes duplicate games from the schedule table and creates the unique game key index. Games
+    with the same key keep their most recently inserted copy. Games stored twice because a team's ID was resolved
+    after the first copy (same date and team names, different key) keep the copy with the most resolved IDs, then
+    the newest. Runs in a savepoint like migrate_schedule_table.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+    Returns:
+        int: Number of duplicate rows removed, or None if it failed.
+    """
+    key = ', '.join(schedule_game_key())
+    try:
+        with savepoint(conn, "schedule_deduplication") as c:
+            c.execute(f"DROP INDEX IF EXISTS {SCHEDULE_GAME_KEY_INDEX}")
+            c.execute(f"DELETE FROM schedule WHERE ROWID NOT IN (SELECT MAX(ROWID) FROM schedule GROUP BY {key})")
+            removed = c.rowcount
+            c.execute(
+                'DELETE FROM schedule WHERE ROWID IN (SELECT copy_rowid FROM (SELECT ROWID AS copy_rowid, ROW_NUMBER() OVER ('
+                'PARTITION BY "Year", "Month", "Day", "Winner", "Loser" ORDER BY ("Winner ID" IS NOT NULL) + ("Loser ID" IS NOT NULL) DESC, ROWID DESC'
+                ') AS copy FROM schedule WHERE "Winner" IS NOT NULL AND "Loser" IS NOT NULL) WHERE copy > 1)'
+            )
+            removed += c.rowcount
+            c.execute(f"CREATE UNIQUE INDEX {SCHEDULE_GAME_KEY_INDEX} ON schedule ({key})")
+        print(f"Removed {removed} duplicate games from schedule")
+        return removed
+    except sqlite3.Error as e:
+        print(f"Error deduplicating the schedule: {e}")
+        return None
+
+
+SCHEDULE_DATE_INDEX = "schedule_date_idx"
+# Day is stored as TEXT, so it is cast for the days to sort 9 before 10
+SCHEDULE_DATE_KEY = ['"Year"', '"Month"', 'CAST("Day" AS INTEGER)']
+
+
+def ensure_schedule_date_index(conn: sqlite3.Connection) -> bool:
+    """_summary_
+    Creates the index on the game date, ending with the implicit ROWID, so scans ordered by SCHEDULE_DATE_KEY and
+    ROWID stream from the index without a sort.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+    Returns:
+        bool: True if the index exists after the call, False if it could not be created.
+    """
+    try:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {SCHEDULE_DATE_INDEX} ON schedule ({', '.join(SCHEDULE_DATE_KEY)})")
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Error creating the schedule date index: {e}")
+        return False
+
+
+@instrumentation.timed()
+def upsert_schedule(conn: sqlite3.Connection, data) -> tuple:
+    """_summary_
+    Idempotently stores scraped games in the schedule table. The rows are staged in a temporary table with the
+    schedule's column types, compared to the stored games by game key, and only new or changed games are written
+    with INSERT ... ON CONFLICT DO UPDATE, all in one savepoint. Running it again with the same rows changes nothing.
+    A game whose key changed because a team's ID was resolved (or lost) since it was stored is matched by date and
+    team names instead, so it is updated rather than stored twice. The game key index must exist or be creatable;
+    a table with duplicate games has to be cleaned with deduplicate_schedule first.
+    Inside a caller's open transaction the games are left uncommitted, and a failure discards only this call's changes.
+    RankingAccumulator.update() rebuilds its season after games were updated in place.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        data (dict | pd.DataFrame): Column-oriented dictionary of lists or DataFrame with schedule columns.
+
+    Returns:
+        tuple: Number of games inserted, updated, and unchanged, or None if it failed. Rows without a Year, Month, or Day are skipped.
+    """
+    if not migrate_schedule_table(conn) or not ensure_schedule_game_key(conn):
+        return None
+    try:
+        data_columns, data_rows = _rows_for_insert(data)
+    except Exception as e:
+        print(f"Error in upsert_schedule: {e}")
+        return None
+    positions = [index for index, name in enumerate(data_columns) if name in SCHEDULE_COLUMN_TYPES]
+    column_names = [data_columns[index] for index in positions]
+    rows = ([row[index] for index in positions] for row in data_rows)
+    # The IDs are always written, since they can be filled in from the stored game
+    written_columns = column_names + [name for name in ("Winner ID", "Loser ID") if name not in column_names]
+    key = ', '.join(schedule_game_key())
+    quoted_columns = ', '.join([f'"{name}"' for name in column_names])
+    written_quoted_columns = ', '.join([f'"{name}"' for name in written_columns])
+    staged_columns = ', '.join([f'"{name}" {column_type}' for name, column_type in SCHEDULE_COLUMN_TYPES.items()])
+    same_game = ' AND '.join([f"{stored} = {incoming}" for stored, incoming in zip(schedule_game_key("stored"), schedule_game_key("incoming"))])
+    same_key = ' AND '.join([f"{keyed} = {incoming}" for keyed, incoming in zip(schedule_game_key("keyed"), schedule_game_key("incoming"))])
+    same_teams = same_date_and_teams("stored", "incoming")
+    same_values = ' AND '.join([f'stored."{name}" IS incoming."{name}"' for name in written_columns])
+    updates = ', '.join([f'"{name}" = excluded."{name}"' for name in written_columns])
+
+    try:
+        with savepoint(conn, "schedule_upsert") as c:
+            c.execute("DROP TABLE IF EXISTS temp.schedule_incoming")
+            c.execute(f"CREATE TEMP TABLE schedule_incoming ({staged_columns})")
+            c.executemany(f"INSERT INTO temp.schedule_incoming ({quoted_columns}) VALUES ({', '.join(['?'] * len(column_names))})", rows)
+            c.execute('DELETE FROM temp.schedule_incoming WHERE "Year" IS NULL OR "Month" IS NULL OR "Day" IS NULL')
+            if c.rowcount:
+                print(f"Skipped {c.rowcount} games without a date")
+            # A game scraped twice in one batch is stored once, with its last values
+            c.execute(f"DELETE FROM temp.schedule_incoming WHERE ROWID NOT IN (SELECT MAX(ROWID) FROM temp.schedule_incoming GROUP BY {key})")
+
+            # Games without a key match that were stored under other IDs are found by date and team names. IDs the
+            # incoming game is missing are taken from the stored game, then the stored game takes the incoming IDs
+            without_key_match = f"NOT EXISTS (SELECT 1 FROM schedule AS keyed WHERE {same_key})"
+            c.execute(
+                f'UPDATE temp.schedule_incoming AS incoming SET ("Winner ID", "Loser ID") = (SELECT COALESCE(incoming."Winner ID", stored."Winner ID"), COALESCE(incoming."Loser ID", stored."Loser ID") FROM schedule AS stored WHERE {same_teams} ORDER BY stored.ROWID DESC LIMIT 1) '
+                f'WHERE ("Winner ID" IS NULL OR "Loser ID" IS NULL) AND {without_key_match} AND EXISTS (SELECT 1 FROM schedule AS stored WHERE {same_teams})'
+            )
+            c.execute(f"DELETE FROM temp.schedule_incoming AS incoming WHERE EXISTS (SELECT 1 FROM schedule AS stored WHERE {same_game} AND {same_values})")
+            unchanged = c.rowcount
+            c.execute(
+                f'UPDATE schedule AS stored SET ("Winner ID", "Loser ID") = (SELECT incoming."Winner ID", incoming."Loser ID" FROM temp.schedule_incoming AS incoming WHERE {same_teams} AND {without_key_match}) '
+                f'WHERE stored.ROWID IN (SELECT MAX(stored.ROWID) FROM temp.schedule_incoming AS incoming JOIN schedule AS stored ON {same_teams} WHERE {without_key_match} GROUP BY incoming.ROWID)'
+            )
+            c.execute(f"SELECT COUNT(*) FROM temp.schedule_incoming AS incoming WHERE EXISTS (SELECT 1 FROM schedule AS stored WHERE {same_game})")
+            updated = c.fetchone()[0]
+            c.execute("SELECT COUNT(*) FROM temp.schedule_incoming")
+            inserted = c.fetchone()[0] - updated
+
+            c.execute(f"INSERT INTO schedule ({written_quoted_columns}) SELECT {written_quoted_columns} FROM temp.schedule_incoming WHERE true ON CONFLICT ({key}) DO UPDATE SET {updates}")
+            c.execute("DROP TABLE temp.schedule_incoming")
+        instrumentation.count(instrumentation.ROWS_INSERTED, inserted)
+        instrumentation.count(instrumentation.ROWS_UPDATED, updated)
+        instrumentation.log("db.upsert", table="schedule", inserted=inserted, updated=updated, unchanged=unchanged)
+        return inserted, updated, unchanged
+    except sqlite3.Error as e:
+        print(f"Error upserting into schedule: {e}")
+        return None
+
+
+@instrumentation.timed()
+def insert_data_into_table(conn: sqlite3.Connection, data_dic: dict, table_name: str, bulk: bool = False, chunk_size: int = 5000) -> tuple:
+    """_summary_
+    Inserts the given data into the given table in the database using the given connection.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        data_dic (dict): Column-oriented dictionary of lists to insert into the table. In bulk mode a pandas DataFrame or a list of tuples is also accepted.
         table_name (str): Name of the table to insert the data into.
+        bulk (bool, optional): Insert with bound parameters through bulk_insert_into_table. Defaults to False.
+        chunk_size (int, optional): Number of rows per transaction in bulk mode. Defaults to 5000.
+
+    Returns:
+        tuple: Number of rows inserted and number of rows rejected.
     """
+    if bulk:
+        return bulk_insert_into_table(conn, data_dic, table_name, chunk_size=chunk_size)
+
+    import pandas as pd
+
+    inserted = 0
+    rejected = 0
     try:
         c = conn.cursor()
         # Quote column names to handle spaces and special characters
@@ -73,50 +506,190 @@ def insert_data_into_table(conn: sqlite3.Connection, data_dic: dict, table_name:
             values = ', '.join(value_list)
             try:
                 c.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({values})")
+                inserted += 1
             except sqlite3.Error as e:
                 print(f"Error inserting row {i}: {e}")
+                rejected += 1
                 continue
         
         conn.commit()
-        print(f"Successfully inserted {len(data_dic[list(data_dic.keys())[0]])} rows")
+        instrumentation.count(instrumentation.ROWS_INSERTED, inserted)
+        instrumentation.count(instrumentation.ROWS_REJECTED, rejected)
+        instrumentation.log("db.insert", table=table_name, inserted=inserted, rejected=rejected)
         
     except Exception as e:
         print(f"Error in insert_data_into_table: {e}")
         conn.rollback()
+        inserted = 0
+
+    return inserted, rejected
+
+
+def _rows_for_insert(data, columns: list = None) -> tuple:
+    """_summary_
+    Normalises a column-oriented dict, a list of tuples, or a DataFrame into column names and an iterator of row tuples with NaN replaced by None.
+    Args:
+        data (dict | list | pd.DataFrame): Data to insert.
+        columns (list, optional): Column names, required when data is a list of tuples.
+
+    Returns:
+        tuple: List of column names and an iterator of row tuples.
+    """
+    import pandas as pd
+
+    if isinstance(data, pd.DataFrame):
+        df = data
+    elif isinstance(data, dict):
+        df = pd.DataFrame(data)
+    else:
+        if columns is None:
+            raise ValueError("columns are required when inserting a list of tuples")
+        df = pd.DataFrame.from_records(data, columns=columns)
+
+    if columns is not None:
+        df = df[list(columns)]
+    # Convert whole columns at once: object dtype gives plain Python values sqlite3 can bind, NaN becomes None (NULL)
+    values = df.astype(object).where(df.notna(), None)
+    return list(df.columns), values.itertuples(index=False, name=None)
+
+
+@instrumentation.timed()
+def bulk_insert_into_table(conn: sqlite3.Connection, data, table_name: str, columns: list = None, chunk_size: int = 5000) -> tuple:
+    """_summary_
+    Inserts the given data into the given table with executemany and bound parameters, one savepoint per chunk.
+    If a chunk fails it is rolled back and retried row by row so only the offending rows are rejected. Each chunk is
+    committed when no transaction was open; inside a caller's transaction committing is left to the caller.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        data (dict | list | pd.DataFrame): Column-oriented dictionary of lists, list of row tuples, or DataFrame to insert.
+        table_name (str): Name of the table to insert the data into.
+        columns (list, optional): Column names for a list of tuples, or a subset of columns to insert. Defaults to None.
+        chunk_size (int, optional): Number of rows per transaction. Defaults to 5000.
+
+    Returns:
+        tuple: Number of rows inserted and number of rows rejected.
+    """
+    inserted = 0
+    rejected = 0
+    try:
+        column_names, rows = _rows_for_insert(data, columns)
+    except Exception as e:
+        print(f"Error in bulk_insert_into_table: {e}")
+        return inserted, rejected
+
+    # Quote column names to handle spaces and special characters
+    quoted_columns = ', '.join([f'"{name}"' for name in column_names])
+    placeholders = ', '.join(['?'] * len(column_names))
+    statement = f"INSERT INTO {table_name} ({quoted_columns}) VALUES ({placeholders})"
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        try:
+            with savepoint(conn, "bulk_insert_chunk") as c:
+                c.executemany(statement, chunk)
+            inserted += len(chunk)
+        except sqlite3.Error as e:
+            print(f"Error inserting chunk into {table_name}: {e}, retrying row by row")
+            with savepoint(conn, "bulk_insert_rows") as c:
+                for row in chunk:
+                    try:
+                        c.execute(statement, row)
+                        inserted += 1
+                    except sqlite3.Error:
+                        rejected += 1
+
+    instrumentation.count(instrumentation.ROWS_INSERTED, inserted)
+    instrumentation.count(instrumentation.ROWS_REJECTED, rejected)
+    instrumentation.log("db.insert", table=table_name, inserted=inserted, rejected=rejected)
+    return inserted, rejected
     
-    
-    # except sqlite3.Error as e:
-    #     print(e)
-    
 
-def query_db(conn: sqlite3.Connection, query: str) -> dict:
+QUERY_RESULT_FORMATS = ("dict", "numpy", "dataframe")
+
+
+def _format_query_rows(rows: list, columns: list, result_format: str):
+    """_summary_
+    Transposes the fetched rows into the requested result format in a single pass.
+    Args:
+        rows (list): Rows returned by fetchall or fetchmany.
+        columns (list): Column names from the cursor description.
+        result_format (str): One of "dict", "numpy", or "dataframe".
+
+    Returns:
+        dict | pd.DataFrame: Dictionary of column name to list or NumPy array, or a DataFrame.
+    """
+    if result_format == "dataframe":
+        import pandas as pd
+
+        return pd.DataFrame.from_records(rows, columns=columns)
+    if rows:
+        column_values = zip(*rows)
+    else:
+        column_values = ((),) * len(columns)
+    if result_format == "numpy":
+        return {column: np.array(values) for column, values in zip(columns, column_values)}
+    return {column: list(values) for column, values in zip(columns, column_values)}
+
+
+@instrumentation.timed()
+def query_db(conn: sqlite3.Connection, query: str, params: tuple = (), result_format: str = "dict"):
     """_summary_
     Queries the database with the given query using the given connection.
     Args:
         conn (sqlite3.Connection): sqlite3 connection object for the database.
         query (str): Query to execute on the database.
+        params (tuple, optional): Parameters bound to the placeholders in the query. Defaults to ().
+        result_format (str, optional): "dict" for a dictionary of lists, "numpy" for a dictionary of NumPy arrays, or "dataframe" for a DataFrame. Defaults to "dict".
 
     Returns:
-        pd.DataFrame: DataFrame containing the results of the query.
+        dict: Dictionary mapping each column name to its values, or a DataFrame when result_format is "dataframe".
     """
+    if result_format not in QUERY_RESULT_FORMATS:
+        raise ValueError(f"Invalid result format: {result_format}, expected one of {QUERY_RESULT_FORMATS}")
     try:
         c = conn.cursor()
-        result = c.execute(query)
+        result = c.execute(query, params)
         rows = result.fetchall()
         columns = [description[0] for description in c.description] 
-        dict_data = {}
-        for i, column in enumerate(columns):
-            for row in rows:
-                if column not in dict_data:
-                    dict_data[column] = []
-                dict_data[column].append(row[i])
-        return dict_data
+        return _format_query_rows(rows, columns, result_format)
     except sqlite3.Error as e:
         print(e)
         return None
     except Exception as e:
         print(e)
         return None
+
+
+def iter_query_db(conn: sqlite3.Connection, query: str, params: tuple = (), chunk_size: int = 1000, result_format: str = "dict"):
+    """_summary_
+    Streams the results of the given query in chunks using fetchmany, so large tables are never fully materialised.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        query (str): Query to execute on the database.
+        params (tuple, optional): Parameters bound to the placeholders in the query. Defaults to ().
+        chunk_size (int, optional): Number of rows per chunk. Defaults to 1000.
+        result_format (str, optional): Format of each chunk, same options as query_db. Defaults to "dict".
+
+    Yields:
+        dict: One chunk of results per iteration in the requested format.
+    """
+    if result_format not in QUERY_RESULT_FORMATS:
+        raise ValueError(f"Invalid result format: {result_format}, expected one of {QUERY_RESULT_FORMATS}")
+    try:
+        c = conn.cursor()
+        c.execute(query, params)
+        columns = [description[0] for description in c.description]
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield _format_query_rows(rows, columns, result_format)
+    except sqlite3.Error as e:
+        print(e)
+        return
+
     
 def get_last_row(conn: sqlite3.Connection, table_name: str) -> dict:
     """_summary_
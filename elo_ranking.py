@@ -0,0 +1,279 @@
+"""
+Summary: This file contains the chronological Elo rating engine.
+
+Games are streamed from a cursor over the schedule table ordered by date, so only the current game and the
+ratings are ever in memory, however many seasons are replayed. Ratings live in a compact array of doubles indexed
+by team, with a dictionary from team to index. Every checkpoint_interval games the ratings are saved to the
+elo_checkpoints table, so ratings as of any date are computed by restoring the nearest earlier checkpoint and
+replaying only the games after it. Checkpoints are tied to the schedule version and dropped when the schedule changes.
+"""
+#IMPORTS
+import json
+import math
+from array import array
+from datetime import date
+from db.db import *
+from db.connection_manager import get_connection
+from ranking_system import calculate_margin_of_victory_score
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 20.0
+# Rating points added to the home team's rating when computing the expected result
+HOME_FIELD_ADVANTAGE = 55.0
+# Share of each team's distance from the mean rating kept from one season to the next
+SEASON_CARRY_OVER = 0.75
+CHECKPOINT_INTERVAL = 1000
+# Dampens the margin-of-victory multiplier when the favourite wins, so ratings do not inflate (FiveThirtyEight)
+AUTOCORRELATION_CONSTANT = 2.2
+
+
+def mov_multiplier(Winning_Team_Points, Losing_Team_Points, rating_difference: float = 0.0) -> float:
+    """_summary_
+    Multiplier of the K factor for a game, growing with the calculate_margin_of_victory_score bucket of the margin
+    and shrinking when the winner was the higher-rated team.
+    Args:
+        Winning_Team_Points (int): Points scored by the winner.
+        Losing_Team_Points (int): Points scored by the loser.
+        rating_difference (float, optional): Winner's rating minus the loser's, home field included. Defaults to 0.0.
+
+    Returns:
+        float: The multiplier, 1.22 for a 3-point win between equal teams and 3.0 for a blowout.
+    """
+    margin_of_victory_score = calculate_margin_of_victory_score(Winning_Team_Points, Losing_Team_Points)
+    # Upsets by more than 1000 points would make the dampening blow up, they are treated as 1000
+    return math.sqrt(1.0 + margin_of_victory_score) * AUTOCORRELATION_CONSTANT / (AUTOCORRELATION_CONSTANT + 0.001 * max(rating_difference, -1000.0))
+
+
+def home_field_adjustment(location: str, home_field_advantage: float = HOME_FIELD_ADVANTAGE) -> float:
+    """_summary_
+    Gets the rating points the winner gains from the game's location: "" when the winner was at home, "@" when it
+    was away, and "N" for neutral sites.
+    """
+    location = (location or "").strip()
+    if location == "@":
+        return -home_field_advantage
+    if location == "N":
+        return 0.0
+    return home_field_advantage
+
+
+def game_season(year: int, month: int) -> int:
+    """_summary_
+    Gets the season (the year it starts in August) of a game played in the given year and month.
+    """
+    return year if month >= 8 else year - 1
+
+
+class EloRatings:
+    """_summary_
+    Elo ratings of every team seen so far, in a compact array of doubles indexed by team.
+    Args:
+        k_factor (float, optional): Largest rating change of a game before the margin multiplier. Defaults to K_FACTOR.
+        home_field_advantage (float, optional): Rating points given to the home team. Defaults to HOME_FIELD_ADVANTAGE.
+        season_carry_over (float, optional): Share of the distance from the mean kept between seasons, 1 for none regressed. Defaults to SEASON_CARRY_OVER.
+        initial_rating (float, optional): Rating of a team's first game. Defaults to INITIAL_RATING.
+    """
+
+    def __init__(self, k_factor: float = K_FACTOR, home_field_advantage: float = HOME_FIELD_ADVANTAGE, season_carry_over: float = SEASON_CARRY_OVER, initial_rating: float = INITIAL_RATING):
+        self.k_factor = k_factor
+        self.home_field_advantage = home_field_advantage
+        self.season_carry_over = season_carry_over
+        self.initial_rating = initial_rating
+        self.team_indexes = {}
+        self.ratings = array("d")
+        self.games_processed = 0
+        # (Year, Month, Day, ROWID) of the last game processed
+        self.last_game = None
+        self.season = None
+
+    @property
+    def parameters(self) -> str:
+        """_summary_
+        Gets the rating parameters as a canonical JSON string. Checkpoints are only reused by engines with the same parameters.
+        """
+        return json.dumps({"k_factor": self.k_factor, "home_field_advantage": self.home_field_advantage, "season_carry_over": self.season_carry_over, "initial_rating": self.initial_rating}, sort_keys=True)
+
+    def team_index(self, team) -> int:
+        """_summary_
+        Gets the index of the given team in the ratings array, adding it at the initial rating if it is new.
+        """
+        index = self.team_indexes.get(team)
+        if index is None:
+            index = self.team_indexes[team] = len(self.ratings)
+            self.ratings.append(self.initial_rating)
+        return index
+
+    def start_season(self, season: int) -> None:
+        """_summary_
+        Regresses every rating toward the mean by season_carry_over when a new season starts.
+        """
+        if self.season is not None and season > self.season and self.season_carry_over != 1.0 and len(self.ratings):
+            mean = math.fsum(self.ratings) / len(self.ratings)
+            self.ratings = array("d", (mean + self.season_carry_over * (rating - mean) for rating in self.ratings))
+        self.season = season
+
+    def update(self, Winning_Team, Losing_Team, Winning_Team_Points: int, Losing_Team_Points: int, location: str = "") -> float:
+        """_summary_
+        Applies the result of one game.
+        Args:
+            Winning_Team (hashable): Winner of the game.
+            Losing_Team (hashable): Loser of the game.
+            Winning_Team_Points (int): Points scored by the winner.
+            Losing_Team_Points (int): Points scored by the loser.
+            location (str, optional): Sports-Reference location of the winner: "", "@", or "N". Defaults to "".
+
+        Returns:
+            float: Rating points the winner gained and the loser lost.
+        """
+        winner = self.team_index(Winning_Team)
+        loser = self.team_index(Losing_Team)
+        rating_difference = self.ratings[winner] - self.ratings[loser] + home_field_adjustment(location, self.home_field_advantage)
+        expected_win = 1.0 / (1.0 + 10.0 ** (-rating_difference / 400.0))
+        change = self.k_factor * mov_multiplier(Winning_Team_Points, Losing_Team_Points, rating_difference) * (1.0 - expected_win)
+        self.ratings[winner] += change
+        self.ratings[loser] -= change
+        self.games_processed += 1
+        return change
+
+    def rankings(self) -> dict:
+        """_summary_
+        Gets every team's rating.
+
+        Returns:
+            dict: Dictionary mapping each team to its rating, best first.
+        """
+        return dict(sorted(zip(self.team_indexes, self.ratings), key=lambda item: -item[1]))
+
+
+def create_elo_checkpoints_table(conn: sqlite3.Connection) -> None:
+    """_summary_
+    Creates the elo_checkpoints table if it does not exist. Each row holds the ratings after a number of games,
+    with the teams as a JSON list and the ratings as raw doubles in the same order.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS elo_checkpoints ("Parameters" TEXT, "Games" INTEGER, "Year" INTEGER, "Month" INTEGER, "Day" INTEGER, "Game ROWID" INTEGER, "Season" INTEGER, "Schedule Version" INTEGER, "Teams" TEXT, "Ratings" BLOB, PRIMARY KEY ("Parameters", "Games"))')
+    conn.commit()
+
+
+def save_checkpoint(conn: sqlite3.Connection, elo: EloRatings, schedule_version: int) -> None:
+    """_summary_
+    Saves the current ratings as a checkpoint. Does not commit, so checkpoints written during a replay share its transaction.
+    """
+    year, month, day, rowid = elo.last_game
+    conn.execute('INSERT OR REPLACE INTO elo_checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (elo.parameters, elo.games_processed, year, month, day, rowid, elo.season, schedule_version, json.dumps(list(elo.team_indexes)), elo.ratings.tobytes()))
+
+
+def load_checkpoint(conn: sqlite3.Connection, elo: EloRatings, as_of: date = None) -> bool:
+    """_summary_
+    Restores the latest checkpoint of the engine's parameters taken on or before the given date.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        elo (EloRatings): Fresh engine to restore into.
+        as_of (date, optional): Latest date of the checkpoint's last game. Defaults to any date.
+
+    Returns:
+        bool: True if a checkpoint was restored, False if there was none.
+    """
+    query = 'SELECT "Games", "Year", "Month", "Day", "Game ROWID", "Season", "Teams", "Ratings" FROM elo_checkpoints WHERE "Parameters" = ?'
+    params = (elo.parameters,)
+    if as_of is not None:
+        query += ' AND ("Year", "Month", "Day") <= (?, ?, ?)'
+        params += (as_of.year, as_of.month, as_of.day)
+    row = conn.execute(query + ' ORDER BY "Games" DESC LIMIT 1', params).fetchone()
+    if row is None:
+        return False
+    games, year, month, day, rowid, season, teams, ratings = row
+    elo.team_indexes = {team: index for index, team in enumerate(json.loads(teams))}
+    elo.ratings = array("d")
+    elo.ratings.frombytes(ratings)
+    elo.games_processed = games
+    elo.last_game = (year, month, day, rowid)
+    elo.season = season
+    return True
+
+
+def iter_schedule_games(conn: sqlite3.Connection, after: tuple = None, as_of: date = None):
+    """_summary_
+    Streams the played games of the schedule table in date order, straight from the cursor.
+    Teams are identified by their school ID, or by name when the ID is missing.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        after (tuple, optional): (Year, Month, Day, ROWID) of the last game already processed. Defaults to None.
+        as_of (date, optional): Last date to include. Defaults to every game.
+
+    Yields:
+        tuple: (Year, Month, Day, ROWID, winner, loser, winner points, loser points, location) of each game.
+    """
+    date_key = ", ".join(SCHEDULE_DATE_KEY)
+    conditions = [f"{column} IS NOT NULL" for column in SCHEDULE_DATE_KEY] + ['"Winner Points" IS NOT NULL', '"Loser Points" IS NOT NULL']
+    params = ()
+    if after is not None:
+        conditions.append(f"({date_key}, ROWID) > (?, ?, ?, ?)")
+        params += tuple(after)
+    cursor = conn.execute(f'SELECT {date_key}, ROWID, COALESCE("Winner ID", Winner), COALESCE("Loser ID", Loser), "Winner Points", "Loser Points", Location FROM schedule WHERE {" AND ".join(conditions)} ORDER BY {date_key}, ROWID', params)
+    if as_of is None:
+        yield from cursor
+        return
+    # The upper bound is checked here rather than in SQL, where it would make SQLite sort each month instead of reading the index in order
+    last_day = (as_of.year, as_of.month, as_of.day)
+    for game in cursor:
+        if game[:3] > last_day:
+            break
+        yield game
+
+
+def calculate_elo_ratings(as_of: date = None, checkpoint_interval: int = CHECKPOINT_INTERVAL, use_checkpoints: bool = True, conn: sqlite3.Connection = None, **parameters) -> EloRatings:
+    """_summary_
+    Calculates the Elo ratings after every game played on or before the given date. Replays from the nearest
+    earlier checkpoint and saves a checkpoint every checkpoint_interval games along the way.
+    Args:
+        as_of (date, optional): Last date to include. Defaults to every game.
+        checkpoint_interval (int, optional): Games between saved checkpoints, 0 to save none. Defaults to CHECKPOINT_INTERVAL.
+        use_checkpoints (bool, optional): Restore from and save checkpoints. Defaults to True.
+        conn (sqlite3.Connection, optional): Connection to the database. Defaults to the shared connection to db/schools.db.
+        **parameters: k_factor, home_field_advantage, season_carry_over, or initial_rating passed to EloRatings.
+
+    Returns:
+        EloRatings: The ratings, or None if the schedule table could not be migrated or indexed.
+    """
+    conn = conn or get_connection()
+    # Date comparisons need the typed Year and Month columns, and the date index lets the ordered scan stream
+    if not migrate_schedule_table(conn) or not ensure_schedule_date_index(conn):
+        return None
+    elo = EloRatings(**parameters)
+    if not use_checkpoints:
+        checkpoint_interval = 0
+    else:
+        ensure_schedule_version_tracking(conn)
+        schedule_version = get_schedule_version(conn)
+        create_elo_checkpoints_table(conn)
+        # Checkpoints taken before the schedule last changed may include games that have since been edited or missed ones added before them
+        conn.execute('DELETE FROM elo_checkpoints WHERE "Schedule Version" IS NOT ?', (schedule_version,))
+        conn.commit()
+        load_checkpoint(conn, elo, as_of)
+
+    for year, month, day, rowid, winner, loser, winner_points, loser_points, location in iter_schedule_games(conn, elo.last_game, as_of):
+        elo.start_season(game_season(year, month))
+        elo.update(winner, loser, winner_points, loser_points, location)
+        elo.last_game = (year, month, day, rowid)
+        if checkpoint_interval and elo.games_processed % checkpoint_interval == 0:
+            save_checkpoint(conn, elo, schedule_version)
+    if checkpoint_interval:
+        conn.commit()
+    return elo
+
+
+def calculate_elo_rankings(as_of: date = None, conn: sqlite3.Connection = None, **parameters) -> dict:
+    """_summary_
+    Calculates every team's Elo rating after the games played on or before the given date.
+    Args:
+        as_of (date, optional): Last date to include. Defaults to every game.
+        conn (sqlite3.Connection, optional): Connection to the database. Defaults to the shared connection to db/schools.db.
+        **parameters: Passed to calculate_elo_ratings.
+
+    Returns:
+        dict: Dictionary mapping each team's school ID (or name when unresolved) to its rating, best first.
+    """
+    elo = calculate_elo_ratings(as_of, conn=conn, **parameters)
+    return None if elo is None else elo.rankings()
@@ -1,130 +1,243 @@
 from db.db import *
-import pandas as pd
-import bs4 as bs
-import requests
+from db.connection_manager import get_connection_manager
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import instrumentation
+from urllib.parse import urlparse
+from http_cache import ResponseCache, get_response_cache
+from schedule_parser import parse_schedule
 from school_naming_information import *
 
 YEAR = 2025
-URLS = {
-    "schedule": f"https://www.sports-reference.com/cfb/years/{YEAR}-schedule.html",
-    "team_offense": f"https://www.sports-reference.com/cfb/years/{YEAR}-team-offense.html",
-    "team_defense": f"https://www.sports-reference.com/cfb/years/{YEAR}-team-defense.html",
-    "team_special_teams": f"https://www.sports-reference.com/cfb/years/{YEAR}-special-teams.html"
+URL_TEMPLATES = {
+    "schedule": "https://www.sports-reference.com/cfb/years/{year}-schedule.html",
+    "team_offense": "https://www.sports-reference.com/cfb/years/{year}-team-offense.html",
+    "team_defense": "https://www.sports-reference.com/cfb/years/{year}-team-defense.html",
+    "team_special_teams": "https://www.sports-reference.com/cfb/years/{year}-special-teams.html"
 }
+URLS = {page: url.format(year=YEAR) for page, url in URL_TEMPLATES.items()}
+# Sports-Reference blocks clients that make more than 20 requests a minute
+DEFAULT_REQUESTS_PER_MINUTE = 20
 
-def check_url(url: str) -> bool:
-    response = requests.get(url)
-    if response.status_code == 200:
-        return True
-    else:
-        return False
 
+def current_season() -> int:
+    """_summary_
+    Gets the season in progress, seasons run from August through July.
+    """
+    today = date.today()
+    return today.year if today.month >= 8 else today.year - 1
 
-#[Winner, Loser, Winner_Points, Loser_Points, Location, Date, Time, Day, Week, Year, Month, Day, winner_id, loser_id]
-def fetch_schedule(YEAR: int):
-    URL = f"https://www.sports-reference.com/cfb/years/{YEAR}-schedule.html"        
-    if check_url(str(URL)):
-        print(f"Successfully fetched schedule")
-    else:
+
+class RateLimiter:
+    """_summary_
+    Thread-safe per-host rate limiter. Each call to wait() reserves the next free slot for the URL's host and
+    sleeps until it arrives, so concurrent workers never exceed the configured rate against one host.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE):
+        self.interval = 60.0 / requests_per_minute
+        self._next_request = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request.get(host, now))
+            self._next_request[host] = request_time + self.interval
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+def create_session(pool_size: int = 4) -> "requests.Session":
+    """_summary_
+    Creates an HTTP session whose connection pool is shared by all fetch workers.
+    Args:
+        pool_size (int, optional): Number of connections kept open per host. Defaults to 4.
+
+    Returns:
+        requests.Session: Session to pass to fetch_page and fetch_pages.
+    """
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@instrumentation.timed()
+def fetch_page(url: str, session: "requests.Session" = None, rate_limiter: RateLimiter = None, timeout: float = 30, cache: ResponseCache = None, immutable: bool = False) -> str:
+    """_summary_
+    Fetches the given page with a single GET request.
+    Args:
+        url (str): URL of the page to fetch.
+        session (requests.Session, optional): Session to send the request with. Defaults to a one-off request.
+        rate_limiter (RateLimiter, optional): Rate limiter to wait on before sending the request. Defaults to None.
+        timeout (float, optional): Request timeout in seconds. Defaults to 30.
+        cache (ResponseCache, optional): Response cache to serve and revalidate the page through. Defaults to None.
+        immutable (bool, optional): Mark the page as immutable in the cache, for completed seasons. Defaults to False.
+
+    Returns:
+        str: HTML of the page, or None if the request failed.
+    """
+    if cache is not None:
+        # Immutable and offline hits never reach the network, so they skip the rate limiter
+        html = cache.read_without_revalidation(url)
+        if html is not None:
+            instrumentation.count(instrumentation.HTTP_CACHE_HITS)
+        if html is not None or cache.offline:
+            return html
+    if rate_limiter is not None:
+        rate_limiter.wait(url)
+    if cache is not None:
+        return cache.fetch(url, session, timeout, immutable)
+    import requests
+
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+    except requests.RequestException as e:
+        print(f"Failed to fetch {url}: {e}")
+        return None
+    instrumentation.count(instrumentation.HTTP_REQUESTS)
+    instrumentation.count(instrumentation.HTTP_BYTES, len(response.content))
+    if response.status_code != 200:
+        print(f"Failed to fetch {url}: HTTP {response.status_code}")
+        return None
+    return response.text
+
+
+@instrumentation.timed()
+def fetch_pages(urls: list, max_workers: int = 4, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE, session: "requests.Session" = None, use_cache: bool = True, immutable_urls: set = frozenset()) -> dict:
+    """_summary_
+    Fetches the given pages concurrently on a thread pool with one shared session and a per-host rate limit.
+    Each URL is requested exactly once.
+    Args:
+        urls (list): URLs of the pages to fetch.
+        max_workers (int, optional): Number of worker threads. Defaults to 4.
+        requests_per_minute (float, optional): Maximum requests per minute to any one host. Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+        session (requests.Session, optional): Session to send the requests with. Defaults to a new pooled session.
+        use_cache (bool, optional): Serve and revalidate pages through the shared response cache. Defaults to True.
+        immutable_urls (set, optional): URLs to mark as immutable in the cache. Defaults to an empty set.
+
+    Returns:
+        dict: Dictionary mapping each URL to its HTML, or None if the request failed.
+    """
+    urls = list(dict.fromkeys(urls))
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+    rate_limiter = RateLimiter(requests_per_minute)
+    cache = get_response_cache() if use_cache else None
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages = executor.map(lambda url: fetch_page(url, session, rate_limiter, cache=cache, immutable=url in immutable_urls), urls)
+            return dict(zip(urls, pages))
+    finally:
+        if own_session:
+            session.close()
+
+
+def fetch_season_pages(years: list, pages: list = ("schedule",), max_workers: int = 4, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE, use_cache: bool = True) -> dict:
+    """_summary_
+    Fetches the given Sports-Reference pages for several seasons concurrently. Pages of completed seasons are
+    marked immutable in the response cache, so they are downloaded at most once.
+    Args:
+        years (list): Seasons to fetch.
+        pages (list, optional): Keys of URL_TEMPLATES to fetch for every season. Defaults to ("schedule",).
+        max_workers (int, optional): Number of worker threads. Defaults to 4.
+        requests_per_minute (float, optional): Maximum requests per minute to Sports-Reference. Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+        use_cache (bool, optional): Serve and revalidate pages through the shared response cache. Defaults to True.
+
+    Returns:
+        dict: Dictionary mapping each (year, page) pair to its HTML, or None if the request failed.
+    """
+    urls = {(year, page): URL_TEMPLATES[page].format(year=year) for year in years for page in pages}
+    immutable_urls = {url for (year, _), url in urls.items() if year < current_season()}
+    html_by_url = fetch_pages(urls.values(), max_workers=max_workers, requests_per_minute=requests_per_minute, use_cache=use_cache, immutable_urls=immutable_urls)
+    return {key: html_by_url[url] for key, url in urls.items()}
+
+
+#[Week, Date, Time, Day, Winner, Winner Points, Location, Loser, Loser Points, Year, Month, Winner ID, Loser ID]
+@instrumentation.timed()
+def fetch_schedule(YEAR: int, use_cache: bool = True):
+    URL = URL_TEMPLATES["schedule"].format(year=YEAR)
+    cache = get_response_cache() if use_cache else None
+    html = fetch_page(URL, cache=cache, immutable=YEAR < current_season())
+    if html is None:
         print(f"Failed to fetch schedule")
         return None
-   
-    # Fetch the actual HTML content
-    response = requests.get(URL)
-    soup = bs.BeautifulSoup(response.text, features="html.parser")
-    soup = soup.find_all("table", {"id": "schedule"})
-    headers = soup[0].find_all("th")
-    headers = [header.text for header in headers]
-    
-    #remove duplicates and int
-    headers = headers[1:10]
-    headers_pts_index = headers.index("Pts")
-    headers[headers_pts_index] = "Winner Points"
-    headers_pts_index = headers.index("Pts")
-    headers[headers_pts_index] = "Loser Points"
-    headers_locations_index = headers.index("")
-    headers[headers_locations_index] = "Location"
-
-
-
-    data = soup[0].find_all("tr")
-    data = data[1:]
-    data_dict = {}
-    headers[0] = "Week"
-    for header in headers:
-        data_dict[header] = []
-    data_dict["Year"] = []
-    data_dict["Month"] = []
-    data_dict["Day"] = []
-    data_dict["Winner ID"] = []
-    data_dict["Loser ID"] = []
-    
-    for row in data:
-        row_data = row.find_all("td")
-        row_data = [data.text for data in row_data]
-        if len(row_data) != 0:
-            Winner_Score = row_data[5]
-            Loser_Score = row_data[8]
-            if Winner_Score == "" and Loser_Score == "":
-                continue
-            elif Winner_Score == "0" or Loser_Score == "0":
-                continue
-            else:
-                print(headers)
-                print(row_data[:len(headers)])
-                Week = row_data[0]
-                Date = row_data[1]
-                Time = row_data[2]
-                Day = row_data[3]
-                Winner_team = row_data[4]
-                Winner_team_points = row_data[5]
-                Location = row_data[6]
-                Loser_team = row_data[7]
-                Loser_team_points = row_data[8]
-                try:
-                    Winner_team_rank_index = Winner_team.index(")")
-                except:
-                    Winner_team_rank_index = None
-                try:
-                    Loser_team_rank_index = Loser_team.index(")")
-                except:
-                    Loser_team_rank_index = None
-                if Winner_team_rank_index is not None:
-                    Winner_team = Winner_team[Winner_team_rank_index+2:]
-                if Loser_team_rank_index is not None:
-                    Loser_team = Loser_team[Loser_team_rank_index+2:]
-
-                data_dict["Winner"].append(Winner_team)
-                data_dict["Loser"].append(Loser_team)
-                data_dict["Winner Points"].append(Winner_team_points)
-                data_dict["Loser Points"].append(Loser_team_points)
-                data_dict["Location"].append(Location)
-                data_dict["Date"].append(Date)
-                data_dict["Time"].append(Time)
-                data_dict["Day"].append(Day)
-                data_dict["Week"].append(Week)
-                date_split = Date.split(" ")
-                Year = date_split[2]
-                Month = month_number_from_month_abbreviation(date_split[0])
-                Day = date_split[1]
-                data_dict["Year"].append(Year)
-                data_dict["Month"].append(Month)
-                data_dict["Day"].append(Day)
-                _, _, winner_id = get_school_naming_infomation(Winner_team)
-                _, _, loser_id = get_school_naming_infomation(Loser_team)
-                data_dict["Winner ID"].append(winner_id)
-                data_dict["Loser ID"].append(loser_id)
-
-        else:
-            continue
+    instrumentation.log("fetch.schedule", year=YEAR, characters=len(html))
+    return parse_schedule_html(html)
+
+
+def fetch_schedules(years: list, max_workers: int = 4, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE, use_cache: bool = True) -> dict:
+    """_summary_
+    Fetches and parses the schedules of several seasons, downloading the pages concurrently.
+    Args:
+        years (list): Seasons to fetch.
+        max_workers (int, optional): Number of worker threads. Defaults to 4.
+        requests_per_minute (float, optional): Maximum requests per minute to Sports-Reference. Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+        use_cache (bool, optional): Serve and revalidate pages through the shared response cache. Defaults to True.
+
+    Returns:
+        dict: Dictionary mapping each season to its schedule dictionary, or None if the page could not be fetched.
+    """
+    pages = fetch_season_pages(years, ("schedule",), max_workers=max_workers, requests_per_minute=requests_per_minute, use_cache=use_cache)
+    return {year: None if pages[(year, "schedule")] is None else parse_schedule_html(pages[(year, "schedule")]) for year in years}
 
+
+def _school_id(school_name: str) -> str:
+    naming_infomation = get_school_naming_infomation(school_name, learn_aliases=True)
+    if naming_infomation is None:
+        return None
+    return naming_infomation[2]
+
+
+@instrumentation.timed()
+def parse_schedule_html(html, backend: str = "auto") -> dict:
+    """_summary_
+    Parses a Sports-Reference schedule page into the schedule dictionary of lists, resolving each team's ID.
+    Args:
+        html (str | bytes | iterable): The page, or an iterable of chunks of it.
+        backend (str, optional): Parser backend passed to schedule_parser.parse_schedule. Defaults to "auto".
+
+    Returns:
+        dict: Dictionary mapping each schedule column to its values. Day is the day of the month.
+    """
+    data_dict = {column: [] for column in ["Week", "Date", "Time", "Day", "Winner", "Winner Points", "Location", "Loser", "Loser Points", "Year", "Month", "Winner ID", "Loser ID"]}
+    for game in parse_schedule(html, backend):
+        data_dict["Week"].append(game.week)
+        data_dict["Date"].append(game.date)
+        data_dict["Time"].append(game.time)
+        data_dict["Day"].append(game.day)
+        data_dict["Winner"].append(game.winner)
+        data_dict["Winner Points"].append(game.winner_points)
+        data_dict["Location"].append(game.location)
+        data_dict["Loser"].append(game.loser)
+        data_dict["Loser Points"].append(game.loser_points)
+        data_dict["Year"].append(game.year)
+        data_dict["Month"].append(game.month)
+        data_dict["Winner ID"].append(_school_id(game.winner))
+        data_dict["Loser ID"].append(_school_id(game.loser))
     return data_dict
 
 
+@instrumentation.timed()
 def fetch_and_store_schedule(year):
+    """_summary_
+    Scrapes the given season and upserts its games, so running it again only writes new or changed games.
+
+    Returns:
+        tuple: Number of games inserted, updated, and unchanged, or None if the scrape or the upsert failed.
+    """
     data_dict = fetch_schedule(year)
-    CONN = connect_to_db("db/schools.db")
-    insert_data_into_table(CONN, data_dict, "schedule")
-    close_connection(CONN)
+    if data_dict is None:
+        return None
+    with get_connection_manager().connection() as conn:
+        return upsert_schedule(conn, data_dict)
 
 
@@ -0,0 +1,199 @@
+"""
+Summary: This file contains an on-disk HTTP response cache for the scraped pages.
+
+Bodies are stored content-addressed (by the SHA-256 of the body) and each URL has a small metadata file with its
+ETag, Last-Modified, and whether it is immutable. Cached URLs are revalidated with conditional requests, immutable
+URLs (such as completed seasons) never hit the network again, and offline mode serves only from the cache.
+"""
+#IMPORTS
+import hashlib
+import json
+import os
+import tempfile
+import time
+import instrumentation
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "http_cache")
+
+
+class ResponseCache:
+    """_summary_
+    On-disk cache of HTTP responses keyed by URL.
+    Args:
+        cache_dir (str, optional): Directory to keep the cache in. Defaults to DEFAULT_CACHE_DIR.
+        offline (bool, optional): Serve only from the cache and never touch the network. Defaults to False.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self._index_dir = os.path.join(cache_dir, "index")
+        self._bodies_dir = os.path.join(cache_dir, "bodies")
+
+    def _metadata_path(self, url: str) -> str:
+        return os.path.join(self._index_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # A uniquely named temporary file, so fetch workers writing the same path do not share one
+        temporary = tempfile.NamedTemporaryFile(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False)
+        try:
+            with temporary:
+                temporary.write(data)
+            os.replace(temporary.name, path)
+        except BaseException:
+            os.remove(temporary.name)
+            raise
+
+    def get_metadata(self, url: str) -> dict:
+        """_summary_
+        Gets the cached metadata for the given URL.
+        Args:
+            url (str): URL of the page.
+
+        Returns:
+            dict: Metadata with the body hash, ETag, Last-Modified, immutable flag, and fetch time, or None if the URL is not cached.
+        """
+        try:
+            with open(self._metadata_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, url: str) -> str:
+        """_summary_
+        Reads the cached body of the given URL without touching the network.
+        Args:
+            url (str): URL of the page.
+
+        Returns:
+            str: Cached body, or None if the URL is not cached.
+        """
+        metadata = self.get_metadata(url)
+        if metadata is None:
+            return None
+        try:
+            with open(os.path.join(self._bodies_dir, metadata["body"]), "rb") as f:
+                return f.read().decode("utf-8")
+        except OSError:
+            return None
+
+    def read_without_revalidation(self, url: str) -> str:
+        """_summary_
+        Reads the cached body if it can be served without a request, that is if the URL is immutable or the cache is offline.
+        Args:
+            url (str): URL of the page.
+
+        Returns:
+            str: Cached body, or None if the URL has to be revalidated or is not cached.
+        """
+        metadata = self.get_metadata(url)
+        if metadata is None or not (metadata["immutable"] or self.offline):
+            return None
+        return self.read(url)
+
+    def store(self, url: str, body: str, etag: str = None, last_modified: str = None, immutable: bool = False) -> None:
+        """_summary_
+        Stores a response body for the given URL. Also used to seed the cache with saved HTML fixtures.
+        Args:
+            url (str): URL of the page.
+            body (str): Body of the response.
+            etag (str, optional): ETag header of the response. Defaults to None.
+            last_modified (str, optional): Last-Modified header of the response. Defaults to None.
+            immutable (bool, optional): Never revalidate this URL. Defaults to False.
+        """
+        data = body.encode("utf-8")
+        body_hash = hashlib.sha256(data).hexdigest()
+        body_path = os.path.join(self._bodies_dir, body_hash)
+        if not os.path.exists(body_path):
+            self._write_atomic(body_path, data)
+        metadata = {
+            "url": url,
+            "body": body_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+            "immutable": immutable,
+            "fetched_at": time.time(),
+        }
+        self._write_atomic(self._metadata_path(url), json.dumps(metadata).encode("utf-8"))
+
+    def mark_immutable(self, url: str, immutable: bool = True) -> bool:
+        """_summary_
+        Marks a cached URL as immutable so it is always served from the cache.
+        Args:
+            url (str): URL of the page.
+            immutable (bool, optional): New value of the immutable flag. Defaults to True.
+
+        Returns:
+            bool: True if the URL was cached and updated, False otherwise.
+        """
+        metadata = self.get_metadata(url)
+        if metadata is None:
+            return False
+        metadata["immutable"] = immutable
+        self._write_atomic(self._metadata_path(url), json.dumps(metadata).encode("utf-8"))
+        return True
+
+    def fetch(self, url: str, session: "requests.Session" = None, timeout: float = 30, immutable: bool = False) -> str:
+        """_summary_
+        Gets the given page, from the cache when possible. Immutable URLs and offline mode never touch the network;
+        other cached URLs are revalidated with If-None-Match / If-Modified-Since and a 304 serves the cached body.
+        Args:
+            url (str): URL of the page.
+            session (requests.Session, optional): Session to send the request with. Defaults to a one-off request.
+            timeout (float, optional): Request timeout in seconds. Defaults to 30.
+            immutable (bool, optional): Mark the URL as immutable once it is cached. Defaults to False.
+
+        Returns:
+            str: Body of the page, or None if it could not be fetched or, offline, is not cached.
+        """
+        metadata = self.get_metadata(url)
+        if metadata is not None and (metadata["immutable"] or self.offline):
+            instrumentation.count(instrumentation.HTTP_CACHE_HITS)
+            return self.read(url)
+        if self.offline:
+            print(f"Offline and {url} is not cached")
+            return None
+
+        headers = {}
+        if metadata is not None:
+            if metadata["etag"]:
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata["last_modified"]:
+                headers["If-Modified-Since"] = metadata["last_modified"]
+        import requests
+
+        try:
+            response = (session or requests).get(url, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            print(f"Failed to fetch {url}: {e}")
+            return None
+        instrumentation.count(instrumentation.HTTP_REQUESTS)
+        instrumentation.count(instrumentation.HTTP_BYTES, len(response.content))
+
+        if response.status_code == 304 and metadata is not None:
+            body = self.read(url)
+            if body is not None:
+                instrumentation.count(instrumentation.HTTP_CACHE_HITS)
+                if immutable and not metadata["immutable"]:
+                    self.mark_immutable(url)
+                return body
+        if response.status_code != 200:
+            print(f"Failed to fetch {url}: HTTP {response.status_code}")
+            return None
+        self.store(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"), immutable)
+        return response.text
+
+
+_RESPONSE_CACHE = None
+
+
+def get_response_cache() -> ResponseCache:
+    """_summary_
+    Gets the shared response cache. Setting the CFB_HTTP_OFFLINE environment variable to 1 puts it in offline mode.
+    """
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None:
+        _RESPONSE_CACHE = ResponseCache(offline=os.environ.get("CFB_HTTP_OFFLINE") == "1")
+    return _RESPONSE_CACHE
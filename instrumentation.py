@@ -0,0 +1,325 @@
+"""
+Summary: This file contains the timers, counters, and profiling hooks of the ingest and ranking pipeline.
+
+Instrumentation is off unless the CFB_INSTRUMENT environment variable is set (or enable() is called), and while it is
+off every hook is a single flag check, so the timers and counters can stay on the hot paths. While it is on, each
+timed call and logged event is written as one JSON object per line to the CFB_INSTRUMENT_LOG file (stderr by default),
+and the timers and counters are aggregated per stage for snapshot() and the summary written at exit.
+
+Run any pipeline script instrumented, and optionally under cProfile, without editing it:
+    python instrumentation.py fetchers_cfb.py
+    python instrumentation.py --profile-output ingest.prof --log ingest.jsonl -m benchmarks.run_benchmarks --scales 1
+"""
+#IMPORTS
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLE_ENVIRONMENT_VARIABLE = "CFB_INSTRUMENT"
+LOG_ENVIRONMENT_VARIABLE = "CFB_INSTRUMENT_LOG"
+DISABLED_VALUES = ("", "0", "false", "no", "off")
+# Counter names used by the pipeline modules
+HTTP_REQUESTS = "http.requests"
+HTTP_BYTES = "http.bytes"
+HTTP_CACHE_HITS = "http.cache_hits"
+ROWS_PARSED = "parse.rows"
+NAME_LOOKUP_HITS = "names.hits"
+NAME_LOOKUP_FUZZY_HITS = "names.fuzzy_hits"
+NAME_LOOKUP_MISSES = "names.misses"
+SQL_STATEMENTS = "sql.statements"
+ROWS_INSERTED = "db.rows_inserted"
+ROWS_UPDATED = "db.rows_updated"
+ROWS_REJECTED = "db.rows_rejected"
+
+
+class _State:
+    enabled = False
+    sink = None
+    owns_sink = False
+
+
+_STATE = _State()
+_LOCK = threading.Lock()
+_COUNTERS = {}
+_TIMERS = {}
+
+
+def is_enabled() -> bool:
+    """_summary_
+    Checks whether instrumentation is on.
+    """
+    return _STATE.enabled
+
+
+def enable(log_path: str = None) -> None:
+    """_summary_
+    Turns instrumentation on.
+    Args:
+        log_path (str, optional): File to append the JSON lines to. Defaults to CFB_INSTRUMENT_LOG, or stderr if it is not set.
+    """
+    log_path = log_path or os.environ.get(LOG_ENVIRONMENT_VARIABLE)
+    with _LOCK:
+        if _STATE.owns_sink:
+            _STATE.sink.close()
+        _STATE.sink = open(log_path, "a", encoding="utf-8") if log_path else sys.stderr
+        _STATE.owns_sink = bool(log_path)
+        _STATE.enabled = True
+
+
+def disable() -> None:
+    """_summary_
+    Turns instrumentation off. The aggregated timers and counters are kept until reset().
+    """
+    with _LOCK:
+        _STATE.enabled = False
+        if _STATE.owns_sink:
+            _STATE.sink.close()
+        _STATE.sink = None
+        _STATE.owns_sink = False
+
+
+def reset() -> None:
+    """_summary_
+    Clears the aggregated timers and counters.
+    """
+    with _LOCK:
+        _COUNTERS.clear()
+        _TIMERS.clear()
+
+
+def _emit(record: dict) -> None:
+    line = json.dumps(record, default=str)
+    with _LOCK:
+        if _STATE.sink is not None:
+            _STATE.sink.write(line + "\n")
+            _STATE.sink.flush()
+
+
+def log(event: str, **fields) -> None:
+    """_summary_
+    Writes a structured event, e.g. log("db.insert", table="schedule", inserted=919). Does nothing while instrumentation is off.
+    """
+    if not _STATE.enabled:
+        return
+    _emit({"ts": round(time.time(), 6), "event": event, "thread": threading.current_thread().name, **fields})
+
+
+def count(name: str, n: int = 1) -> None:
+    """_summary_
+    Adds n to the named counter. Does nothing while instrumentation is off.
+    """
+    if not _STATE.enabled:
+        return
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+
+def _record_time(name: str, elapsed_ms: float, fields: dict) -> None:
+    with _LOCK:
+        timer = _TIMERS.get(name)
+        if timer is None:
+            timer = _TIMERS[name] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+        timer["calls"] += 1
+        timer["total_ms"] += elapsed_ms
+        timer["max_ms"] = max(timer["max_ms"], elapsed_ms)
+    log("timer", name=name, ms=round(elapsed_ms, 3), **fields)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("name", "fields", "start_time")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _record_time(self.name, (time.perf_counter() - self.start_time) * 1000, self.fields if exc_type is None else {**self.fields, "error": exc_type.__name__})
+        return False
+
+
+def timer(name: str, **fields):
+    """_summary_
+    Context manager timing the block under the given stage name. Extra keyword fields are added to its log line.
+    While instrumentation is off it returns a shared no-op context manager.
+
+    Example:
+        with timer("ingest.resolve", season=2024):
+            ...
+    """
+    if not _STATE.enabled:
+        return _NULL_TIMER
+    return _Timer(name, fields)
+
+
+def timed(name: str = None):
+    """_summary_
+    Decorator timing every call of a function, under its module and qualified name unless a stage name is given.
+    While instrumentation is off a call costs one flag check.
+    """
+    def decorator(function):
+        stage = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _STATE.enabled:
+                return function(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record_time(stage, (time.perf_counter() - start_time) * 1000, {})
+        return wrapper
+    return decorator
+
+
+def _count_sql_statement(statement: str) -> None:
+    count(SQL_STATEMENTS)
+
+
+def trace_connection(conn) -> None:
+    """_summary_
+    Counts every statement run on the given sqlite3 connection while instrumentation is on.
+    Connections opened while it is off are not traced, so they pay nothing.
+    """
+    if _STATE.enabled and conn is not None:
+        conn.set_trace_callback(_count_sql_statement)
+
+
+def snapshot() -> dict:
+    """_summary_
+    Gets the aggregated timers and counters.
+
+    Returns:
+        dict: Dictionary with "timers" mapping each stage to its calls, total, and max milliseconds, and "counters" mapping each counter to its value.
+    """
+    with _LOCK:
+        timers = {stage: {"calls": timer["calls"], "total_ms": round(timer["total_ms"], 3), "max_ms": round(timer["max_ms"], 3)} for stage, timer in _TIMERS.items()}
+        return {"timers": timers, "counters": dict(_COUNTERS)}
+
+
+def write_summary() -> None:
+    """_summary_
+    Writes the aggregated timers and counters as a "summary" event. Does nothing while instrumentation is off.
+    """
+    log("summary", **snapshot())
+
+
+def format_summary(summary: dict = None) -> str:
+    """_summary_
+    Formats the aggregated timers, slowest total first, and counters as a table.
+    """
+    summary = summary or snapshot()
+    lines = [f"{'stage':<60}{'calls':>8}{'total ms':>12}{'max ms':>12}"]
+    for stage, timer in sorted(summary["timers"].items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{stage:<60}{timer['calls']:>8}{timer['total_ms']:>12.2f}{timer['max_ms']:>12.2f}")
+    lines.append(f"{'counter':<60}{'value':>8}")
+    for counter, value in sorted(summary["counters"].items()):
+        lines.append(f"{counter:<60}{value:>8}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def profile(output_path: str = None, sort: str = "cumulative", limit: int = 30):
+    """_summary_
+    Context manager running the block under cProfile. Works whether or not instrumentation is on.
+    Args:
+        output_path (str, optional): File to dump the raw stats to, for pstats or snakeviz. Defaults to None.
+        sort (str, optional): pstats sort key of the printed report. Defaults to "cumulative".
+        limit (int, optional): Number of functions in the printed report, 0 for none. Defaults to 30.
+
+    Yields:
+        cProfile.Profile: The running profiler.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output_path:
+            profiler.dump_stats(output_path)
+        if limit:
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats(sort).print_stats(limit)
+
+
+if os.environ.get(ENABLE_ENVIRONMENT_VARIABLE, "").strip().lower() not in DISABLED_VALUES:
+    enable()
+    atexit.register(write_summary)
+
+
+def main(argv=None) -> int:
+    import argparse
+    import runpy
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # As with python -m, everything after the module name belongs to the module, and everything after the script to the script
+    module, module_arguments, index = None, [], 0
+    while index < len(argv) and argv[index].startswith("-"):
+        if argv[index] == "-m":
+            if index + 1 == len(argv):
+                print("-m requires a module name", file=sys.stderr)
+                return 2
+            argv, module, module_arguments = argv[:index], argv[index + 1], argv[index + 2:]
+            break
+        index += 2 if argv[index] in ("--log", "--profile-output", "--sort", "--limit") else 1
+
+    parser = argparse.ArgumentParser(description="Run a pipeline script or module with instrumentation on, and optionally under cProfile.", usage="%(prog)s [options] (script [args] | -m module [args])")
+    parser.add_argument("--log", help="file to append the JSON lines to (default: stderr)")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and print the top functions")
+    parser.add_argument("--profile-output", metavar="PATH", help="also dump the cProfile stats to PATH")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key of the profile report")
+    parser.add_argument("--limit", type=int, default=30, help="functions in the profile report")
+    parser.add_argument("target", nargs=argparse.REMAINDER, help="script and its arguments")
+    args = parser.parse_args(argv)
+    if module is not None:
+        args.target = module_arguments
+    elif not args.target:
+        parser.error("a script or -m module is required")
+
+    enable(args.log)
+    # The script's own imports must see the repository root, as when it is run directly from there
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.argv = [module] + args.target if module else args.target
+    run = (lambda: runpy.run_module(module, run_name="__main__", alter_sys=True)) if module else (lambda: runpy.run_path(args.target[0], run_name="__main__"))
+    exit_code = 0
+    try:
+        with (profile(args.profile_output, args.sort, args.limit) if args.profile or args.profile_output else _NULL_TIMER):
+            run()
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        write_summary()
+        print(format_summary(), file=sys.stderr)
+        disable()
+    return exit_code
+
+
+if __name__ == "__main__":
+    # Pipeline modules import this file as "instrumentation", so they must share this run's state
+    sys.modules["instrumentation"] = sys.modules[__name__]
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Summary: This file contains the week-by-week ranking snapshots stored in the rankings_history table.
+
+Each season is processed in a single pass: the margin-of-victory scores of every game are scattered into a
+(weeks x teams) matrix and a running prefix sum over the weeks gives every team's cumulative score after each
+week. The snapshots are stored in the indexed rankings_history table so historical and rank-movement questions
+become index lookups instead of re-running the rankings.
+"""
+#IMPORTS
+import numpy as np
+from db.db import *
+from ranking_system import PLAYED_GAMES_CONDITION, calculate_margin_of_victory_scores, season_expression
+
+
+def create_rankings_history_table(conn: sqlite3.Connection) -> None:
+    """_summary_
+    Creates the rankings_history table and its team index if they do not exist.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+    """
+    c = conn.cursor()
+    c.execute("CREATE TABLE IF NOT EXISTS rankings_history (season INTEGER, week INTEGER, team_id TEXT, score REAL, rank INTEGER, PRIMARY KEY (season, week, team_id))")
+    c.execute("CREATE INDEX IF NOT EXISTS rankings_history_team_idx ON rankings_history (team_id, season, week)")
+    conn.commit()
+
+
+def calculate_weekly_rankings(weeks, Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points) -> "pd.DataFrame":
+    """_summary_
+    Calculates every team's cumulative score and rank after each week of one season in a single pass.
+    A team appears from the first week it plays. Ties share the best rank (1, 2, 2, 4).
+    Args:
+        weeks (array-like): Week of each game.
+        Winning_Teams (array-like): Winner of each game.
+        Losing_Teams (array-like): Loser of each game.
+        Winning_Team_Points (array-like): Points scored by the winner of each game.
+        Losing_Team_Points (array-like): Points scored by the loser of each game.
+
+    Returns:
+        pd.DataFrame: DataFrame with week, team_id, score, and rank columns, sorted by week and rank.
+    """
+    import pandas as pd
+
+    if len(weeks) == 0:
+        return pd.DataFrame(columns=["week", "team_id", "score", "rank"])
+    week_codes, week_values = pd.factorize(np.asarray(weeks), sort=True)
+    number_of_games = len(week_codes)
+    team_codes, teams = pd.factorize(np.concatenate([np.asarray(Winning_Teams, dtype=object), np.asarray(Losing_Teams, dtype=object)]))
+    number_of_weeks = len(week_values)
+    number_of_teams = len(teams)
+
+    scores = calculate_margin_of_victory_scores(Winning_Team_Points, Losing_Team_Points)
+    cells = np.concatenate([week_codes, week_codes]) * number_of_teams + team_codes
+    weekly_changes = np.bincount(cells, weights=np.concatenate([scores, -scores]), minlength=number_of_weeks * number_of_teams)
+    cumulative = np.cumsum(weekly_changes.reshape(number_of_weeks, number_of_teams), axis=0)
+
+    first_week = np.full(number_of_teams, number_of_weeks)
+    np.minimum.at(first_week, team_codes, np.concatenate([week_codes, week_codes]))
+
+    snapshots = []
+    for week_index in range(number_of_weeks):
+        active = np.flatnonzero(first_week <= week_index)
+        week_scores = cumulative[week_index, active]
+        descending = np.sort(week_scores)[::-1]
+        # Rank = 1 + number of teams with a strictly higher score
+        ranks = np.searchsorted(-descending, -week_scores, side="left") + 1
+        order = np.lexsort((active, ranks))
+        snapshots.append(pd.DataFrame({
+            "week": week_values[week_index],
+            "team_id": teams[active[order]],
+            "score": week_scores[order],
+            "rank": ranks[order],
+        }))
+    return pd.concat(snapshots, ignore_index=True)
+
+
+def materialize_rankings_history(conn: sqlite3.Connection, seasons: list = None) -> int:
+    """_summary_
+    Calculates the weekly snapshots of the given seasons and replaces their rows in rankings_history.
+    All games are loaded with one query. Teams are keyed by school ID, or by name when the ID is missing.
+    Games without a week or a score are skipped. The old rows are deleted and the new ones written in one
+    savepoint, so a failure leaves the previous snapshots in place.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        seasons (list, optional): Seasons to materialize. Defaults to every season in the schedule table.
+
+    Returns:
+        int: Number of snapshot rows written, or None if they could not be written.
+    """
+    import pandas as pd
+
+    create_rankings_history_table(conn)
+    season_sql = season_expression(conn)
+    query = f'SELECT {season_sql} AS season, Week AS week, COALESCE("Winner ID", Winner) AS winner, COALESCE("Loser ID", Loser) AS loser, "Winner Points" AS winner_points, "Loser Points" AS loser_points FROM schedule WHERE Week IS NOT NULL AND {PLAYED_GAMES_CONDITION}'
+    params = ()
+    if seasons is not None:
+        seasons = list(seasons)
+        query += f" AND {season_sql} IN ({', '.join(['?'] * len(seasons))})"
+        params = tuple(seasons)
+    games = query_db(conn, query + " ORDER BY ROWID", params, result_format="dataframe")
+    if seasons is None:
+        seasons = sorted(games["season"].dropna().unique().tolist())
+
+    snapshots = []
+    for season, season_games in games.groupby("season", sort=True):
+        weekly = calculate_weekly_rankings(season_games["week"].astype(int).to_numpy(), season_games["winner"].to_numpy(), season_games["loser"].to_numpy(), season_games["winner_points"].to_numpy(), season_games["loser_points"].to_numpy())
+        weekly.insert(0, "season", int(season))
+        snapshots.append(weekly)
+
+    inserted = 0
+    try:
+        # The old snapshots are only replaced once every new row is written
+        with savepoint(conn, "rankings_history") as c:
+            c.executemany("DELETE FROM rankings_history WHERE season = ?", [(int(season),) for season in seasons])
+            if snapshots:
+                inserted, rejected = bulk_insert_into_table(conn, pd.concat(snapshots, ignore_index=True), "rankings_history")
+                if rejected:
+                    raise sqlite3.IntegrityError(f"{rejected} snapshot rows were rejected")
+    except sqlite3.Error as e:
+        print(f"Error materializing rankings history: {e}")
+        return None
+    return inserted
+
+
+def get_rankings_after_week(conn: sqlite3.Connection, season: int, week: int) -> dict:
+    """_summary_
+    Gets the rankings after the given week from rankings_history.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        season (int): Season to look up.
+        week (int): Week to look up.
+
+    Returns:
+        dict: Dictionary with team_id, score, and rank lists, best first.
+    """
+    return query_db(conn, "SELECT team_id, score, rank FROM rankings_history WHERE season = ? AND week = ? ORDER BY rank, team_id", (season, week))
+
+
+def get_team_rank_history(conn: sqlite3.Connection, team_id: str, season: int = None) -> dict:
+    """_summary_
+    Gets the weekly score and rank of one team from rankings_history.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        team_id (str): School ID (or name) of the team.
+        season (int, optional): Season to limit the history to. Defaults to every season.
+
+    Returns:
+        dict: Dictionary with season, week, score, and rank lists in chronological order.
+    """
+    if season is None:
+        return query_db(conn, "SELECT season, week, score, rank FROM rankings_history WHERE team_id = ? ORDER BY season, week", (team_id,))
+    return query_db(conn, "SELECT season, week, score, rank FROM rankings_history WHERE team_id = ? AND season = ? ORDER BY season, week", (team_id, season))
+
+
+def get_rank_movement(conn: sqlite3.Connection, season: int, week: int) -> dict:
+    """_summary_
+    Gets every team's rank after the given week and how many places it moved since its previous snapshot.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        season (int): Season to look up.
+        week (int): Week to look up.
+
+    Returns:
+        dict: Dictionary with team_id, rank, previous_rank, and movement lists, best first. Movement is positive for teams that moved up and None for a team's first week.
+    """
+    return query_db(conn, """
+        SELECT team_id, rank, previous_rank, previous_rank - rank AS movement FROM (
+            SELECT team_id, week, rank, LAG(rank) OVER (PARTITION BY team_id ORDER BY week) AS previous_rank
+            FROM rankings_history WHERE season = ? AND week <= ?
+        ) WHERE week = ? ORDER BY rank, team_id
+    """, (season, week, week))
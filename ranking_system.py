@@ -1,10 +1,16 @@
 from db.db import *
-import pandas as pd
-import time
-try:
-    CONN = connect_to_db("db/schools.db")
-except:
-    conn = connect_to_db("db\\schools.db")
+from db.connection_manager import get_connection
+import inspect
+import numpy as np
+import instrumentation
+
+
+def __getattr__(name):
+    # CONN used to be opened at import time, it is now the shared connection opened on first use
+    if name == "CONN":
+        return get_connection()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def calculate_margin_of_victory_score(Winning_Team_Points, Losing_Team_Points):
     margin_of_victory = Winning_Team_Points - Losing_Team_Points
@@ -29,67 +35,332 @@ def calculate_margin_of_victory_score(Winning_Team_Points, Losing_Team_Points):
     return margin_of_victory_score
 
 
-def calculate_running_rankings(year: int) -> dict:
-    start_time = time.time()
-    dict_data = query_db(CONN, f"SELECT * FROM schedule where Year = {year} and Month >= 8 or Year = {year+1} and Month < 8")
+# Games that have not been played yet are scraped without a score and are left out of the rankings
+PLAYED_GAMES_CONDITION = '"Winner Points" IS NOT NULL AND "Loser Points" IS NOT NULL'
+# Upper bound (inclusive) of each margin-of-victory bucket and the score awarded for it, the last score has no upper bound
+MARGIN_OF_VICTORY_THRESHOLDS = np.array([3, 10, 17, 24, 31, 38, 45])
+MARGIN_OF_VICTORY_SCORES = np.array([0.5, 1, 2, 4, 5, 6, 7, 8])
 
 
-    running_rankings = {}
+def calculate_margin_of_victory_scores(Winning_Team_Points, Losing_Team_Points) -> np.ndarray:
+    """_summary_
+    Vectorized calculate_margin_of_victory_score, scoring every game at once with a bucket lookup.
+    Args:
+        Winning_Team_Points (array-like): Points scored by the winner of each game.
+        Losing_Team_Points (array-like): Points scored by the loser of each game.
 
-    for i in range(0,len(dict_data["Winner"])):
-        Winning_Team = dict_data["Winner"][i]
-        Losing_Team = dict_data["Loser"][i]
-        Winning_Team_Points = dict_data["Winner Points"][i]
-        Losing_Team_Points = dict_data["Loser Points"][i]
+    Returns:
+        np.ndarray: Margin-of-victory score of each game. Raises ValueError if a game has no score.
+    """
+    margins = np.asarray(Winning_Team_Points, dtype=float) - np.asarray(Losing_Team_Points, dtype=float)
+    # searchsorted would put a missing score in the last bucket and credit the game as a blowout
+    if np.isnan(margins).any():
+        raise ValueError("Games without a score cannot be scored, leave them out with PLAYED_GAMES_CONDITION")
+    # side="left" puts a margin equal to a threshold in that threshold's bucket, matching the <= checks
+    return MARGIN_OF_VICTORY_SCORES[np.searchsorted(MARGIN_OF_VICTORY_THRESHOLDS, margins, side="left")]
 
-        margin_of_victory_score = calculate_margin_of_victory_score(Winning_Team_Points, Losing_Team_Points)
-        
-        if Winning_Team not in running_rankings:
-            running_rankings[Winning_Team] = 0
-        if Losing_Team not in running_rankings:
-            running_rankings[Losing_Team] = 0
 
-        running_rankings[Winning_Team] += margin_of_victory_score
-        running_rankings[Losing_Team] -= margin_of_victory_score
+def factorize_teams(teams_by_game) -> tuple:
+    """_summary_
+    Maps each team to an integer index in the order the teams are first seen, like pandas.factorize without importing pandas.
+    Args:
+        teams_by_game (array-like): Hashable team of each game slot.
 
-    
+    Returns:
+        tuple: Index of each slot's team and the object array of distinct teams in first-seen order.
+    """
+    index = {}
+    codes = np.array([index.setdefault(team, len(index)) for team in np.asarray(teams_by_game, dtype=object).tolist()], dtype=np.intp)
+    teams = np.empty(len(index), dtype=object)
+    teams[:] = list(index)
+    return codes, teams
 
-    end_time = time.time()
-    
-    time_taken = end_time - start_time
-    time_taken_ms = time_taken * 1000
-    print(f"Time taken: {time_taken_ms} milliseconds")
-    return running_rankings
 
-def calculate_rankings_with_previous_year(year: int, running_rankings: dict) -> dict:
-    start_time = time.time()
-    dict_data = query_db(CONN, f"SELECT * FROM schedule where Year = {year} and Month >= 8 or Year = {year+1} and Month < 8")
-    running_rankings_copy = running_rankings.copy()
+def rank_games(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, running_rankings: dict = None) -> dict:
+    """_summary_
+    Vectorized ranking engine. Maps teams to integer indices, scores every game at once, and scatter-adds the
+    scores onto the team totals. Gives the same totals and team order as adding the games one by one.
+    Args:
+        Winning_Teams (array-like): Winner of each game.
+        Losing_Teams (array-like): Loser of each game.
+        Winning_Team_Points (array-like): Points scored by the winner of each game.
+        Losing_Team_Points (array-like): Points scored by the loser of each game.
+        running_rankings (dict, optional): Existing totals to add the games onto, left unmodified. Defaults to None.
+
+    Returns:
+        dict: Dictionary mapping each team to its total score.
+    """
+    previous_teams = list(running_rankings.keys()) if running_rankings else []
+    number_of_games = len(Winning_Teams)
+
+    # Interleave winner and loser so teams are indexed in the order they are first seen
+    teams_by_game = np.empty(len(previous_teams) + 2 * number_of_games, dtype=object)
+    teams_by_game[:len(previous_teams)] = previous_teams
+    teams_by_game[len(previous_teams)::2] = Winning_Teams
+    teams_by_game[len(previous_teams) + 1::2] = Losing_Teams
+    codes, teams = factorize_teams(teams_by_game)
+
+    totals = np.zeros(len(teams))
+    if previous_teams:
+        totals[:len(previous_teams)] = list(running_rankings.values())
+    if number_of_games:
+        scores = calculate_margin_of_victory_scores(Winning_Team_Points, Losing_Team_Points)
+        game_codes = codes[len(previous_teams):]
+        totals += np.bincount(game_codes[0::2], weights=scores, minlength=len(teams))
+        totals -= np.bincount(game_codes[1::2], weights=scores, minlength=len(teams))
+
+    return dict(zip(teams.tolist(), totals.tolist()))
+
+
+def season_filter(conn, year: int) -> tuple:
+    """_summary_
+    Builds the WHERE clause selecting the games of the season starting in August of the given year.
+    Uses the indexed Season column when the schedule table has been migrated to the typed schema.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        year (int): Year the season starts in.
+
+    Returns:
+        tuple: SQL condition and the parameters to bind to it.
+    """
+    if "Season" in get_table_columns(conn, "schedule"):
+        return "Season = ?", (year,)
+    return "(CAST(Year AS INTEGER) = ? AND Month >= 8 OR CAST(Year AS INTEGER) = ? AND Month < 8)", (year, year + 1)
+
+
+def season_expression(conn) -> str:
+    """_summary_
+    Gets the SQL expression for the season (the year it starts in August) of a schedule row.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+    Returns:
+        str: The Season column when the schedule table has been migrated, otherwise the equivalent CASE expression.
+    """
+    if "Season" in get_table_columns(conn, "schedule"):
+        return "Season"
+    return "CASE WHEN Month >= 8 THEN CAST(Year AS INTEGER) ELSE CAST(Year AS INTEGER) - 1 END"
+
+
+def query_season_games(conn, year: int) -> dict:
+    """_summary_
+    Queries the schedule for every played game in the season starting in August of the given year.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        year (int): Year the season starts in.
+
+    Returns:
+        dict: Dictionary mapping each schedule column to its values.
+    """
+    condition, params = season_filter(conn, year)
+    return query_db(conn, f"SELECT * FROM schedule WHERE {condition} AND {PLAYED_GAMES_CONDITION}", params)
+
+
+class RankingAccumulator:
+    """_summary_
+    Stateful running rankings for one season that only processes schedule rows added since the last update.
+
+    The totals and the high-water mark (the last schedule ROWID processed) are persisted in the ranking_totals
+    and ranking_progress tables, so an update after a scrape costs as much as the number of new games. The
+    schedule version and the table's last ROWID are persisted with them: when the version moved by more than the
+    number of rows appended since, rows were updated or deleted in place (or the table was rebuilt, for example by
+    migrate_schedule_table) and the next update recomputes the season from scratch.
+    """
 
-    for i in range(0,len(dict_data["Winner"])):
-        Winning_Team = dict_data["Winner"][i]
-        Losing_Team = dict_data["Loser"][i]
-        Winning_Team_Points = dict_data["Winner Points"][i]
-        Losing_Team_Points = dict_data["Loser Points"][i]
+    def __init__(self, conn, year: int):
+        self.conn = conn
+        self.year = year
+        self.running_rankings = {}
+        self.last_rowid = 0
+        self.schedule_version = None
+        self.schedule_rowid = None
+        self._create_tables()
+        self.load()
 
-        margin_of_victory_score = calculate_margin_of_victory_score(Winning_Team_Points, Losing_Team_Points)
-        
+    def _create_tables(self) -> None:
+        c = self.conn.cursor()
+        c.execute('CREATE TABLE IF NOT EXISTS ranking_totals ("Season" INTEGER, "Team" TEXT, "Score" REAL, PRIMARY KEY ("Season", "Team"))')
+        c.execute('CREATE TABLE IF NOT EXISTS ranking_progress ("Season" INTEGER PRIMARY KEY, "Last ROWID" INTEGER, "Schedule Version" INTEGER, "Schedule ROWID" INTEGER)')
+        # Progress tables created before the schedule version was persisted
+        existing_columns = get_table_columns(self.conn, "ranking_progress")
+        for column_name in ("Schedule Version", "Schedule ROWID"):
+            if column_name not in existing_columns:
+                c.execute(f'ALTER TABLE ranking_progress ADD COLUMN "{column_name}" INTEGER')
+        self.conn.commit()
 
-        if Winning_Team not in running_rankings_copy:
-            running_rankings_copy[Winning_Team] = 0
-        if Losing_Team not in running_rankings_copy:
-            running_rankings_copy[Losing_Team] = 0
+    def load(self) -> None:
+        """_summary_
+        Loads the persisted totals, high-water mark, and schedule version for the season.
+        """
+        totals = query_db(self.conn, 'SELECT "Team", "Score" FROM ranking_totals WHERE "Season" = ? ORDER BY ROWID', (self.year,))
+        self.running_rankings = dict(zip(totals["Team"], totals["Score"]))
+        progress = query_db(self.conn, 'SELECT "Last ROWID", "Schedule Version", "Schedule ROWID" FROM ranking_progress WHERE "Season" = ?', (self.year,))
+        self.last_rowid = progress["Last ROWID"][0] if progress["Last ROWID"] else 0
+        self.schedule_version = progress["Schedule Version"][0] if progress["Schedule Version"] else None
+        self.schedule_rowid = progress["Schedule ROWID"][0] if progress["Schedule ROWID"] else None
 
-        running_rankings_copy[Winning_Team] += margin_of_victory_score
-        running_rankings_copy[Losing_Team] -= margin_of_victory_score
+    def _schedule_was_rewritten(self, schedule_version: int) -> bool:
+        # Every inserted, updated, or deleted row bumps the version by one, so appends alone account for all of it
+        if not self.last_rowid:
+            return False
+        if schedule_version is None or self.schedule_version is None or self.schedule_rowid is None:
+            return True
+        c = self.conn.cursor()
+        c.execute("SELECT COUNT(*) FROM schedule WHERE ROWID > ?", (self.schedule_rowid,))
+        return schedule_version != self.schedule_version + c.fetchone()[0]
 
+    def update(self) -> int:
+        """_summary_
+        Applies the schedule rows inserted since the last update and persists the new totals. When rows were
+        updated or deleted since the last update, the totals are rebuilt from the whole season.
 
-    end_time = time.time()
-    time_taken = end_time - start_time
-    time_taken_ms = time_taken * 1000
-    print(f"Time taken: {time_taken_ms} milliseconds")
+        Returns:
+            int: Number of games applied, every game of the season after a rebuild.
+        """
+        schedule_version = get_schedule_version(self.conn)
+        c = self.conn.cursor()
+        c.execute("SELECT MAX(ROWID) FROM schedule")
+        schedule_rowid = c.fetchone()[0] or 0
+        if self._schedule_was_rewritten(schedule_version):
+            self.reset()
+
+        condition, params = season_filter(self.conn, self.year)
+        # NOT INDEXED keeps SQLite on the ROWID range so only the new rows are read, not the whole season index
+        new_games = query_db(self.conn, f'SELECT ROWID AS "Row ID", Winner, Loser, "Winner Points", "Loser Points" FROM schedule NOT INDEXED WHERE ROWID > ? AND {condition} AND {PLAYED_GAMES_CONDITION} ORDER BY ROWID', (self.last_rowid,) + params)
+        if not new_games["Row ID"] and (schedule_version, schedule_rowid) == (self.schedule_version, self.schedule_rowid):
+            return 0
+
+        changes = {}
+        if new_games["Row ID"]:
+            changes = rank_games(new_games["Winner"], new_games["Loser"], new_games["Winner Points"], new_games["Loser Points"])
+            for team, change in changes.items():
+                self.running_rankings[team] = self.running_rankings.get(team, 0) + change
+            self.last_rowid = new_games["Row ID"][-1]
+        self.schedule_version = schedule_version
+        self.schedule_rowid = schedule_rowid
+
+        c.executemany(
+            'INSERT INTO ranking_totals ("Season", "Team", "Score") VALUES (?, ?, ?) ON CONFLICT ("Season", "Team") DO UPDATE SET "Score" = excluded."Score"',
+            [(self.year, team, self.running_rankings[team]) for team in changes],
+        )
+        c.execute(
+            'INSERT INTO ranking_progress ("Season", "Last ROWID", "Schedule Version", "Schedule ROWID") VALUES (?, ?, ?, ?) ON CONFLICT ("Season") DO UPDATE SET "Last ROWID" = excluded."Last ROWID", "Schedule Version" = excluded."Schedule Version", "Schedule ROWID" = excluded."Schedule ROWID"',
+            (self.year, self.last_rowid, self.schedule_version, self.schedule_rowid),
+        )
+        self.conn.commit()
+        return len(new_games["Row ID"])
+
+    def reset(self) -> None:
+        """_summary_
+        Clears the persisted totals and high-water mark so the next update reprocesses the whole season.
+        """
+        c = self.conn.cursor()
+        c.execute('DELETE FROM ranking_totals WHERE "Season" = ?', (self.year,))
+        c.execute('DELETE FROM ranking_progress WHERE "Season" = ?', (self.year,))
+        self.conn.commit()
+        self.running_rankings = {}
+        self.last_rowid = 0
+        self.schedule_version = None
+        self.schedule_rowid = None
+
+
+@instrumentation.timed()
+def calculate_running_rankings(year: int, conn=None) -> dict:
+    dict_data = query_season_games(conn or get_connection(), year)
+
+
+    running_rankings = rank_games(dict_data["Winner"], dict_data["Loser"], dict_data["Winner Points"], dict_data["Loser Points"])
+    return running_rankings
+
+@instrumentation.timed()
+def calculate_rankings_with_previous_year(year: int, running_rankings: dict, conn=None) -> dict:
+    dict_data = query_season_games(conn or get_connection(), year)
+    running_rankings_copy = rank_games(dict_data["Winner"], dict_data["Loser"], dict_data["Winner Points"], dict_data["Loser Points"], running_rankings)
     
     return running_rankings_copy
 
 
+CARRY_OVER_POLICIES = {"full": 1.0, "reset": 0.0}
+
+
+def _accepts_locations(scoring) -> bool:
+    # Scoring functions such as a ScoringPolicy take the games' Location values as a third argument
+    try:
+        parameters = list(inspect.signature(scoring).parameters.values())
+    except (TypeError, ValueError):
+        return False
+    if any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+        return True
+    return len([parameter for parameter in parameters if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)]) >= 3
+
+
+@instrumentation.timed()
+def calculate_rankings_for_seasons(first_season: int, last_season: int, carry_over="full", scoring=None, conn=None) -> dict:
+    """_summary_
+    Calculates the running rankings of a range of seasons in one call. All games are loaded with one query, every
+    season's changes are scattered into a (seasons x teams) matrix at once, and the carry-over is applied with a
+    scan over the seasons. With the full carry-over the result for each season matches chaining
+    calculate_running_rankings and calculate_rankings_with_previous_year from first_season onwards.
+    Args:
+        first_season (int): First season, by the year it starts in.
+        last_season (int): Last season, by the year it starts in.
+        carry_over (str | float, optional): "full" to keep last season's totals, "reset" to start every season from zero, or a decay factor applied to last season's totals. Defaults to "full".
+        scoring (callable, optional): Function scoring arrays of winner and loser points, and of the games' locations
+            if it takes a third argument, like a ScoringPolicy. Defaults to calculate_margin_of_victory_scores.
+        conn (sqlite3.Connection, optional): sqlite3 connection object for the database. Defaults to this thread's shared connection.
+
+    Returns:
+        dict: Dictionary mapping each season to its rankings dictionary.
+    """
+    if last_season < first_season:
+        raise ValueError(f"Invalid season range: last_season {last_season} is before first_season {first_season}")
+    if isinstance(carry_over, str):
+        if carry_over not in CARRY_OVER_POLICIES:
+            raise ValueError(f"Invalid carry-over policy: {carry_over}, expected one of {list(CARRY_OVER_POLICIES)} or a decay factor")
+        decay = CARRY_OVER_POLICIES[carry_over]
+    else:
+        decay = float(carry_over)
+    scoring = scoring or calculate_margin_of_victory_scores
+    conn = conn or get_connection()
+
+    season_sql = season_expression(conn)
+    games = query_db(conn, f'SELECT {season_sql} AS Season, Winner, Loser, "Winner Points", "Loser Points", Location FROM schedule WHERE {season_sql} BETWEEN ? AND ? AND {PLAYED_GAMES_CONDITION} ORDER BY {season_sql}, ROWID', (first_season, last_season), result_format="numpy")
+    number_of_seasons = last_season - first_season + 1
+    number_of_games = len(games["Season"])
+
+    # Interleave winner and loser so teams are indexed in the order they are first seen
+    teams_by_game = np.empty(2 * number_of_games, dtype=object)
+    teams_by_game[0::2] = games["Winner"]
+    teams_by_game[1::2] = games["Loser"]
+    codes, teams = factorize_teams(teams_by_game)
+    number_of_teams = len(teams)
+    season_index = np.repeat(games["Season"].astype(np.int64) - first_season, 2)
+
+    if _accepts_locations(scoring):
+        scores = scoring(games["Winner Points"], games["Loser Points"], games["Location"])
+    else:
+        scores = scoring(games["Winner Points"], games["Loser Points"])
+    scores = np.asarray(scores, dtype=float)
+    signed_scores = np.empty(2 * number_of_games)
+    signed_scores[0::2] = scores
+    signed_scores[1::2] = -scores
+    cells = season_index * number_of_teams + codes
+    changes = np.bincount(cells, weights=signed_scores, minlength=number_of_seasons * number_of_teams).reshape(number_of_seasons, number_of_teams)
+    # Position of each team's first game in each season, to list teams in the order they first play a season
+    first_position = np.full(number_of_seasons * number_of_teams, 2 * number_of_games)
+    np.minimum.at(first_position, cells, np.arange(2 * number_of_games))
+    first_position = first_position.reshape(number_of_seasons, number_of_teams)
+    played = first_position < 2 * number_of_games
+
+    rankings_by_season = {}
+    totals = np.zeros(number_of_teams)
+    seen = np.zeros(number_of_teams, dtype=bool)
+    for index in range(number_of_seasons):
+        totals = decay * totals + changes[index]
+        seen = played[index] if decay == 0 else seen | played[index]
+        team_indexes = np.flatnonzero(seen)
+        if decay == 0:
+            team_indexes = team_indexes[np.argsort(first_position[index, team_indexes], kind="stable")]
+        rankings_by_season[first_season + index] = dict(zip(teams[team_indexes].tolist(), totals[team_indexes].tolist()))
+    return rankings_by_season
 
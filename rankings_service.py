@@ -0,0 +1,409 @@
+"""
+Summary: This file contains the local read-only HTTP service for season rankings, team history, and name resolution.
+
+The service is a single asyncio event loop speaking HTTP/1.1 with keep-alive over one read-only SQLite connection.
+Computed season rankings are kept in memory, already encoded as JSON, in a bounded LRU keyed by (season, scoring
+policy, schedule version and database file identity). Every request reads the schedule version and stats the file,
+so the first request after the schedule table changes or the file is replaced drops the stale entries and recomputes.
+A cache hit costs a stat, one indexed read of the version, and a socket write.
+
+Endpoints:
+    GET /health                                  # schedule version, policies, and cache statistics
+    GET /rankings/<season>?policy=default&limit=25
+    GET /teams/<ID or name>/history?season=2024  # weekly ranks from rankings_history
+    GET /resolve?name=Ohio%20St.
+
+Usage:
+    python rankings_service.py --port 8000
+"""
+#IMPORTS
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+from db.db import *
+from ranking_history import get_team_rank_history
+from school_naming_information import SchoolNameResolver
+from scoring_policies import DEFAULT_POLICY, evaluate_season_policies, load_policies
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+POLICIES_PATH = os.path.join(REPO_ROOT, "data", "scoring_policies.json")
+# Seasons x policies kept computed, each entry is one season's encoded rankings
+CACHE_SIZE = 256
+# Distinct limits kept encoded per entry, other limits are encoded per request
+MAX_BODIES_PER_ENTRY = 8
+# Requests longer than this are rejected, the service only serves short GETs
+MAX_LINE_LENGTH = 8 * 1024
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class RankingsCache:
+    """_summary_
+    Bounded LRU of computed season rankings keyed by (season, policy, version), where the version is any value that
+    changes with the data, such as the schedule version.
+    Args:
+        max_entries (int, optional): Entries kept before the least recently used is evicted. Defaults to CACHE_SIZE.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.schedule_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple):
+        """_summary_
+        Gets the entry of the given key and marks it as the most recently used, or None if it is not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, entry) -> None:
+        """_summary_
+        Stores an entry, evicting the least recently used entries past max_entries.
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set_schedule_version(self, schedule_version: int) -> None:
+        """_summary_
+        Drops every entry computed from another schedule version when the version changes.
+        """
+        if schedule_version == self.schedule_version:
+            return
+        if self.schedule_version is not None:
+            self.invalidations += 1
+        self.schedule_version = schedule_version
+        for key in [key for key in self._entries if key[2] != schedule_version]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses, "evictions": self.evictions, "invalidations": self.invalidations}
+
+
+def _encode(document) -> bytes:
+    return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+
+def prepare_database(db_name: str = "db/schools.db") -> bool:
+    """_summary_
+    Sets up schedule version tracking with a normal connection. The triggers that maintain the version must exist
+    before the service opens the database read-only, and a read-only connection cannot create them.
+    Args:
+        db_name (str, optional): Database path, relative to the repository root. Defaults to "db/schools.db".
+
+    Returns:
+        bool: False if the database does not exist or could not be opened.
+    """
+    db_path = resolve_db_path(db_name)
+    if not os.path.exists(db_path):
+        print(f"Database {db_path} does not exist")
+        return False
+    conn = connect_to_db(db_path)
+    if conn is None:
+        return False
+    try:
+        ensure_schedule_version_tracking(conn)
+    finally:
+        close_connection(conn)
+    return True
+
+
+def open_read_only(db_name: str = "db/schools.db") -> sqlite3.Connection:
+    """_summary_
+    Opens the database read-only. Nothing is created or written, so run prepare_database first.
+    Args:
+        db_name (str, optional): Database path, relative to the repository root. Defaults to "db/schools.db".
+
+    Returns:
+        sqlite3.Connection: Read-only connection, or None if the database could not be opened.
+    """
+    db_path = resolve_db_path(db_name)
+    if not os.path.exists(db_path):
+        print(f"Database {db_path} does not exist")
+        return None
+    try:
+        # as_uri percent-encodes the path, so "?", "#", and "%" in it are not read as URI syntax
+        return sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    except sqlite3.Error as e:
+        print(e)
+        return None
+
+
+def database_identity(db_path: str) -> tuple:
+    """_summary_
+    Gets the inode and modification time of a database file, which change when the file is replaced or restored
+    even if the schedule version in it does not.
+    Args:
+        db_path (str): Path of the database file.
+
+    Returns:
+        tuple: (inode, modification time in nanoseconds), or None for in-memory databases and missing files.
+    """
+    if not db_path:
+        return None
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+class RankingsService:
+    """_summary_
+    Request handling of the rankings service. All requests run on the event loop's thread, one at a time, so the
+    connection, resolver, and cache are never shared between threads.
+    Args:
+        conn (sqlite3.Connection): Connection to the database, with schedule version tracking set up.
+        policies (dict, optional): Scoring policies by name. Defaults to data/scoring_policies.json plus "default".
+        cache_size (int, optional): Seasons x policies kept computed. Defaults to CACHE_SIZE.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, policies: dict = None, cache_size: int = CACHE_SIZE):
+        self.conn = conn
+        # Empty for in-memory databases
+        self.db_path = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+        identity = database_identity(self.db_path)
+        self._inode = None if identity is None else identity[0]
+        if policies is None:
+            policies = {DEFAULT_POLICY.name: DEFAULT_POLICY}
+            if os.path.exists(POLICIES_PATH):
+                policies.update(load_policies(POLICIES_PATH))
+        self.policies = policies
+        self.cache = RankingsCache(cache_size)
+        # The service is read-only, fuzzy matches are not stored as learned aliases
+        self.resolver = SchoolNameResolver(learn_aliases=False)
+
+    def schedule_version(self) -> int:
+        """_summary_
+        Reads the schedule version and invalidates the cache if it or the database file changed. get_schedule_version
+        is not used because it re-checks the triggers and commits on every call. A connection keeps reading the file
+        it opened, so the database is reopened when the file was replaced.
+        """
+        identity = database_identity(self.db_path)
+        if identity is not None and identity[0] != self._inode:
+            conn = open_read_only(self.db_path)
+            if conn is not None:
+                self.conn.close()
+                self.conn, self._inode = conn, identity[0]
+        try:
+            row = self.conn.execute("SELECT version FROM schedule_version WHERE id = 0").fetchone()
+        except sqlite3.Error:
+            row = None
+        schedule_version = None if row is None else row[0]
+        self.cache.set_schedule_version((identity, schedule_version))
+        return schedule_version
+
+    def season_rankings(self, season: int, policy: str = "default", limit: int = None) -> bytes:
+        """_summary_
+        Gets the rankings of a season under a scoring policy, from the cache or computed with evaluate_season_policies.
+        Args:
+            season (int): Year the season starts in.
+            policy (str, optional): Name of the scoring policy. Defaults to "default".
+            limit (int, optional): Number of teams to include, best first. Defaults to every team.
+
+        Returns:
+            bytes: The encoded JSON rankings document.
+        """
+        schedule_version = self.schedule_version()
+        key = (season, policy, self.cache.schedule_version)
+        entry = self.cache.get(key)
+        if entry is None:
+            rankings = evaluate_season_policies(self.conn, season, {policy: self.policies[policy]})[policy]
+            ordered = sorted(rankings.items(), key=lambda item: -item[1])
+            document = {"season": season, "policy": policy, "schedule_version": schedule_version, "teams": len(ordered),
+                        "rankings": [{"rank": rank, "team": team, "score": score} for rank, (team, score) in enumerate(ordered, start=1)]}
+            # Encoded bodies by limit, None for every team, so repeated requests are never re-encoded
+            entry = (document, {None: _encode(document)})
+            self.cache.put(key, entry)
+        document, bodies = entry
+        if limit is not None and limit >= document["teams"]:
+            limit = None
+        body = bodies.get(limit)
+        if body is None:
+            if limit < 0:
+                raise ValueError("limit must not be negative")
+            body = _encode(dict(document, rankings=document["rankings"][:limit]))
+            if len(bodies) < MAX_BODIES_PER_ENTRY:
+                bodies[limit] = body
+        return body
+
+    def team_history(self, team: str, season: int = None) -> dict:
+        """_summary_
+        Gets a team's weekly scores and ranks from rankings_history. Names are resolved to school IDs first.
+        """
+        naming_information = self.resolver.lookup(team) if self.resolver.is_loaded or self.resolver.load(self.conn) else None
+        team_id = team if naming_information is None else naming_information[2]
+        history = get_team_rank_history(self.conn, team_id, season)
+        if history is None:
+            return None
+        return {"team": team, "team_id": team_id, "history": [{"season": row[0], "week": row[1], "score": row[2], "rank": row[3]} for row in zip(history["season"], history["week"], history["score"], history["rank"])]}
+
+    def resolve_name(self, name: str) -> tuple:
+        """_summary_
+        Resolves a school name to its canonical name, aliases, and ID.
+
+        Returns:
+            tuple: Status code and document, with the closest schools when the name is not found.
+        """
+        if not self.resolver.is_loaded and not self.resolver.load(self.conn):
+            return 404, {"error": "The schools table could not be loaded"}
+        naming_information = self.resolver.lookup(name)
+        if naming_information is None:
+            candidates = [{"canonical_name": candidate[0], "id": candidate[2], "score": candidate[3]} for candidate in self.resolver.candidates(name, 3)]
+            return 404, {"error": f"No school found for {name!r}", "candidates": candidates}
+        canonical_name, aliases, ID = naming_information
+        return 200, {"name": name, "canonical_name": canonical_name, "aliases": aliases, "id": ID}
+
+    def handle_request(self, method: str, target: str) -> tuple:
+        """_summary_
+        Routes one request.
+        Args:
+            method (str): HTTP method.
+            target (str): Request target, the path and query string.
+
+        Returns:
+            tuple: Status code and encoded JSON body.
+        """
+        if method != "GET":
+            return 405, _encode({"error": "Only GET is supported"})
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if parts == ["health"]:
+                return 200, _encode({"status": "ok", "schedule_version": self.schedule_version(), "policies": list(self.policies), "cache": self.cache.stats()})
+
+            if len(parts) == 2 and parts[0] == "rankings":
+                policy = query.get("policy", DEFAULT_POLICY.name)
+                if policy not in self.policies:
+                    return 400, _encode({"error": f"Unknown policy {policy!r}", "policies": list(self.policies)})
+                return 200, self.season_rankings(int(parts[1]), policy, int(query["limit"]) if "limit" in query else None)
+
+            if len(parts) == 3 and parts[0] == "teams" and parts[2] == "history":
+                if not get_table_columns(self.conn, "rankings_history"):
+                    return 404, _encode({"error": "rankings_history has not been materialized, run materialize_rankings_history"})
+                history = self.team_history(parts[1], int(query["season"]) if "season" in query else None)
+                if not history or not history["history"]:
+                    return 404, _encode({"error": f"No history for {parts[1]!r}"})
+                return 200, _encode(history)
+
+            if parts == ["resolve"]:
+                if "name" not in query:
+                    return 400, _encode({"error": "The name parameter is required"})
+                status, document = self.resolve_name(query["name"])
+                return status, _encode(document)
+        except ValueError as e:
+            return 400, _encode({"error": str(e)})
+        except Exception as e:
+            print(f"Error handling {target}: {e}")
+            return 500, _encode({"error": "Internal error"})
+        return 404, _encode({"error": f"No endpoint {url.path}"})
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """_summary_
+        Serves the requests of one connection until the client closes it or asks to.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+                if len(request_line) > MAX_LINE_LENGTH or len(request_line.split()) != 3:
+                    status, body, version = 400, _encode({"error": "Malformed request"}), "HTTP/1.0"
+                else:
+                    method, target, version = request_line.decode("latin-1").split()
+                    # Bodies are never used, they are read so the next request on the connection starts in the right place
+                    if int(headers.get("content-length", 0) or 0):
+                        await reader.readexactly(int(headers["content-length"]))
+                    status, body = self.handle_request(method, target)
+                keep_alive = headers.get("connection", "keep-alive" if version == "HTTP/1.1" else "close") == "keep-alive"
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.base_events.Server:
+        """_summary_
+        Starts listening on the running event loop. Port 0 picks a free port.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE_LENGTH * 2, reuse_address=True)
+
+
+def run_service(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, db_name: str = "db/schools.db", cache_size: int = CACHE_SIZE) -> int:
+    """_summary_
+    Runs the service until interrupted.
+    Args:
+        host (str, optional): Address to listen on. Defaults to 127.0.0.1, so the service is local only.
+        port (int, optional): Port to listen on. Defaults to 8000.
+        db_name (str, optional): Database path, relative to the repository root. Defaults to "db/schools.db".
+        cache_size (int, optional): Seasons x policies kept computed. Defaults to CACHE_SIZE.
+
+    Returns:
+        int: Exit status, 1 if the database could not be opened.
+    """
+    if not prepare_database(db_name):
+        return 1
+    conn = open_read_only(db_name)
+    if conn is None:
+        return 1
+    service = RankingsService(conn, cache_size=cache_size)
+
+    async def serve():
+        server = await service.start(host, port)
+        print(f"Serving rankings from {resolve_db_path(db_name)} on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.conn.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve season rankings, team history, and name resolution over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on, 0 for a free port")
+    parser.add_argument("--db", default="db/schools.db", help="database to serve")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="seasons x policies kept computed")
+    args = parser.parse_args(argv)
+    return run_service(args.host, args.port, args.db, args.cache_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
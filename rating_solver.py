@@ -0,0 +1,236 @@
+"""
+Summary: This file contains the opponent-adjusted rating engines (Colley and Massey methods).
+
+The season's games are turned into a sparse linear system over the teams that played, stored in CSR form, so
+memory grows with the number of games rather than the number of teams squared. The system is solved with
+conjugate gradients in plain NumPy, or with SciPy's sparse direct solver when it is installed.
+"""
+#IMPORTS
+import numpy as np
+from db.db import *
+from ranking_system import PLAYED_GAMES_CONDITION, season_filter
+
+RATING_METHODS = ("colley", "massey")
+SOLVERS = ("cg", "direct")
+
+
+class CSRMatrix:
+    """_summary_
+    Minimal compressed sparse row matrix, enough to run conjugate gradients without SciPy.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, size: int):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.size = size
+        self._rows = np.repeat(np.arange(size), np.diff(indptr))
+
+    @classmethod
+    def from_entries(cls, rows: np.ndarray, columns: np.ndarray, values: np.ndarray, size: int) -> "CSRMatrix":
+        """_summary_
+        Builds the matrix from (row, column, value) entries, summing duplicate entries.
+        Args:
+            rows (np.ndarray): Row of each entry.
+            columns (np.ndarray): Column of each entry.
+            values (np.ndarray): Value of each entry.
+            size (int): Number of rows and columns.
+
+        Returns:
+            CSRMatrix: The square matrix.
+        """
+        keys, inverse = np.unique(rows.astype(np.int64) * size + columns, return_inverse=True)
+        data = np.bincount(inverse, weights=values, minlength=len(keys))
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // size, minlength=size), out=indptr[1:])
+        return cls(indptr, keys % size, data, size)
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        return np.bincount(self._rows, weights=self.data * x[self.indices], minlength=self.size)
+
+    def to_scipy(self):
+        from scipy import sparse
+
+        return sparse.csr_matrix((self.data, self.indices, self.indptr), shape=(self.size, self.size))
+
+
+def build_game_graph(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, teams: list = None) -> dict:
+    """_summary_
+    Maps the teams of every game to integer indices.
+    Args:
+        Winning_Teams (array-like): Winner of each game.
+        Losing_Teams (array-like): Loser of each game.
+        Winning_Team_Points (array-like): Points scored by the winner of each game.
+        Losing_Team_Points (array-like): Points scored by the loser of each game.
+        teams (list, optional): Teams to rate even if they did not play, e.g. every school. Defaults to the teams in the games.
+
+    Returns:
+        dict: Dictionary with the team list, the winner and loser index of each game, and each game's point margin.
+    """
+    import pandas as pd
+
+    known_teams = list(teams) if teams is not None else []
+    codes, team_list = pd.factorize(np.concatenate([np.asarray(known_teams, dtype=object), np.asarray(Winning_Teams, dtype=object), np.asarray(Losing_Teams, dtype=object)]))
+    number_of_games = len(Winning_Teams)
+    game_codes = codes[len(known_teams):]
+    return {
+        "teams": team_list.tolist(),
+        "winners": game_codes[:number_of_games],
+        "losers": game_codes[number_of_games:],
+        "margins": np.asarray(Winning_Team_Points, dtype=float) - np.asarray(Losing_Team_Points, dtype=float),
+    }
+
+
+def _games_played_matrix(graph: dict, diagonal_offset: float) -> CSRMatrix:
+    """_summary_
+    Builds the matrix with games played (plus the offset) on the diagonal and minus the games between each pair off the diagonal.
+    """
+    size = len(graph["teams"])
+    winners = graph["winners"]
+    losers = graph["losers"]
+    ones = np.ones(len(winners))
+    rows = np.concatenate([winners, losers, winners, losers, np.arange(size)])
+    columns = np.concatenate([winners, losers, losers, winners, np.arange(size)])
+    values = np.concatenate([ones, ones, -ones, -ones, np.full(size, diagonal_offset)])
+    return CSRMatrix.from_entries(rows, columns, values, size)
+
+
+def build_colley_system(graph: dict) -> tuple:
+    """_summary_
+    Builds the Colley system C r = b, with C = 2I + games played - games between teams and b = 1 + (wins - losses) / 2.
+
+    Returns:
+        tuple: The CSR matrix and the right-hand side.
+    """
+    size = len(graph["teams"])
+    wins = np.bincount(graph["winners"], minlength=size)
+    losses = np.bincount(graph["losers"], minlength=size)
+    return _games_played_matrix(graph, 2.0), 1 + (wins - losses) / 2
+
+
+def build_massey_system(graph: dict) -> tuple:
+    """_summary_
+    Builds the Massey system M r = p, with M = games played - games between teams and p = each team's total point differential.
+    M is singular; its minimum-norm solution gives ratings that sum to zero within each connected group of teams.
+
+    Returns:
+        tuple: The CSR matrix and the right-hand side.
+    """
+    size = len(graph["teams"])
+    margins = graph["margins"]
+    differentials = np.bincount(graph["winners"], weights=margins, minlength=size) - np.bincount(graph["losers"], weights=margins, minlength=size)
+    return _games_played_matrix(graph, 0.0), differentials
+
+
+def conjugate_gradient(matrix: CSRMatrix, b: np.ndarray, tolerance: float = 1e-10, max_iterations: int = None) -> np.ndarray:
+    """_summary_
+    Solves a symmetric positive (semi-)definite system with conjugate gradients starting from zero.
+    For a consistent singular system this converges to the minimum-norm solution.
+    Args:
+        matrix (CSRMatrix): Matrix of the system.
+        b (np.ndarray): Right-hand side.
+        tolerance (float, optional): Relative residual to stop at. Defaults to 1e-10.
+        max_iterations (int, optional): Maximum iterations. Defaults to ten times the number of unknowns.
+
+    Returns:
+        np.ndarray: Solution of the system.
+    """
+    x = np.zeros(len(b))
+    b_norm = np.linalg.norm(b)
+    if b_norm == 0:
+        return x
+    residual = b.astype(float)
+    direction = residual.copy()
+    residual_squared = residual @ residual
+    for _ in range(max_iterations or 10 * len(b)):
+        matrix_direction = matrix.dot(direction)
+        step = residual_squared / (direction @ matrix_direction)
+        x += step * direction
+        residual -= step * matrix_direction
+        new_residual_squared = residual @ residual
+        if np.sqrt(new_residual_squared) <= tolerance * b_norm:
+            break
+        direction = residual + (new_residual_squared / residual_squared) * direction
+        residual_squared = new_residual_squared
+    return x
+
+
+def _solve_direct(matrix: CSRMatrix, b: np.ndarray, method: str) -> np.ndarray:
+    # SciPy takes longer to import than the rest of the module, so it is loaded only for the direct solver
+    try:
+        from scipy import sparse
+        from scipy.sparse import csgraph
+        from scipy.sparse import linalg as sparse_linalg
+    except ImportError:
+        raise ImportError("scipy is required for the direct solver")
+    scipy_matrix = matrix.to_scipy()
+    if method == "massey":
+        # M has one null vector per connected group of teams, so the last equation of each group is replaced with
+        # sum(r) = 0 over the group. A team without games is its own group and is pinned to 0, as with CG.
+        size = matrix.size
+        number_of_groups, groups = csgraph.connected_components(scipy_matrix, directed=False)
+        last_of_group = np.full(number_of_groups, -1)
+        np.maximum.at(last_of_group, groups, np.arange(size))
+        replaced = np.zeros(size, dtype=bool)
+        replaced[last_of_group] = True
+        entries = scipy_matrix.tocoo()
+        kept = ~replaced[entries.row]
+        rows = np.concatenate([entries.row[kept], last_of_group[groups]])
+        columns = np.concatenate([entries.col[kept], np.arange(size)])
+        values = np.concatenate([entries.data[kept], np.ones(size)])
+        scipy_matrix = sparse.csr_matrix((values, (rows, columns)), shape=(size, size))
+        b = b.copy()
+        b[last_of_group] = 0
+    return sparse_linalg.spsolve(scipy_matrix.tocsc(), b)
+
+
+def solve_ratings(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, method: str = "colley", solver: str = "cg", teams: list = None) -> dict:
+    """_summary_
+    Calculates opponent-adjusted ratings for the given games.
+    Args:
+        Winning_Teams (array-like): Winner of each game.
+        Losing_Teams (array-like): Loser of each game.
+        Winning_Team_Points (array-like): Points scored by the winner of each game.
+        Losing_Team_Points (array-like): Points scored by the loser of each game.
+        method (str, optional): "colley" (wins and losses only) or "massey" (point margins). Defaults to "colley".
+        solver (str, optional): "cg" for conjugate gradients in NumPy or "direct" for SciPy's sparse solver. Defaults to "cg".
+        teams (list, optional): Teams to rate even if they did not play. Defaults to the teams in the games.
+
+    Returns:
+        dict: Dictionary mapping each team to its rating, best first.
+    """
+    if method not in RATING_METHODS:
+        raise ValueError(f"Invalid rating method: {method}, expected one of {RATING_METHODS}")
+    if solver not in SOLVERS:
+        raise ValueError(f"Invalid solver: {solver}, expected one of {SOLVERS}")
+
+    graph = build_game_graph(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, teams)
+    if not graph["teams"]:
+        return {}
+    matrix, b = build_colley_system(graph) if method == "colley" else build_massey_system(graph)
+    ratings = _solve_direct(matrix, b, method) if solver == "direct" else conjugate_gradient(matrix, b)
+
+    order = np.argsort(-ratings, kind="stable")
+    return {graph["teams"][i]: float(ratings[i]) for i in order}
+
+
+def calculate_season_ratings(conn: sqlite3.Connection, year: int, method: str = "colley", solver: str = "cg", include_all_schools: bool = False) -> dict:
+    """_summary_
+    Calculates opponent-adjusted ratings for every team in the season starting in August of the given year.
+    Teams are keyed by school ID, or by name for games whose team could not be resolved to an ID.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        year (int): Year the season starts in.
+        method (str, optional): "colley" or "massey". Defaults to "colley".
+        solver (str, optional): "cg" or "direct". Defaults to "cg".
+        include_all_schools (bool, optional): Also rate every school in the schools table, including those without games. Defaults to False.
+
+    Returns:
+        dict: Dictionary mapping each team to its rating, best first.
+    """
+    condition, params = season_filter(conn, year)
+    games = query_db(conn, f'SELECT COALESCE("Winner ID", Winner) AS "Winner Key", COALESCE("Loser ID", Loser) AS "Loser Key", "Winner Points", "Loser Points" FROM schedule WHERE {condition} AND {PLAYED_GAMES_CONDITION}', params)
+    teams = None
+    if include_all_schools:
+        teams = query_db(conn, 'SELECT "ID" FROM schools ORDER BY ROWID')["ID"]
+    return solve_ratings(games["Winner Key"], games["Loser Key"], games["Winner Points"], games["Loser Points"], method, solver, teams)
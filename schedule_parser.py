@@ -0,0 +1,277 @@
+"""
+Summary: This file contains the streaming parser for the Sports-Reference schedule table.
+
+Only the rows of table#schedule are extracted and each played game is yielded as a typed ScheduleGame as soon as
+its row closes. lxml's C pull parser is used when it is installed, otherwise the standard library tokenizer.
+Parsing stops at the end of the schedule table, so the rest of the page is never tokenized.
+"""
+#IMPORTS
+import re
+import time
+import tracemalloc
+from html.parser import HTMLParser
+from typing import NamedTuple
+import instrumentation
+from school_naming_information import month_number_from_month_abbreviation
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+PARSER_BACKENDS = ("auto", "lxml", "html.parser")
+RANK_PREFIX = re.compile(r"^\(\d+\)\s*")
+# Feed pages to the tokenizer in pieces this size so rows are yielded while the rest of the page is unread
+CHUNK_SIZE = 64 * 1024
+
+
+class ScheduleGame(NamedTuple):
+    week: int
+    date: str
+    time: str
+    day_name: str
+    winner: str
+    winner_points: int
+    location: str
+    loser: str
+    loser_points: int
+    notes: str
+    year: int
+    month: int
+    day: int
+
+
+def strip_rank(team_name: str) -> str:
+    """_summary_
+    Removes the AP ranking prefix, e.g. "(10) Florida State" -> "Florida State".
+    Args:
+        team_name (str): Team name as shown on Sports-Reference.
+    """
+    return RANK_PREFIX.sub("", team_name)
+
+
+def game_from_cells(cells: list) -> ScheduleGame:
+    """_summary_
+    Converts the td texts of one schedule row into a ScheduleGame.
+    Args:
+        cells (list): Texts of the row's td cells: week, date, time, day, winner, points, location, loser, points, notes.
+
+    Returns:
+        ScheduleGame: The game, or None if the row is a header row or the game has not been played.
+    """
+    if len(cells) < 9:
+        return None
+    Winner_Score = cells[5].strip()
+    Loser_Score = cells[8].strip()
+    # Unplayed games have no score; games with a 0 score are skipped as the scraper always has
+    if not Winner_Score.isdigit() or not Loser_Score.isdigit() or Winner_Score == "0" or Loser_Score == "0":
+        return None
+
+    Date = cells[1].strip()
+    date_split = Date.replace(",", "").split(" ")
+    Week = cells[0].strip()
+    return ScheduleGame(
+        week=int(Week) if Week.isdigit() else None,
+        date=Date,
+        time=cells[2].strip(),
+        day_name=cells[3].strip(),
+        winner=strip_rank(cells[4].strip()),
+        winner_points=int(Winner_Score),
+        location=cells[6].strip(),
+        loser=strip_rank(cells[7].strip()),
+        loser_points=int(Loser_Score),
+        notes=cells[9].strip() if len(cells) > 9 else "",
+        year=int(date_split[2]),
+        month=month_number_from_month_abbreviation(date_split[0]),
+        day=int(date_split[1]),
+    )
+
+
+def _iter_chunks(html):
+    """_summary_
+    Splits a page into chunks for the tokenizers. Iterables of chunks, such as a streamed response, pass through.
+    """
+    if isinstance(html, (str, bytes)):
+        for start in range(0, len(html), CHUNK_SIZE):
+            yield html[start:start + CHUNK_SIZE]
+    else:
+        yield from html
+
+
+class _ScheduleTableParser(HTMLParser):
+    """_summary_
+    Standard library tokenizer that collects the td texts of every row inside table#schedule.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.finished = False
+        self._table_depth = 0
+        self._row = None
+        self._cell = None
+
+    def _close_cell(self):
+        if self._cell is not None:
+            self._row.append("".join(self._cell))
+            self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self._table_depth:
+                self._table_depth += 1
+            elif not self.finished and ("id", "schedule") in attrs:
+                self._table_depth = 1
+        elif not self._table_depth:
+            return
+        elif tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._close_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if not self._table_depth:
+            return
+        if tag == "td":
+            if self._row is not None:
+                self._close_cell()
+        elif tag == "tr":
+            if self._row is not None:
+                self._close_cell()
+                self.rows.append(self._row)
+                self._row = None
+        elif tag == "table":
+            self._table_depth -= 1
+            self.finished = self._table_depth == 0
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _iter_rows_html_parser(chunks):
+    parser = _ScheduleTableParser()
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8", errors="replace")
+        parser.feed(chunk)
+        yield from parser.rows
+        parser.rows.clear()
+        if parser.finished:
+            return
+    parser.close()
+    yield from parser.rows
+
+
+def _iter_rows_lxml(chunks):
+    # Only table and tr events are needed, filtering the rest in C keeps the Python loop short
+    parser = etree.HTMLPullParser(events=("start", "end"), tag=("table", "tr"))
+    table_depth = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == "start":
+                if element.tag == "table" and (table_depth or element.get("id") == "schedule"):
+                    table_depth += 1
+                continue
+            if element.tag == "tr" and table_depth:
+                yield ["".join(cell.itertext()) for cell in element if cell.tag == "td"]
+                element.clear()
+            elif element.tag == "table" and table_depth:
+                table_depth -= 1
+                if not table_depth:
+                    return
+            elif not table_depth:
+                # Drop other tables as they are parsed so memory stays flat
+                element.clear()
+    parser.close()
+
+
+def parse_schedule(html, backend: str = "auto"):
+    """_summary_
+    Streams the played games out of a Sports-Reference schedule page.
+    Args:
+        html (str | bytes | iterable): The page, or an iterable of chunks of it such as a streamed response.
+        backend (str, optional): "lxml", "html.parser", or "auto" to use lxml when it is installed. Defaults to "auto".
+
+    Yields:
+        ScheduleGame: Each played game in page order.
+    """
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Invalid parser backend: {backend}, expected one of {PARSER_BACKENDS}")
+    if backend == "lxml" and etree is None:
+        raise ImportError("lxml is not installed")
+    if backend == "auto":
+        backend = "lxml" if etree is not None else "html.parser"
+
+    iter_rows = _iter_rows_lxml if backend == "lxml" else _iter_rows_html_parser
+    rows = 0
+    for cells in iter_rows(_iter_chunks(html)):
+        # Header rows have no td cells
+        rows += bool(cells)
+        game = game_from_cells(cells)
+        if game is not None:
+            yield game
+    instrumentation.count(instrumentation.ROWS_PARSED, rows)
+
+
+def _parse_with_beautifulsoup(html: str) -> list:
+    """_summary_
+    The previous BeautifulSoup html.parser implementation, kept as the benchmark baseline.
+    """
+    import bs4 as bs
+
+    soup = bs.BeautifulSoup(html, features="html.parser")
+    table = soup.find_all("table", {"id": "schedule"})[0]
+    games = []
+    for row in table.find_all("tr")[1:]:
+        game = game_from_cells([data.text for data in row.find_all("td")])
+        if game is not None:
+            games.append(game)
+    return games
+
+
+def benchmark_schedule_parsers(html: str, repeat: int = 5) -> dict:
+    """_summary_
+    Times every available parser backend on the given page and measures its peak memory with tracemalloc.
+    Args:
+        html (str): A saved schedule page.
+        repeat (int, optional): Number of timed runs per backend, the fastest is reported. Defaults to 5.
+
+    Returns:
+        dict: Dictionary mapping each backend to its games parsed, best time in milliseconds, and peak memory in KiB.
+    """
+    parsers = {"html.parser": lambda page: list(parse_schedule(page, "html.parser"))}
+    if etree is not None:
+        parsers["lxml"] = lambda page: list(parse_schedule(page, "lxml"))
+    try:
+        import bs4  # noqa: F401
+        parsers["beautifulsoup (previous)"] = _parse_with_beautifulsoup
+    except ImportError:
+        pass
+
+    results = {}
+    for name, parse in parsers.items():
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            games = parse(html)
+            timings.append((time.perf_counter() - start_time) * 1000)
+        tracemalloc.start()
+        parse(html)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"games": len(games), "time_ms": min(timings), "peak_kib": peak / 1024}
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        print(path)
+        for name, result in benchmark_schedule_parsers(page).items():
+            print(f"    {name:<26} {result['games']:>6} games {result['time_ms']:>10.2f} ms {result['peak_kib']:>12.1f} KiB peak")
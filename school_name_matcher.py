@@ -0,0 +1,131 @@
+"""
+Summary: This file contains the fuzzy school name matcher used when a scraped name is not a known name or alias.
+
+Every known name is reduced to its trigram key and broken into character trigrams once, and an inverted index maps each trigram to
+the names containing it. A lookup counts the trigrams the query shares with every name in one bincount over the
+posting lists of the query's trigrams and scores them with the Dice coefficient, so it never scans the names.
+"""
+#IMPORTS
+import os
+import re
+import numpy as np
+
+NAMES_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "names.txt")
+# Whole-word abbreviations expanded before matching, so "Arkansas St." and "Arkansas State" share their trigrams
+# and "A&M", "A & M", and "A and M" all become "a m"
+NAME_ABBREVIATIONS = {"st": "state", "univ": "university", "col": "college", "coll": "college", "int": "international", "intl": "international", "fla": "florida", "and": ""}
+NON_NAME_CHARACTERS = re.compile(r"[^a-z0-9]+")
+
+
+def trigram_key(school_name: str) -> str:
+    """_summary_
+    Gets the key a school name is matched on: lowercased, without punctuation, and with common abbreviations
+    expanded, e.g. "Fla. Int." -> "florida international". Display names are cleaned up by
+    school_naming_information.normalize_school_name instead.
+    """
+    words = NON_NAME_CHARACTERS.sub(" ", school_name.lower()).split()
+    return " ".join(filter(None, (NAME_ABBREVIATIONS.get(word, word) for word in words)))
+
+
+def name_trigrams(key: str) -> set:
+    """_summary_
+    Gets the set of character trigrams of a name's trigram_key, padded so the first and last letters count.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def read_names_file(path: str = NAMES_FILE_PATH) -> list:
+    """_summary_
+    Reads a pipe-separated names file, one school per line with its canonical name first.
+    Args:
+        path (str, optional): Path of the names file. Defaults to data/names.txt.
+
+    Returns:
+        list: List of name lists, empty if the file does not exist.
+    """
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return [[name.strip() for name in line.split("|") if name.strip()] for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+class TrigramIndex:
+    """_summary_
+    Inverted trigram index over names, each pointing to a hashable value such as a school entry.
+    Add every name, then call build() once before searching.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.values = []
+        self._name_keys = {}
+        self._postings = {}
+        self._trigram_counts = None
+
+    def add(self, name: str, value) -> None:
+        """_summary_
+        Adds a name for the given value. Names that normalize to one already added are ignored, the first value wins.
+        """
+        key = trigram_key(name)
+        if not key or key in self._name_keys:
+            return
+        self._name_keys[key] = len(self.names)
+        self.names.append(key)
+        self.values.append(value)
+
+    def build(self) -> "TrigramIndex":
+        """_summary_
+        Builds the posting list of every trigram as a NumPy array of name indices.
+        """
+        postings = {}
+        trigram_counts = np.zeros(len(self.names), dtype=np.int32)
+        for name_index, name in enumerate(self.names):
+            trigrams = name_trigrams(name)
+            trigram_counts[name_index] = len(trigrams)
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(name_index)
+        self._postings = {trigram: np.array(indices, dtype=np.int32) for trigram, indices in postings.items()}
+        self._trigram_counts = trigram_counts
+        return self
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, school_name: str, limit: int = 5, min_score: float = 0.0) -> list:
+        """_summary_
+        Finds the names most similar to the given name by the Dice coefficient of their trigram sets.
+        Args:
+            school_name (str): Name to match.
+            limit (int, optional): Maximum number of distinct values to return. Defaults to 5.
+            min_score (float, optional): Lowest score to return, between 0 and 1. Defaults to 0.0.
+
+        Returns:
+            list: List of (value, score, matched name) tuples, best first, one per distinct value.
+        """
+        query = trigram_key(school_name)
+        if not query or not self.names:
+            return []
+        trigrams = name_trigrams(query)
+        posting_lists = [self._postings[trigram] for trigram in trigrams if trigram in self._postings]
+        if not posting_lists:
+            return []
+        shared = np.bincount(np.concatenate(posting_lists), minlength=len(self.names))
+        candidates = np.flatnonzero(shared)
+        scores = 2.0 * shared[candidates] / (len(trigrams) + self._trigram_counts[candidates])
+        order = np.argsort(-scores, kind="stable")
+
+        results = []
+        seen_values = set()
+        for candidate_index in order:
+            score = float(scores[candidate_index])
+            if score < min_score or len(results) == limit:
+                break
+            name_index = candidates[candidate_index]
+            value = self.values[name_index]
+            if value in seen_values:
+                continue
+            seen_values.add(value)
+            results.append((value, score, self.names[name_index]))
+        return results
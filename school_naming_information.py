@@ -1,6 +1,15 @@
 from db.db import *
+from db.connection_manager import get_connection
 import os
-import pandas as pd
+import re
+import sqlite3
+import string
+import instrumentation
+from school_name_matcher import NAMES_FILE_PATH, TrigramIndex, read_names_file
+
+
+MONTH_NUMBERS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
+SCHEDULE_COLUMNS = ["Winner", "Loser", "Winner Points", "Loser Points", "Location", "Date", "Time", "Day", "Week", "Year", "Month", "Winner ID", "Loser ID"]
 
 
 def month_number_from_month_abbreviation(month_abbreviation: str) -> int:
@@ -9,117 +18,341 @@ def month_number_from_month_abbreviation(month_abbreviation: str) -> int:
     Args:
         month_abbreviation (str): Abbreviation of the month to get the number for.
     """
-    months = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+    months = list(MONTH_NUMBERS.keys())
     if type(month_abbreviation) != str:
         raise ValueError(f"Invalid type for month abbreviation: {type(month_abbreviation)}, expected str")
     if month_abbreviation.lower() not in months:
         raise ValueError(f"Invalid month abbreviation: {month_abbreviation}, expected one of {months}")
     
-    months = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
-    return months[month_abbreviation.lower()]
+    return MONTH_NUMBERS[month_abbreviation.lower()]
+
+RANK_PREFIX = re.compile(r"^\s*\(\d+\)\s*")
+# Stray marks stripped from either end of a name. Periods, parentheses, and quotes end real names such as
+# "Florida St.", "Miami (FL)", and 'Georgia "B"', so they are kept
+SURROUNDING_PUNCTUATION = "*#,;:!?" + string.whitespace
+
+
+def normalize_school_name(school_name: str) -> str:
+    """_summary_
+    Normalizes a scraped school name before it is matched or learned: removes the AP ranking prefix and the
+    whitespace and punctuation around the name, e.g. "(10) Florida State*" -> "Florida State".
+    Args:
+        school_name (str): Name of the school as scraped.
+
+    Returns:
+        str: The normalized name.
+    """
+    return RANK_PREFIX.sub("", school_name).strip(SURROUNDING_PUNCTUATION)
+
+# Lowest Dice score a fuzzy match needs to be accepted, and how far ahead of the runner-up school it has to be
+FUZZY_MATCH_THRESHOLD = 0.8
+FUZZY_MATCH_MARGIN = 0.1
+
 
-def get_school_naming_infomation(school_name):
+def create_learned_aliases_table(conn: sqlite3.Connection) -> None:
+    """_summary_
+    Creates the school_aliases_learned table of names resolved by fuzzy matching if it does not exist.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+    """
+    c = conn.cursor()
+    c.execute('CREATE TABLE IF NOT EXISTS school_aliases_learned ("Alias" TEXT PRIMARY KEY, "ID" TEXT NOT NULL, "Score" REAL, "Learned At" TEXT DEFAULT CURRENT_TIMESTAMP)')
+    conn.commit()
+
+
+class SchoolNameResolver:
+    """_summary_
+    In-memory index of the schools table used to resolve school names without a database round trip.
+
+    The table is read once and turned into hash maps: one keyed by canonical name and one keyed by every alias,
+    including the aliases learned from earlier fuzzy matches. Names that miss both are matched against a trigram
+    index over the schools table and data/names.txt; when learning is on, a confident match is stored in
+    school_aliases_learned so it is an exact hit next time. Names are normalized with normalize_school_name before
+    they are matched or learned. Lookups keep the (canonical name, aliases, ID) contract of
+    get_school_naming_infomation. Call invalidate() after the schools table changes so the next lookup reloads it.
+    Args:
+        names_file_path (str, optional): Pipe-separated names file with more aliases. Defaults to data/names.txt.
+        learn_aliases (bool, optional): Store confident fuzzy matches in school_aliases_learned. Defaults to False, only the import and scrape paths learn.
+    """
+
+    def __init__(self, names_file_path: str = NAMES_FILE_PATH, learn_aliases: bool = False):
+        self.names_file_path = names_file_path
+        self.learn_aliases = learn_aliases
+        self._rows = None
+        self._canonical_index = {}
+        self._alias_index = {}
+        self._id_index = {}
+        self._trigram_index = None
+        self._conn = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._rows is not None
+
+    def load(self, conn: sqlite3.Connection = None) -> bool:
+        """_summary_
+        Loads the schools table and the learned aliases and builds the canonical name and alias indexes.
+        Args:
+            conn (sqlite3.Connection, optional): Connection to read the schools table from, and to store learned aliases through. Defaults to this thread's shared connection to the schools database.
+
+        Returns:
+            bool: True if the table was loaded, False otherwise.
+        """
+        shared_connection = conn is None
+        if conn is None:
+            conn = get_connection()
+            if conn is None:
+                return False
+
+        schools = query_db(conn, 'SELECT "ID", "Canonical Name", "Aliases" FROM schools ORDER BY ROWID')
+        learned_aliases = None
+        if get_table_columns(conn, "school_aliases_learned"):
+            learned_aliases = query_db(conn, 'SELECT "Alias", "ID" FROM school_aliases_learned ORDER BY ROWID')
+        if schools is None:
+            return False
+
+        rows = []
+        canonical_index = {}
+        alias_index = {}
+        id_index = {}
+        for ID, canonical_name, raw_aliases in zip(schools["ID"], schools["Canonical Name"], schools["Aliases"]):
+            if raw_aliases is None:
+                aliases = ()
+            else:
+                aliases = tuple(alias for alias in raw_aliases.split(",") if alias != " ")
+            entry = (canonical_name, aliases, ID)
+            rows.append(entry)
+            # The first row wins, matching the ROWID order SQLite returned rows in
+            canonical_index.setdefault(canonical_name, entry)
+            id_index.setdefault(ID, entry)
+            for alias in aliases:
+                alias_key = alias.strip().lower()
+                if alias_key:
+                    alias_index.setdefault(alias_key, entry)
+        if learned_aliases is not None:
+            for alias, ID in zip(learned_aliases["Alias"], learned_aliases["ID"]):
+                if ID in id_index:
+                    alias_index.setdefault(alias, id_index[ID])
+
+        self._rows = rows
+        self._canonical_index = canonical_index
+        self._alias_index = alias_index
+        self._id_index = id_index
+        self._trigram_index = None
+        self._conn = None if shared_connection else conn
+        return True
+
+    def invalidate(self) -> None:
+        """_summary_
+        Drops the cached indexes so the schools table is read again on the next lookup.
+        """
+        self._rows = None
+        self._canonical_index = {}
+        self._alias_index = {}
+        self._id_index = {}
+        self._trigram_index = None
+        self._conn = None
+
+    def _get_trigram_index(self) -> TrigramIndex:
+        """_summary_
+        Builds the trigram index on first use: canonical names, aliases, and every name of the names file whose
+        canonical name is in the schools table.
+        """
+        if self._trigram_index is None:
+            trigram_index = TrigramIndex()
+            for entry in self._rows:
+                canonical_name, aliases, _ = entry
+                trigram_index.add(canonical_name, entry)
+                for alias in aliases:
+                    trigram_index.add(alias, entry)
+            for names in read_names_file(self.names_file_path):
+                entry = self._canonical_index.get(names[0])
+                if entry is not None:
+                    for name in names:
+                        trigram_index.add(name, entry)
+            self._trigram_index = trigram_index.build()
+        return self._trigram_index
+
+    def candidates(self, school_name: str, limit: int = 5) -> list:
+        """_summary_
+        Ranks the schools whose names are most similar to the given name.
+        Args:
+            school_name (str): Name to match.
+            limit (int, optional): Maximum number of schools to return. Defaults to 5.
+
+        Returns:
+            list: List of (canonical name, aliases, ID, score) tuples, best first. Scores are Dice coefficients between 0 and 1.
+        """
+        if not self.is_loaded and not self.load():
+            return []
+        return [(canonical_name, list(aliases), ID, score) for (canonical_name, aliases, ID), score, _ in self._get_trigram_index().search(normalize_school_name(school_name), limit)]
+
+    def learn_alias(self, school_name: str, ID: str, score: float = None, conn: sqlite3.Connection = None) -> bool:
+        """_summary_
+        Stores a name as an alias of the school with the given ID in school_aliases_learned, so it resolves exactly from now on.
+        Args:
+            school_name (str): Name to learn.
+            ID (str): ID of the school the name belongs to.
+            score (float, optional): Fuzzy match score the alias was learned with. Defaults to None for manual aliases.
+            conn (sqlite3.Connection, optional): Connection to store the alias through. Defaults to the connection the resolver was loaded from, or this thread's shared connection.
+
+        Returns:
+            bool: True if the alias was stored, False otherwise.
+        """
+        if not self.is_loaded and not self.load():
+            return False
+        entry = self._id_index.get(ID)
+        alias_key = normalize_school_name(school_name).lower()
+        if entry is None or not alias_key:
+            return False
+        self._alias_index[alias_key] = entry
+
+        conn = conn or self._conn or get_connection()
+        if conn is None:
+            return False
+        try:
+            create_learned_aliases_table(conn)
+            conn.execute('INSERT OR REPLACE INTO school_aliases_learned ("Alias", "ID", "Score") VALUES (?, ?, ?)', (alias_key, ID, score))
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error learning alias '{school_name}': {e}")
+            return False
+
+    def lookup(self, school_name: str, learn_aliases: bool = None) -> tuple:
+        """_summary_
+        Resolves the given school name against the cached schools table, falling back to a fuzzy match.
+        Args:
+            school_name (str): Canonical name or alias of the school, with or without a ranking prefix.
+            learn_aliases (bool, optional): Store a confident fuzzy match in school_aliases_learned. Defaults to the resolver's learn_aliases.
+
+        Returns:
+            tuple: Tuple containing the canonical name, aliases, and ID of the school in that order. Returns None if the school is not found.
+        """
+        if not self.is_loaded and not self.load():
+            return None
+
+        school_name = normalize_school_name(school_name)
+        entry = self._canonical_index.get(school_name)
+        if entry is None:
+            entry = self._alias_index.get(school_name.lower())
+        if entry is None and school_name:
+            matches = self._get_trigram_index().search(school_name, limit=2)
+            # Accept only a close match that is clearly ahead of the next school, e.g. "Florida" must not become "Florida St."
+            if matches and matches[0][1] >= FUZZY_MATCH_THRESHOLD and (len(matches) == 1 or matches[0][1] - matches[1][1] >= FUZZY_MATCH_MARGIN):
+                entry, score, _ = matches[0]
+                instrumentation.count(instrumentation.NAME_LOOKUP_FUZZY_HITS)
+                if self.learn_aliases if learn_aliases is None else learn_aliases:
+                    self.learn_alias(school_name, entry[2], score)
+        if entry is None:
+            instrumentation.count(instrumentation.NAME_LOOKUP_MISSES)
+            return None
+
+        instrumentation.count(instrumentation.NAME_LOOKUP_HITS)
+        canonical_name, aliases, ID = entry
+        return canonical_name, list(aliases), ID
+
+
+_SCHOOL_NAME_RESOLVER = SchoolNameResolver()
+
+
+def get_school_name_resolver() -> SchoolNameResolver:
+    """_summary_
+    Gets the shared resolver used by get_school_naming_infomation.
+    """
+    return _SCHOOL_NAME_RESOLVER
+
+
+def invalidate_school_naming_information() -> None:
+    """_summary_
+    Invalidates the shared resolver. Call this after inserting, updating, or deleting rows in the schools table.
+    """
+    _SCHOOL_NAME_RESOLVER.invalidate()
+
+
+def get_school_naming_infomation(school_name, learn_aliases: bool = False):
     """_summary_
     Gets the naming infomation for the given school name.
     Args:
         school_name (str): Name of the school to get the naming infomation for.
+        learn_aliases (bool, optional): Store a confident fuzzy match in school_aliases_learned, for the import and scrape paths. Defaults to False.
 
     Returns:
         tuple: Tuple containing the canonical name, aliases, and ID of the school in that order. Should return None if the school is not found.
 
     """
-    # Try different possible paths for the database
-    possible_paths = [
-        "db/schools.db",  # When called from root directory
-        "../db/schools.db",  # When called from testing directory
-        os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "schools.db")  # Absolute path
-    ]
-    
-    conn = None
-    for db_path in possible_paths:
-        try:
-            conn = connect_to_db(db_path)
-            if conn is not None:
-                break
-        except Exception:
-            continue
-    
-    if conn is None:
-        return None
-    query_canonical_name = f'SELECT * FROM schools WHERE "Canonical Name" = \'{school_name}\''
-    query_aliases = f'SELECT * FROM schools WHERE "Aliases" LIKE \'%{school_name}%\''
-
-    naming_infomation = query_db(conn, query_canonical_name)
-    if naming_infomation is None or len(naming_infomation.get('ID', [])) == 0:
-        naming_infomation = query_db(conn, query_aliases)
-        if naming_infomation is None or len(naming_infomation.get('ID', [])) == 0:
-            print(f"No school found with canonical name or aliases '{school_name}'")
-            return None
+    naming_infomation = _SCHOOL_NAME_RESOLVER.lookup(school_name, learn_aliases)
+    if naming_infomation is None:
+        closest = ", ".join(f"{candidate[0]} ({candidate[3]:.2f})" for candidate in _SCHOOL_NAME_RESOLVER.candidates(school_name, 3))
+        print(f"No school found with canonical name or aliases '{school_name}'" + (f", closest: {closest}" if closest else ""))
+    return naming_infomation
 
-    canonical_name = naming_infomation['Canonical Name'][0]
-    if naming_infomation['Aliases'][0] is None:
-        aliases = []
-    else:
-        aliases = naming_infomation['Aliases'][0].split(",")
-        aliases = [alias for alias in aliases if alias != " "]
-    ID = naming_infomation['ID'][0]
+@instrumentation.timed()
+def prepare_schedule_from_csv(schedule: "pd.DataFrame", resolver: SchoolNameResolver = None) -> "pd.DataFrame":
+    """_summary_
+    Converts a Sports-Reference schedule export into the schedule table layout with whole-column operations.
+    Strips the (rank) prefixes, splits the dates, and resolves each distinct team name once.
+    Args:
+        schedule (pd.DataFrame): Schedule as read from a Sports-Reference CSV export.
+        resolver (SchoolNameResolver, optional): Resolver to look the team names up with. Defaults to the shared resolver, which learns confident fuzzy matches.
+
+    Returns:
+        pd.DataFrame: DataFrame with the SCHEDULE_COLUMNS columns. Day is the day of the month, and the IDs of unresolved teams are None.
+    """
+    import pandas as pd
 
-    close_connection(conn)
-    return canonical_name, aliases, ID
+    schedule = schedule.drop(columns=["Rk", "Notes"], errors="ignore")
+    schedule = schedule.rename(columns={"Unnamed: 7": "Location", "Wk": "Week", "Pts": "Winner Points", "Pts.1": "Loser Points"})
 
-def update_schedule_with_ID_information():
+    updated_schedule_df = pd.DataFrame(index=schedule.index)
+    updated_schedule_df["Winner"] = schedule["Winner"].str.replace(RANK_PREFIX, "", regex=True)
+    updated_schedule_df["Loser"] = schedule["Loser"].str.replace(RANK_PREFIX, "", regex=True)
+    for column in ["Winner Points", "Loser Points", "Location", "Date", "Time"]:
+        updated_schedule_df[column] = schedule[column]
+
+    date_parts = schedule["Date"].str.replace(",", "", regex=False).str.split(" ", expand=True)
+    months = date_parts[0].str.lower().map(MONTH_NUMBERS)
+    if months.isna().any():
+        invalid = sorted(date_parts[0][months.isna()].astype(str).unique())
+        raise ValueError(f"Invalid month abbreviations: {invalid}, expected one of {list(MONTH_NUMBERS.keys())}")
+    updated_schedule_df["Day"] = date_parts[1].astype(int)
+    updated_schedule_df["Week"] = schedule["Week"]
+    updated_schedule_df["Year"] = date_parts[2].astype(int)
+    updated_schedule_df["Month"] = months.astype(int)
+
+    # Every team plays many games, so resolve each distinct name once and map the IDs back onto the rows
+    team_names = pd.unique(pd.concat([updated_schedule_df["Winner"], updated_schedule_df["Loser"]]))
+    team_ids = {}
+    for team_name in team_names:
+        naming_infomation = get_school_naming_infomation(team_name, learn_aliases=True) if resolver is None else resolver.lookup(team_name)
+        team_ids[team_name] = None if naming_infomation is None else naming_infomation[2]
+    updated_schedule_df["Winner ID"] = updated_schedule_df["Winner"].map(team_ids)
+    updated_schedule_df["Loser ID"] = updated_schedule_df["Loser"].map(team_ids)
+    return updated_schedule_df[SCHEDULE_COLUMNS]
+
+
+@instrumentation.timed()
+def update_schedule_with_ID_information(csv_paths=None, conn: sqlite3.Connection = None, resolver: SchoolNameResolver = None) -> tuple:
     """_summary_
     Updates the schedule with the ID information for the schools.
+    Reads one or more Sports-Reference schedule CSV exports, resolves the team IDs, and upserts the games into the schedule
+    table with upsert_schedule, so importing the same CSV again updates the stored games instead of adding them twice.
+    Args:
+        csv_paths (str | list, optional): CSV file or list of CSV files to import. Defaults to data/schedule.csv.
+        conn (sqlite3.Connection, optional): Connection to the database to insert into. Defaults to this thread's shared connection to db/schools.db.
+        resolver (SchoolNameResolver, optional): Resolver to look the team names up with. Defaults to the shared resolver, which learns confident fuzzy matches.
+
+    Returns:
+        tuple: Number of games inserted, updated, and unchanged, or None if the upsert failed.
     """
-    try:
-        schedule = pd.read_csv("data/schedule.csv")
-    except Exception as e:
-        schedule = pd.read_csv("data\\schedule.csv")
-
-    schedule.drop(columns=["Rk","Notes"], inplace=True)
-    schedule.rename(columns={"Unnamed: 7":"Location"}, inplace=True)
-    schedule.rename(columns={"Wk":"Week"}, inplace=True)
-    schedule.rename(columns={"Pts": "Winner Points","Pts.1": "Loser Points"}, inplace=True)
-
-    updated_schedule_df = pd.DataFrame(columns=["Winner", "Loser", "Winner Points", "Loser Points", "Location", "Date", "Time", "Day", "Week", "Year", "Month", "Day", "Winner ID", "Loser ID"])
-
-    for index, row in schedule.iterrows():
-        Winner = row["Winner"]
-        Loser = row["Loser"]
-
-        if Winner[0] == "(":
-            find_index = Winner.find(")")
-            Winner = Winner[find_index+2:]
-        if Loser[0] == "(":
-            find_index = Loser.find(")")
-            Loser = Loser[find_index+2:]
-
-        Winner_Points = row["Winner Points"]
-        Loser_Points = row["Loser Points"]
-        Location = row["Location"]
-        Date = row["Date"]
-        Time = row["Time"]
-        Day = row["Day"]
-        Week = row["Week"]
-        _, _, winner_id = get_school_naming_infomation(Winner)
-        _, _, loser_id = get_school_naming_infomation(Loser)
-        
-        Date = row["Date"]
-        date_parts = Date.split(" ")
-        Year = date_parts[2]
-        Month = month_number_from_month_abbreviation(date_parts[0])
-        Day = date_parts[1]
-
-
-        updated_schedule_df.loc[index] = [Winner, Loser, Winner_Points, Loser_Points, Location, Date, Time, Day, Week, Year, Month, Day, winner_id, loser_id]
-    dict_data = updated_schedule_df.to_dict(orient="list")
-
-    try:
-        conn = connect_to_db("db/schools.db")
-    except:
-        conn = connect_to_db("db\\schools.db")
-
-    create_table(conn, dict_data.keys(), "schedule")
-    insert_data_into_table(conn, dict_data, "schedule")
-    close_connection(conn)
+    import pandas as pd
+
+    if csv_paths is None:
+        csv_paths = [os.path.join("data", "schedule.csv")]
+    elif isinstance(csv_paths, str):
+        csv_paths = [csv_paths]
+    schedule = pd.concat([pd.read_csv(csv_path) for csv_path in csv_paths], ignore_index=True)
+    updated_schedule_df = prepare_schedule_from_csv(schedule, resolver)
 
+    conn = conn or get_connection()
+    return upsert_schedule(conn, updated_schedule_df)
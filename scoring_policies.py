@@ -0,0 +1,167 @@
+"""
+Summary: This file contains the pluggable margin-of-victory scoring policies.
+
+Each policy is compiled once into a (locations x margins) lookup table covering margins 0 to MAX_MARGIN, where
+larger margins share the last column. Scoring a game is then a single array index by the winner's location and the
+point margin. Several policies can be evaluated over the same games in one batched pass by stacking their tables.
+"""
+#IMPORTS
+import json
+import numpy as np
+from db.db import *
+from ranking_system import MARGIN_OF_VICTORY_SCORES, MARGIN_OF_VICTORY_THRESHOLDS, query_season_games
+
+# Margins above this share the score of MAX_MARGIN
+MAX_MARGIN = 100
+# Rows of a compiled table, by the winner's Location in the schedule: "" at home, "@" away, "N" neutral site
+LOCATIONS = ("home", "away", "neutral")
+LOCATION_CODES = {"": 0, "@": 1, "N": 2}
+POLICY_TYPES = ("buckets", "capped", "log")
+
+
+class ScoringPolicy:
+    """_summary_
+    A compiled scoring policy. table[location, margin] is the score of a game won by that margin at that location.
+    Calling the policy with winner and loser points scores the games, so it can be passed to
+    calculate_rankings_for_seasons as its scoring function.
+    """
+
+    def __init__(self, name: str, table: np.ndarray):
+        self.name = name
+        self.table = table
+
+    def __repr__(self):
+        return f"ScoringPolicy({self.name!r})"
+
+    def __call__(self, Winning_Team_Points, Losing_Team_Points, Locations=None) -> np.ndarray:
+        return self.table[location_codes(Locations, len(Winning_Team_Points)), margin_indexes(Winning_Team_Points, Losing_Team_Points)]
+
+
+def margin_indexes(Winning_Team_Points, Losing_Team_Points) -> np.ndarray:
+    """_summary_
+    Converts winner and loser points into margin columns of a compiled table, clipped to 0..MAX_MARGIN.
+    """
+    margins = np.asarray(Winning_Team_Points, dtype=np.int64) - np.asarray(Losing_Team_Points, dtype=np.int64)
+    return np.clip(margins, 0, MAX_MARGIN)
+
+
+def location_codes(Locations, number_of_games: int) -> np.ndarray:
+    """_summary_
+    Converts schedule Location values into rows of a compiled table. Without locations every game counts as a home win.
+    """
+    if Locations is None:
+        return np.zeros(number_of_games, dtype=np.int64)
+    import pandas as pd
+
+    return pd.Series(Locations, dtype=object).fillna("").str.strip().map(LOCATION_CODES).fillna(0).to_numpy(dtype=np.int64)
+
+
+def _base_scores(spec: dict) -> np.ndarray:
+    margins = np.arange(MAX_MARGIN + 1)
+    policy_type = spec.get("type", "buckets")
+    if policy_type == "buckets":
+        thresholds = np.asarray(spec.get("thresholds", MARGIN_OF_VICTORY_THRESHOLDS))
+        scores = np.asarray(spec.get("scores", MARGIN_OF_VICTORY_SCORES), dtype=float)
+        if len(scores) != len(thresholds) + 1:
+            raise ValueError(f"A buckets policy needs one more score than thresholds, got {len(thresholds)} thresholds and {len(scores)} scores")
+        # side="left" puts a margin equal to a threshold in that threshold's bucket
+        return scores[np.searchsorted(thresholds, margins, side="left")]
+    if policy_type == "capped":
+        return np.minimum(margins, spec["cap"]) * spec.get("scale", 1.0)
+    if policy_type == "log":
+        return np.log1p(margins) * spec.get("scale", 1.0)
+    raise ValueError(f"Invalid scoring policy type: {policy_type}, expected one of {POLICY_TYPES}")
+
+
+def compile_policy(spec: dict, name: str = None) -> ScoringPolicy:
+    """_summary_
+    Compiles a policy specification into its lookup table.
+    Args:
+        spec (dict): Policy specification. "type" is "buckets" (with "thresholds" and "scores", defaulting to the
+            standard margin-of-victory buckets), "capped" (margin up to "cap", times "scale"), or "log"
+            (log(1 + margin) times "scale"). An optional "location_weights" dict multiplies the scores of
+            "home", "away", and "neutral" wins.
+        name (str, optional): Name of the policy. Defaults to the spec's "name", or its type.
+
+    Returns:
+        ScoringPolicy: The compiled policy.
+    """
+    base_scores = _base_scores(spec)
+    location_weights = spec.get("location_weights", {})
+    unknown_locations = set(location_weights) - set(LOCATIONS)
+    if unknown_locations:
+        raise ValueError(f"Invalid locations: {sorted(unknown_locations)}, expected some of {LOCATIONS}")
+    weights = np.array([location_weights.get(location, 1.0) for location in LOCATIONS], dtype=float)
+    return ScoringPolicy(name or spec.get("name") or spec.get("type", "buckets"), weights[:, None] * base_scores[None, :])
+
+
+def load_policies(path: str) -> dict:
+    """_summary_
+    Loads and compiles the policies in a JSON config file mapping each policy name to its specification.
+    Args:
+        path (str): Path of the JSON file.
+
+    Returns:
+        dict: Dictionary mapping each policy name to its compiled ScoringPolicy.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        specs = json.load(f)
+    return {name: compile_policy(spec, name) for name, spec in specs.items()}
+
+
+DEFAULT_POLICY = compile_policy({"type": "buckets"}, "default")
+
+
+def evaluate_policies(policies, Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, Locations=None) -> dict:
+    """_summary_
+    Ranks the same games under several policies in one batched pass. The policies' tables are stacked, every game
+    is scored under every policy with one fancy index, and all totals are scatter-added with one bincount.
+    Args:
+        policies (dict | list): Policies to compare, as a dict of name to ScoringPolicy or a list of ScoringPolicy.
+        Winning_Teams (array-like): Winner of each game.
+        Losing_Teams (array-like): Loser of each game.
+        Winning_Team_Points (array-like): Points scored by the winner of each game.
+        Losing_Team_Points (array-like): Points scored by the loser of each game.
+        Locations (array-like, optional): Winner's Location of each game. Defaults to every game at home.
+
+    Returns:
+        dict: Dictionary mapping each policy name to its rankings dictionary, teams in the order they first play.
+    """
+    import pandas as pd
+
+    if not isinstance(policies, dict):
+        policies = {policy.name: policy for policy in policies}
+    number_of_games = len(Winning_Teams)
+    # Interleave winner and loser so teams are indexed in the order they are first seen, as in rank_games
+    teams_by_game = np.empty(2 * number_of_games, dtype=object)
+    teams_by_game[0::2] = Winning_Teams
+    teams_by_game[1::2] = Losing_Teams
+    codes, teams = pd.factorize(teams_by_game)
+    number_of_teams = len(teams)
+    teams = teams.tolist()
+
+    tables = np.stack([policy.table for policy in policies.values()])
+    # (policies x games) score matrix, then +score for the winner and -score for the loser of each game
+    scores = tables[:, location_codes(Locations, number_of_games), margin_indexes(Winning_Team_Points, Losing_Team_Points)]
+    signed_scores = np.empty((len(policies), 2 * number_of_games))
+    signed_scores[:, 0::2] = scores
+    signed_scores[:, 1::2] = -scores
+    cells = np.arange(len(policies))[:, None] * number_of_teams + codes[None, :]
+    totals = np.bincount(cells.ravel(), weights=signed_scores.ravel(), minlength=len(policies) * number_of_teams)
+    totals = totals.reshape(len(policies), number_of_teams)
+    return {name: dict(zip(teams, totals[index].tolist())) for index, name in enumerate(policies)}
+
+
+def evaluate_season_policies(conn: sqlite3.Connection, year: int, policies) -> dict:
+    """_summary_
+    Ranks the season starting in August of the given year under several policies, using each game's Location.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        year (int): Year the season starts in.
+        policies (dict | list): Policies to compare.
+
+    Returns:
+        dict: Dictionary mapping each policy name to its rankings dictionary.
+    """
+    games = query_season_games(conn, year)
+    return evaluate_policies(policies, games["Winner"], games["Loser"], games["Winner Points"], games["Loser Points"], games["Location"])
@@ -0,0 +1,146 @@
+"""
+Summary: This file contains the Monte Carlo season simulator built on the ranking and rating engines.
+
+The games already played are ranked once with ranking_system. The remaining games are simulated in batches: each
+batch draws a (simulations x games) matrix of point margins from the Massey ratings, scores them with the
+margin-of-victory buckets, and adds them to the played totals with one matrix product. Batches run on a process
+pool, each with its own seed spawned from the base seed, so results do not depend on the number of workers.
+"""
+#IMPORTS
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from db.db import *
+from ranking_system import MARGIN_OF_VICTORY_SCORES, MARGIN_OF_VICTORY_THRESHOLDS, query_season_games, rank_games
+from rating_solver import solve_ratings
+
+# Standard deviation of a college football game's final margin around the rating difference, in points
+DEFAULT_MARGIN_STD = 15.0
+
+
+class SeasonSimulation:
+    """_summary_
+    Rank distribution of every team over the simulated seasons.
+    rank_counts[i, k] is the number of simulations in which teams[i] finished with rank k + 1.
+    """
+
+    def __init__(self, teams: list, rank_counts: np.ndarray):
+        self.teams = teams
+        self.rank_counts = rank_counts
+        self.number_of_simulations = int(rank_counts[0].sum()) if len(teams) else 0
+
+    def rank_probabilities(self) -> np.ndarray:
+        return self.rank_counts / max(self.number_of_simulations, 1)
+
+    def mean_ranks(self) -> dict:
+        """_summary_
+        Gets each team's average finishing rank, best first.
+        """
+        mean_ranks = self.rank_probabilities() @ np.arange(1, len(self.teams) + 1)
+        return {self.teams[i]: float(mean_ranks[i]) for i in np.argsort(mean_ranks, kind="stable")}
+
+    def probability_of_top(self, number_of_ranks: int) -> dict:
+        """_summary_
+        Gets each team's probability of finishing in the top number_of_ranks, best first.
+        """
+        probabilities = self.rank_probabilities()[:, :number_of_ranks].sum(axis=1)
+        return {self.teams[i]: float(probabilities[i]) for i in np.argsort(-probabilities, kind="stable")}
+
+
+def _simulate_batch(task: tuple) -> np.ndarray:
+    """_summary_
+    Simulates one batch of seasons and counts the finishing ranks. Runs in a worker process.
+    Args:
+        task (tuple): Number of simulations, seed sequence, played totals, expected margins, margin std, team A and team B index of each remaining game.
+
+    Returns:
+        np.ndarray: (teams x ranks) count matrix for the batch.
+    """
+    number_of_simulations, seed_sequence, base_totals, expected_margins, margin_std, team_a, team_b = task
+    generator = np.random.default_rng(seed_sequence)
+    number_of_teams = len(base_totals)
+
+    # +1 for team A and -1 for team B, so signed game scores turn into team totals with one matrix product
+    incidence = np.zeros((len(expected_margins), number_of_teams))
+    incidence[np.arange(len(expected_margins)), team_a] += 1
+    incidence[np.arange(len(expected_margins)), team_b] -= 1
+
+    margins = np.rint(expected_margins + margin_std * generator.standard_normal((number_of_simulations, len(expected_margins))))
+    # Games cannot end in a tie, give a drawn margin to the favourite by a point
+    margins = np.where(margins == 0, np.where(expected_margins >= 0, 1, -1), margins)
+    scores = MARGIN_OF_VICTORY_SCORES[np.searchsorted(MARGIN_OF_VICTORY_THRESHOLDS, np.abs(margins), side="left")]
+    totals = base_totals + (np.sign(margins) * scores) @ incidence
+
+    order = np.argsort(-totals, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(number_of_teams), axis=1)
+    return np.bincount((np.arange(number_of_teams) * number_of_teams + ranks).ravel(), minlength=number_of_teams * number_of_teams).reshape(number_of_teams, number_of_teams)
+
+
+def simulate_rankings(played_games: dict, remaining_games: list, number_of_simulations: int = 10000, batch_size: int = 2000, workers: int = None, seed: int = 0, margin_std: float = DEFAULT_MARGIN_STD) -> SeasonSimulation:
+    """_summary_
+    Simulates the rest of a season many times and collects each team's finishing rank distribution.
+    Args:
+        played_games (dict): Schedule dictionary of lists with the Winner, Loser, Winner Points, and Loser Points of the games played.
+        remaining_games (list): (team A, team B) pair of every game left to play.
+        number_of_simulations (int, optional): Number of seasons to simulate. Defaults to 10000.
+        batch_size (int, optional): Seasons simulated together in one array operation. Defaults to 2000.
+        workers (int, optional): Worker processes, 1 runs in this process. Defaults to the number of CPUs.
+        seed (int, optional): Base seed, each batch gets its own child seed. Defaults to 0.
+        margin_std (float, optional): Standard deviation of the simulated margins in points. Defaults to DEFAULT_MARGIN_STD.
+
+    Returns:
+        SeasonSimulation: Rank distribution of every team.
+    """
+    import pandas as pd
+
+    played_totals = rank_games(played_games["Winner"], played_games["Loser"], played_games["Winner Points"], played_games["Loser Points"])
+    ratings = solve_ratings(played_games["Winner"], played_games["Loser"], played_games["Winner Points"], played_games["Loser Points"], "massey")
+
+    remaining_teams = [team for game in remaining_games for team in game]
+    codes, teams = pd.factorize(np.asarray(list(played_totals) + remaining_teams, dtype=object))
+    teams = teams.tolist()
+    base_totals = np.zeros(len(teams))
+    base_totals[:len(played_totals)] = list(played_totals.values())
+    team_ratings = np.array([ratings.get(team, 0.0) for team in teams])
+    game_codes = codes[len(played_totals):]
+    team_a = game_codes[0::2]
+    team_b = game_codes[1::2]
+    expected_margins = team_ratings[team_a] - team_ratings[team_b]
+
+    batch_sizes = [batch_size] * (number_of_simulations // batch_size)
+    if number_of_simulations % batch_size:
+        batch_sizes.append(number_of_simulations % batch_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    tasks = [(size, seed_sequence, base_totals, expected_margins, margin_std, team_a, team_b) for size, seed_sequence in zip(batch_sizes, seed_sequences)]
+
+    rank_counts = np.zeros((len(teams), len(teams)), dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            rank_counts += _simulate_batch(task)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            for batch_counts in executor.map(_simulate_batch, tasks):
+                rank_counts += batch_counts
+    return SeasonSimulation(teams, rank_counts)
+
+
+def simulate_season(conn: sqlite3.Connection, year: int, remaining_games: list, number_of_simulations: int = 10000, batch_size: int = 2000, workers: int = None, seed: int = 0, margin_std: float = DEFAULT_MARGIN_STD) -> SeasonSimulation:
+    """_summary_
+    Simulates the rest of the season starting in August of the given year from the games in the schedule table.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        year (int): Year the season starts in.
+        remaining_games (list): (team A, team B) pair, by team name, of every game left to play.
+        number_of_simulations (int, optional): Number of seasons to simulate. Defaults to 10000.
+        batch_size (int, optional): Seasons simulated together in one array operation. Defaults to 2000.
+        workers (int, optional): Worker processes, 1 runs in this process. Defaults to the number of CPUs.
+        seed (int, optional): Base seed, each batch gets its own child seed. Defaults to 0.
+        margin_std (float, optional): Standard deviation of the simulated margins in points. Defaults to DEFAULT_MARGIN_STD.
+
+    Returns:
+        SeasonSimulation: Rank distribution of every team.
+    """
+    played_games = query_season_games(conn, year)
+    return simulate_rankings(played_games, remaining_games, number_of_simulations, batch_size, workers, seed, margin_std)
@@ -0,0 +1,236 @@
+"""
+Summary: This file contains the compact array-backed store of every game in the schedule table.
+
+Games are kept in typed columns (int32 school IDs, int16 points, uint8 week, month, and day) sorted by season, and
+persisted to a single binary file: a fixed header followed by each column as raw little-endian values. The file is
+memory-mapped and the columns are zero-copy views into it, so opening the store does no parsing. The header records
+the schedule version it was built from and the store is rebuilt only when the schedule table has changed.
+"""
+#IMPORTS
+import os
+import struct
+import tempfile
+import numpy as np
+from db.db import *
+from ranking_system import calculate_margin_of_victory_scores, season_expression
+from scoring_policies import LOCATION_CODES
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "season_store.bin")
+STORE_MAGIC = b"CFBGAMES"
+STORE_FORMAT_VERSION = 1
+# Magic, format version, schedule version, number of games
+STORE_HEADER = struct.Struct("<8sIxxxxqq")
+STORE_COLUMNS = {
+    "season": np.dtype("<i2"),
+    "week": np.dtype("u1"),
+    "month": np.dtype("u1"),
+    "day": np.dtype("u1"),
+    "location": np.dtype("u1"),
+    "winner_id": np.dtype("<i4"),
+    "loser_id": np.dtype("<i4"),
+    "winner_points": np.dtype("<i2"),
+    "loser_points": np.dtype("<i2"),
+}
+# Columns start on 8-byte boundaries so every view is aligned
+COLUMN_ALIGNMENT = 8
+SCHOOL_ID_PREFIX = "S"
+
+
+def school_id_to_int(school_ids) -> np.ndarray:
+    """_summary_
+    Converts school IDs such as "S00685" to integers, with -1 for missing IDs.
+    """
+    import pandas as pd
+
+    numbers = pd.to_numeric(pd.Series(school_ids, dtype=object).str.slice(len(SCHOOL_ID_PREFIX)), errors="coerce")
+    return numbers.fillna(-1).to_numpy(dtype=np.int32)
+
+
+def school_id_from_int(number: int) -> str:
+    """_summary_
+    Converts an integer school ID back to its "S00685" form.
+    """
+    return f"{SCHOOL_ID_PREFIX}{number:05d}"
+
+
+def _column_offsets(number_of_games: int) -> dict:
+    offsets = {}
+    offset = STORE_HEADER.size
+    for name, dtype in STORE_COLUMNS.items():
+        offset += -offset % COLUMN_ALIGNMENT
+        offsets[name] = offset
+        offset += number_of_games * dtype.itemsize
+    return offsets
+
+
+class SeasonStore:
+    """_summary_
+    Typed columns of every game, sorted by season. Columns are numpy arrays, memory-mapped views when opened from a file.
+    Week and day are 0 when unknown, and team IDs are -1 when the team could not be resolved.
+    """
+
+    def __init__(self, columns: dict, schedule_version: int = None, path: str = None):
+        self.columns = columns
+        self.schedule_version = schedule_version
+        self.path = path
+        self.number_of_games = len(columns["season"])
+        self.seasons = np.unique(columns["season"]).tolist()
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "SeasonStore":
+        """_summary_
+        Builds the store in memory from the schedule table. Games without a season or a score are left out.
+        Args:
+            conn (sqlite3.Connection): sqlite3 connection object for the database.
+
+        Returns:
+            SeasonStore: The store, tagged with the current schedule version.
+        """
+        import pandas as pd
+
+        schedule_version = get_schedule_version(conn)
+        season_sql = season_expression(conn)
+        games = query_db(conn, f'SELECT {season_sql} AS season, Week, Month, Day, Location, "Winner ID", "Loser ID", "Winner Points", "Loser Points" FROM schedule WHERE {season_sql} IS NOT NULL AND "Winner Points" IS NOT NULL AND "Loser Points" IS NOT NULL ORDER BY {season_sql}, ROWID', result_format="dataframe")
+        columns = {
+            "season": games["season"].to_numpy(),
+            "week": pd.to_numeric(games["Week"], errors="coerce").fillna(0).to_numpy(),
+            "month": pd.to_numeric(games["Month"], errors="coerce").fillna(0).to_numpy(),
+            "day": pd.to_numeric(games["Day"], errors="coerce").fillna(0).to_numpy(),
+            "location": games["Location"].fillna("").str.strip().map(LOCATION_CODES).fillna(0).to_numpy(),
+            "winner_id": school_id_to_int(games["Winner ID"]),
+            "loser_id": school_id_to_int(games["Loser ID"]),
+            "winner_points": games["Winner Points"].to_numpy(),
+            "loser_points": games["Loser Points"].to_numpy(),
+        }
+        return cls({name: np.ascontiguousarray(values, dtype=STORE_COLUMNS[name]) for name, values in columns.items()}, schedule_version)
+
+    def save(self, path: str = DEFAULT_STORE_PATH) -> None:
+        """_summary_
+        Writes the store to a binary cache file, replacing it atomically.
+        Args:
+            path (str, optional): Path of the cache file. Defaults to DEFAULT_STORE_PATH.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # A uniquely named temporary file, so threads saving the same path do not share one
+        temporary = tempfile.NamedTemporaryFile(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False)
+        try:
+            with temporary as f:
+                f.write(STORE_HEADER.pack(STORE_MAGIC, STORE_FORMAT_VERSION, -1 if self.schedule_version is None else self.schedule_version, self.number_of_games))
+                for name, offset in _column_offsets(self.number_of_games).items():
+                    f.write(b"\0" * (offset - f.tell()))
+                    f.write(self.columns[name].tobytes())
+            os.replace(temporary.name, path)
+        except BaseException:
+            os.remove(temporary.name)
+            raise
+        self.path = path
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_STORE_PATH) -> "SeasonStore":
+        """_summary_
+        Memory-maps a cache file written by save. The columns are views into the mapping, nothing is copied.
+        Args:
+            path (str, optional): Path of the cache file. Defaults to DEFAULT_STORE_PATH.
+
+        Returns:
+            SeasonStore: The store, or None if the file does not exist or is not a valid cache file.
+        """
+        try:
+            data = np.memmap(path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(data) < STORE_HEADER.size:
+            return None
+        magic, format_version, schedule_version, number_of_games = STORE_HEADER.unpack(data[:STORE_HEADER.size].tobytes())
+        offsets = _column_offsets(number_of_games)
+        end = offsets["loser_points"] + number_of_games * STORE_COLUMNS["loser_points"].itemsize
+        if magic != STORE_MAGIC or format_version != STORE_FORMAT_VERSION or len(data) < end:
+            return None
+        columns = {name: data[offsets[name]:offsets[name] + number_of_games * dtype.itemsize].view(dtype) for name, dtype in STORE_COLUMNS.items()}
+        return cls(columns, None if schedule_version < 0 else schedule_version, path)
+
+    def season_slice(self, season: int) -> slice:
+        """_summary_
+        Gets the rows of the given season, a contiguous range as the store is sorted by season.
+        """
+        start, stop = np.searchsorted(self.columns["season"], [season, season + 1])
+        return slice(int(start), int(stop))
+
+    def season(self, season: int) -> dict:
+        """_summary_
+        Gets the columns of the given season as views, without copying.
+        Args:
+            season (int): Year the season starts in.
+
+        Returns:
+            dict: Dictionary mapping each column name to its values in the season.
+        """
+        rows = self.season_slice(season)
+        return {name: values[rows] for name, values in self.columns.items()}
+
+    def games(self, season: int) -> dict:
+        """_summary_
+        Gets the games of the given season keyed like the schedule table, with integer school IDs as the teams,
+        so they can be passed to rank_games, solve_ratings, or simulate_rankings.
+        """
+        columns = self.season(season)
+        return {
+            "Winner": columns["winner_id"],
+            "Loser": columns["loser_id"],
+            "Winner Points": columns["winner_points"],
+            "Loser Points": columns["loser_points"],
+            "Week": columns["week"],
+            "Location": columns["location"],
+        }
+
+
+def load_season_store(conn: sqlite3.Connection, path: str = DEFAULT_STORE_PATH) -> SeasonStore:
+    """_summary_
+    Opens the cached store, rebuilding the cache file first if it is missing or the schedule table changed since it was built.
+    Args:
+        conn (sqlite3.Connection): sqlite3 connection object for the database.
+        path (str, optional): Path of the cache file. Defaults to DEFAULT_STORE_PATH.
+
+    Returns:
+        SeasonStore: The memory-mapped store.
+    """
+    schedule_version = get_schedule_version(conn)
+    store = SeasonStore.open(path)
+    if store is not None and schedule_version is not None and store.schedule_version == schedule_version:
+        return store
+    # The stale mapping must be closed before the file is replaced, which Windows does not allow while it is open
+    del store
+    SeasonStore.from_connection(conn).save(path)
+    return SeasonStore.open(path)
+
+
+def rank_season_from_store(store: SeasonStore, season: int, scoring=None) -> dict:
+    """_summary_
+    Ranks a season straight from the store's integer team IDs, scatter-adding scores by ID without mapping teams first.
+    Games whose teams could not be resolved to an ID are left out.
+    Args:
+        store (SeasonStore): The season store.
+        season (int): Year the season starts in.
+        scoring (callable, optional): Function scoring arrays of winner and loser points. Defaults to calculate_margin_of_victory_scores.
+
+    Returns:
+        dict: Dictionary mapping each school ID to its total score, best first.
+    """
+    columns = store.season(season)
+    winners = columns["winner_id"]
+    losers = columns["loser_id"]
+    resolved = (winners >= 0) & (losers >= 0)
+    if not resolved.all():
+        winners, losers = winners[resolved], losers[resolved]
+        points = (columns["winner_points"][resolved], columns["loser_points"][resolved])
+    else:
+        points = (columns["winner_points"], columns["loser_points"])
+    if len(winners) == 0:
+        return {}
+    scores = (scoring or calculate_margin_of_victory_scores)(*points)
+    size = int(max(winners.max(), losers.max())) + 1
+    totals = np.bincount(winners, weights=scores, minlength=size) - np.bincount(losers, weights=scores, minlength=size)
+    played = np.flatnonzero(np.bincount(winners, minlength=size) + np.bincount(losers, minlength=size))
+    order = played[np.argsort(-totals[played], kind="stable")]
+    return {school_id_from_int(number): float(totals[number]) for number in order}
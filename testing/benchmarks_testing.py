@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.datasets import *
+from benchmarks.run_benchmarks import compare_to_baseline
+from schedule_parser import parse_schedule
+
+
+
+def test_generated_datasets_are_deterministic_seasons():
+    source = generate_schedule_csv(1)
+    schedule = generate_schedule_csv(3, seed=7)
+    assert len(schedule) == 3 * len(source), f"Expected {3 * len(source)} games, but got {len(schedule)}"
+    assert schedule.equals(generate_schedule_csv(3, seed=7)), "The same seed generated different games"
+    assert schedule.iloc[:len(source)]["Pts"].tolist() == source["Pts"].tolist(), "The newest season is not the source season"
+    years = sorted(schedule["Date"].str[-4:].astype(int).unique())
+    source_years = sorted(source["Date"].str[-4:].astype(int).unique())
+    assert years[0] == source_years[0] - 2 and years[-1] == source_years[-1], f"Unexpected years {years}"
+    assert (schedule["Pts"] > schedule["Pts.1"]).all(), "A generated winner did not outscore the loser"
+    print("✓ Test passed: datasets are deterministic copies of the source season")
+
+def test_schedule_html_parses_back_to_the_dataset():
+    schedule = generate_schedule_csv(2)
+    games = list(parse_schedule(schedule_html(schedule)))
+    # The parser skips shutouts, as the scraper always has
+    played = schedule[(schedule["Pts"] > 0) & (schedule["Pts.1"] > 0)]
+    assert len(games) == len(played), f"Expected {len(played)} games, but got {len(games)}"
+    assert [game.winner_points for game in games] == played["Pts"].astype(int).tolist(), "Parsed points do not match the dataset"
+    print("✓ Test passed: rendered pages parse back to the dataset")
+
+def test_compare_to_baseline_flags_only_real_regressions():
+    baseline = {"results": {"fast[1x]": {"min_ms": 0.2}, "slow[1x]": {"min_ms": 10.0}, "steady[1x]": {"min_ms": 10.0}}}
+    run = {"results": {"fast[1x]": {"min_ms": 0.9}, "slow[1x]": {"min_ms": 20.0}, "steady[1x]": {"min_ms": 12.0}, "new[1x]": {"min_ms": 5.0}}}
+    regressions = compare_to_baseline(run, baseline, threshold=1.5)
+    assert regressions == [("slow[1x]", 10.0, 20.0, 2.0)], f"Unexpected regressions {regressions}"
+    print("✓ Test passed: only regressions above the threshold and noise floor are flagged")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("BENCHMARKS")
+    print("------------------------------------------------------------------------")
+    test_generated_datasets_are_deterministic_seasons()
+    test_schedule_html_parses_back_to_the_dataset()
+    test_compare_to_baseline_flags_only_real_regressions()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
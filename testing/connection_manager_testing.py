@@ -0,0 +1,95 @@
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.connection_manager import *
+from db.db import REPO_ROOT, resolve_db_path
+
+
+
+def test_resolve_db_path_is_relative_to_the_repository():
+    expected = os.path.join(REPO_ROOT, "db", "schools.db")
+    assert resolve_db_path("db/schools.db") == expected and resolve_db_path("db\\schools.db") == expected, "Relative paths are not taken from the repository root"
+    assert resolve_db_path(":memory:") == ":memory:"
+    print("✓ Test passed: database paths resolve from the repository root")
+
+def test_each_thread_gets_its_own_tuned_connection():
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ConnectionManager(os.path.join(directory, "test.db"))
+        try:
+            conn = manager.get_connection()
+            assert manager.get_connection() is conn, "The same thread got a second connection"
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1, "synchronous is not NORMAL"
+            other = []
+            thread = threading.Thread(target=lambda: other.append(manager.get_connection()))
+            thread.start()
+            thread.join()
+            assert other[0] is not conn, "Two threads share a connection"
+        finally:
+            manager.close_all()
+    print("✓ Test passed: thread-local connections with WAL")
+
+def test_reads_run_while_a_write_is_open():
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ConnectionManager(os.path.join(directory, "test.db"))
+        try:
+            with manager.transaction() as conn:
+                conn.execute("CREATE TABLE games (id INTEGER)")
+                conn.execute("INSERT INTO games VALUES (1)")
+            writing = threading.Event()
+            read_done = threading.Event()
+            counts = []
+
+            def writer():
+                with manager.transaction() as writer_conn:
+                    writer_conn.execute("INSERT INTO games VALUES (2)")
+                    writing.set()
+                    # Hold the write transaction open until the reader has finished
+                    read_done.wait(5)
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            writing.wait(5)
+            counts.append(conn.execute("SELECT COUNT(*) FROM games").fetchone()[0])
+            read_done.set()
+            thread.join()
+            counts.append(conn.execute("SELECT COUNT(*) FROM games").fetchone()[0])
+            assert counts == [1, 2], f"Expected the reader to see [1, 2], but got {counts}"
+        finally:
+            manager.close_all()
+    print("✓ Test passed: reads are not blocked by an open write")
+
+def test_transaction_rolls_back_on_error():
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ConnectionManager(os.path.join(directory, "test.db"))
+        try:
+            with manager.transaction() as conn:
+                conn.execute("CREATE TABLE games (id INTEGER)")
+            try:
+                with manager.transaction() as conn:
+                    conn.execute("INSERT INTO games VALUES (1)")
+                    raise RuntimeError("scrape failed")
+            except RuntimeError:
+                pass
+            assert conn.execute("SELECT COUNT(*) FROM games").fetchone()[0] == 0, "The failed transaction was committed"
+        finally:
+            manager.close_all()
+    print("✓ Test passed: transactions roll back on errors")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("CONNECTION MANAGER")
+    print("------------------------------------------------------------------------")
+    test_resolve_db_path_is_relative_to_the_repository()
+    test_each_thread_gets_its_own_tuned_connection()
+    test_reads_run_while_a_write_is_open()
+    test_transaction_rolls_back_on_error()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
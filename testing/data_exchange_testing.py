@@ -0,0 +1,161 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sqlite3
+import tempfile
+import data_exchange
+from data_exchange import *
+from ranking_history import create_rankings_history_table
+
+
+
+def _exchange_test_db():
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    games = [
+        ("Georgia Tech", "Florida State", 24, 21, "N", "Aug 24 2024", "12:00 PM", "24", 1, 2024, 8, "S1", "S2"),
+        ("Ohio State", "Notre Dame", 34, 23, "N", "Jan 20 2025", "7:30 PM", "20", 16, 2025, 1, None, None),
+        ("Michigan", "Washington", 34, 13, "N", "Jan 8 2024", "7:30 PM", "8", 15, 2024, 1, "S3", "S4"),
+        ("Texas", "Alabama", 34, 24, "@", "Sep 9 2023", "7:00 PM", "9", 2, 2023, 9, "S5", "S6"),
+        # A game without a date has no season
+        ("Army", "Navy", 17, 11, "N", None, None, None, None, None, None, "S7", "S8"),
+    ]
+    quoted_columns = ', '.join([f'"{name}"' for name in SCHEDULE_COLUMN_TYPES])
+    conn.executemany(f"INSERT INTO schedule ({quoted_columns}) VALUES ({', '.join(['?'] * len(SCHEDULE_COLUMN_TYPES))})", games)
+    # The schools table has untyped columns, as created by insert_data_into_table
+    create_table(conn, ["ID", "Canonical Name", "Aliases"], "schools")
+    conn.executemany("INSERT INTO schools VALUES (?, ?, ?)", [("S1", "Georgia Tech", "GT"), ("S2", "Florida State", "FSU, Florida St."), (3, "Numeric ID", None)])
+    create_rankings_history_table(conn)
+    conn.executemany("INSERT INTO rankings_history VALUES (?, ?, ?, ?, ?)", [(2023, 1, "S5", 1.5, 1), (2023, 1, "S6", -1.5, 2), (2024, 1, "S1", 0.25, 1)])
+    conn.commit()
+    return conn
+
+def _rows(conn, table_name):
+    # Exports are grouped by season, so rows are compared regardless of order
+    return sorted(conn.execute(f"SELECT * FROM {table_name}").fetchall(), key=repr)
+
+def test_round_trip_matches_the_sqlite_tables():
+    source = _exchange_test_db()
+    for file_format in EXCHANGE_FORMATS:
+        with tempfile.TemporaryDirectory() as directory:
+            exported = export_tables(source, directory, file_format)
+            assert exported == {"schedule": 5, "schools": 3, "rankings_history": 3}, f"Unexpected export {exported}"
+            target = sqlite3.connect(":memory:")
+            imported = import_tables(target, directory)
+            assert imported == exported, f"Unexpected import {imported}"
+            for table_name in exported:
+                expected = _rows(source, table_name)
+                if table_name == "schools":
+                    # Untyped values are exchanged as strings
+                    expected = sorted([tuple(None if value is None else str(value) for value in row) for row in expected], key=repr)
+                assert _rows(target, table_name) == expected, f"{table_name} differs after a {file_format} round trip"
+            schema_sql = "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'schedule' ORDER BY name"
+            assert target.execute(schema_sql).fetchall() == source.execute(schema_sql).fetchall(), "The schedule table and indexes were not recreated"
+    print("✓ Test passed: Parquet and Feather round trips match the SQLite tables")
+
+def test_exports_are_partitioned_by_season():
+    source = _exchange_test_db()
+    with tempfile.TemporaryDirectory() as directory:
+        export_table(source, "schedule", directory)
+        assert sorted(os.listdir(os.path.join(directory, "schedule"))) == ["Season=2023", "Season=2024", f"Season={HIVE_NULL_PARTITION}"], f"Unexpected partitions {os.listdir(os.path.join(directory, 'schedule'))}"
+        table = read_exchange_table("schedule", directory, seasons=[2024], columns=["Winner", "Season"])
+        assert table.column_names == ["Winner", "Season"], f"Unexpected columns {table.column_names}"
+        assert sorted(table.column("Winner").to_pylist()) == ["Georgia Tech", "Ohio State"], f"Unexpected 2024 games {table.to_pydict()}"
+        assert str(read_exchange_table("schedule", directory).schema.field("Winner Points").type) == "int64", "Types were not kept"
+    print("✓ Test passed: exports are partitioned by season and read by season and column")
+
+def test_import_replaces_only_the_imported_seasons():
+    source = _exchange_test_db()
+    with tempfile.TemporaryDirectory() as directory:
+        export_table(source, "schedule", directory)
+        expected = _rows(source, "schedule")
+        source.execute('UPDATE schedule SET "Winner Points" = 99 WHERE "Season" = 2023')
+        source.execute('DELETE FROM schedule WHERE "Season" = 2024')
+        source.commit()
+        # The January 2024 bowl game belongs to the 2023 season
+        assert import_table(source, "schedule", directory, seasons=[2023]) == 2, "Expected two 2023 games"
+        assert source.execute('SELECT "Winner Points" FROM schedule WHERE "Season" = 2023').fetchall() == [(34,), (34,)], "The 2023 season was not replaced"
+        assert source.execute('SELECT COUNT(*) FROM schedule WHERE "Season" = 2024').fetchone()[0] == 0, "A season outside the filter was imported"
+        import_table(source, "schedule", directory)
+        import_table(source, "schedule", directory)
+        assert _rows(source, "schedule") == expected, "Importing twice duplicated rows"
+    print("✓ Test passed: imports replace only the imported seasons and can be repeated")
+
+def test_unmigrated_schedule_is_migrated_before_export():
+    source = sqlite3.connect(":memory:")
+    # The schedule as created by insert_data_into_table before the typed schema, without a Season column
+    create_table(source, list(SCHEDULE_COLUMN_TYPES), "schedule")
+    source.executemany(f"INSERT INTO schedule VALUES ({', '.join(['?'] * len(SCHEDULE_COLUMN_TYPES))})", [
+        ("Michigan", "Washington", "34", "13", "N", "Jan 8 2024", "7:30 PM", "8", "15", "2024", "1", "S3", "S4"),
+        ("Texas", "Alabama", "34", "24", "@", "Sep 9 2023", "7:00 PM", "9", "2", "2023", "9", "S5", "S6"),
+    ])
+    source.commit()
+    with tempfile.TemporaryDirectory() as directory:
+        assert export_table(source, "schedule", directory) == 2, "The unmigrated schedule was not exported"
+        assert os.listdir(os.path.join(directory, "schedule")) == ["Season=2023"], f"Unexpected partitions {os.listdir(os.path.join(directory, 'schedule'))}"
+        assert str(read_exchange_table("schedule", directory).schema.field("Winner Points").type) == "int64", "The export does not have the typed schema"
+    print("✓ Test passed: an unmigrated schedule is migrated before it is exported")
+
+def test_failed_export_keeps_the_previous_export():
+    source = _exchange_test_db()
+    with tempfile.TemporaryDirectory() as directory:
+        export_table(source, "schedule", directory)
+        previous = sorted(os.listdir(os.path.join(directory, "schedule")))
+        source.execute('DELETE FROM schedule WHERE "Season" = 2023')
+        source.commit()
+        real_open_writer = data_exchange._open_writer
+        written = []
+
+        def failing_open_writer(path, schema, file_format):
+            # The second season's file fails, after the first was written
+            if written:
+                raise OSError("disk full")
+            written.append(path)
+            return real_open_writer(path, schema, file_format)
+
+        data_exchange._open_writer = failing_open_writer
+        try:
+            assert export_table(source, "schedule", directory) is None, "A failed export reported rows"
+        finally:
+            data_exchange._open_writer = real_open_writer
+        assert sorted(os.listdir(os.path.join(directory, "schedule"))) == previous, "The previous export was removed by a failed export"
+        assert os.listdir(directory) == ["schedule"], f"The failed export left files behind: {os.listdir(directory)}"
+        assert export_table(source, "schedule", directory) == 3, "The export after the failure did not succeed"
+        assert "Season=2023" not in os.listdir(os.path.join(directory, "schedule")), "A deleted season survived a successful export"
+        assert os.listdir(directory) == ["schedule"], f"The export left files behind: {os.listdir(directory)}"
+    print("✓ Test passed: a failed export keeps the previous export")
+
+def test_parquet_falls_back_to_feather():
+    source = _exchange_test_db()
+    parquet_module = sys.modules.get("pyarrow.parquet")
+    # A None entry makes the import fail, as on a pyarrow built without Parquet
+    sys.modules["pyarrow.parquet"] = None
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            assert export_table(source, "schools", directory, "parquet") == 3, "The fallback export failed"
+            assert os.listdir(os.path.join(directory, "schools")) == ["part-0.feather"], f"Unexpected files {os.listdir(os.path.join(directory, 'schools'))}"
+            assert read_exchange_table("schools", directory).num_rows == 3, "The Feather export could not be read"
+    finally:
+        if parquet_module is None:
+            del sys.modules["pyarrow.parquet"]
+        else:
+            sys.modules["pyarrow.parquet"] = parquet_module
+    print("✓ Test passed: Parquet falls back to Feather")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("DATA EXCHANGE")
+    print("------------------------------------------------------------------------")
+    test_round_trip_matches_the_sqlite_tables()
+    test_exports_are_partitioned_by_season()
+    test_import_replaces_only_the_imported_seasons()
+    test_unmigrated_schedule_is_migrated_before_export()
+    test_failed_export_keeps_the_previous_export()
+    test_parquet_falls_back_to_feather()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import sys
+import os
+import sqlite3
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.db import *
+
+
+
+def test_bulk_insert_from_dict_keeps_nan_as_null():
+    conn = sqlite3.connect(":memory:")
+    try:
+        create_table(conn, ["Winner", "Winner Points"], "schedule")
+        result = bulk_insert_into_table(conn, {"Winner": ["Georgia", "Ohio State"], "Winner Points": [27, float("nan")]}, "schedule")
+        assert result == (2, 0), f"Expected (2, 0), but got {result}"
+        rows = conn.execute('SELECT Winner, "Winner Points" FROM schedule ORDER BY ROWID').fetchall()
+        assert rows == [("Georgia", 27), ("Ohio State", None)], f"Unexpected rows {rows}"
+        print("✓ Test passed: bulk insert from dict")
+    finally:
+        conn.close()
+
+def test_bulk_insert_from_tuples_reports_rejected_rows():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE TABLE schools (ID TEXT PRIMARY KEY, Name TEXT)")
+        rows = [("S00001", "Akron"), ("S00001", "Duplicate"), ("S00002", "Alabama")]
+        result = bulk_insert_into_table(conn, rows, "schools", columns=["ID", "Name"], chunk_size=2)
+        assert result == (2, 1), f"Expected (2, 1), but got {result}"
+        assert get_length_of_table(conn, "schools") == 2
+        print("✓ Test passed: bulk insert rejects duplicate rows")
+    finally:
+        conn.close()
+
+def test_bulk_insert_keeps_the_callers_transaction():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE TABLE schools (ID TEXT PRIMARY KEY, Name TEXT)")
+        create_table(conn, ["Note"], "notes")
+        conn.commit()
+        conn.execute("INSERT INTO notes VALUES ('pending')")
+        rows = [("S00001", "Akron"), ("S00001", "Duplicate"), ("S00002", "Alabama")]
+        assert bulk_insert_into_table(conn, rows, "schools", columns=["ID", "Name"], chunk_size=2) == (2, 1), "Unexpected bulk insert result"
+        assert conn.in_transaction, "The caller's transaction was committed"
+        conn.rollback()
+        assert get_length_of_table(conn, "notes") == 0, "The caller's insert was committed"
+        assert get_length_of_table(conn, "schools") == 0, "The bulk insert was committed with the caller's transaction"
+
+        # Outside a transaction every chunk commits itself
+        assert bulk_insert_into_table(conn, rows, "schools", columns=["ID", "Name"], chunk_size=2) == (2, 1), "Unexpected bulk insert result"
+        assert not conn.in_transaction, "The bulk insert was left uncommitted"
+        print("✓ Test passed: bulk insert leaves the caller's transaction alone")
+    finally:
+        conn.close()
+
+def test_query_db_result_formats_and_streaming():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute('CREATE TABLE schedule (Winner TEXT, "Winner Points" INTEGER)')
+        conn.executemany("INSERT INTO schedule VALUES (?, ?)", [("Georgia", 27), ("Ohio State", 31), ("Indiana", 41)])
+        result = query_db(conn, "SELECT * FROM schedule")
+        assert result == {"Winner": ["Georgia", "Ohio State", "Indiana"], "Winner Points": [27, 31, 41]}, f"Unexpected result {result}"
+        empty = query_db(conn, "SELECT * FROM schedule WHERE Winner = ?", ("Alabama",))
+        assert empty == {"Winner": [], "Winner Points": []}, f"Unexpected result {empty}"
+        arrays = query_db(conn, "SELECT * FROM schedule", result_format="numpy")
+        assert arrays["Winner Points"].sum() == 99
+        chunks = list(iter_query_db(conn, "SELECT * FROM schedule", chunk_size=2))
+        assert [len(chunk["Winner"]) for chunk in chunks] == [2, 1]
+        print("✓ Test passed: query_db result formats and streaming")
+    finally:
+        conn.close()
+
+def _scraped_games(Georgia_Points=34):
+    return {
+        "Winner": ["Georgia", "Texas", "Mystery St"],
+        "Loser": ["Clemson", "Michigan", "Utah"],
+        "Winner Points": [Georgia_Points, 31, 20],
+        "Loser Points": [3, 12, 17],
+        "Date": ["Aug 31, 2024", "Sep 7, 2024", "Sep 7, 2024"],
+        "Day": [31, 7, 7],
+        "Week": [1, 2, 2],
+        "Year": [2024, 2024, 2024],
+        "Month": [8, 9, 9],
+        "Winner ID": ["S00677", "S01583", None],
+        "Loser ID": ["S00397", "S01092", "S01620"],
+    }
+
+def test_upsert_schedule_is_idempotent():
+    conn = sqlite3.connect(":memory:")
+    try:
+        assert upsert_schedule(conn, _scraped_games()) == (3, 0, 0)
+        assert upsert_schedule(conn, _scraped_games()) == (0, 0, 3), "Re-scraping the same games changed the table"
+        assert upsert_schedule(conn, _scraped_games(Georgia_Points=35)) == (0, 1, 2)
+        assert get_length_of_table(conn, "schedule") == 3
+        assert conn.execute("SELECT \"Winner Points\" FROM schedule WHERE Winner = 'Georgia'").fetchone() == (35,)
+        print("✓ Test passed: upserts insert, update, and skip unchanged games")
+    finally:
+        conn.close()
+
+def test_deduplicate_schedule_is_an_explicit_migration():
+    conn = sqlite3.connect(":memory:")
+    try:
+        create_schedule_table(conn)
+        games = _scraped_games()
+        bulk_insert_into_table(conn, games, "schedule")
+        games["Winner Points"][0] = 35
+        bulk_insert_into_table(conn, games, "schedule")
+        # The same game stored again after Mystery St's ID was resolved
+        resolved = _scraped_games()
+        resolved["Winner ID"][2] = "S01200"
+        bulk_insert_into_table(conn, {name: values[2:] for name, values in resolved.items()}, "schedule")
+        assert upsert_schedule(conn, _scraped_games()) is None, "The upsert ran on a table with duplicates"
+        assert get_length_of_table(conn, "schedule") == 7, "The upsert deleted duplicates as a side effect"
+
+        assert deduplicate_schedule(conn) == 4
+        assert get_length_of_table(conn, "schedule") == 3
+        assert conn.execute("SELECT \"Winner Points\" FROM schedule WHERE Winner = 'Georgia'").fetchone() == (35,), "The newest duplicate was not kept"
+        assert conn.execute("SELECT \"Winner ID\" FROM schedule WHERE Winner = 'Mystery St'").fetchone() == ("S01200",), "The copy with the resolved ID was not kept"
+        assert bulk_insert_into_table(conn, resolved, "schedule") == (0, 3), "Duplicates can still be inserted"
+        assert deduplicate_schedule(conn) == 0, "A second deduplication removed games"
+        print("✓ Test passed: deduplication is an explicit migration")
+    finally:
+        conn.close()
+
+def test_upsert_matches_games_whose_ids_were_resolved_later():
+    conn = sqlite3.connect(":memory:")
+    try:
+        assert upsert_schedule(conn, _scraped_games()) == (3, 0, 0)
+        resolved = _scraped_games()
+        resolved["Winner ID"][2] = "S01200"
+        assert upsert_schedule(conn, resolved) == (0, 1, 2), "A game with a newly resolved ID was not updated"
+        assert upsert_schedule(conn, resolved) == (0, 0, 3), "Re-scraping the resolved game changed the table"
+        # A later scrape that fails to resolve the ID keeps the stored one
+        assert upsert_schedule(conn, _scraped_games()) == (0, 0, 3), "A scrape without the ID was not matched"
+        rows = conn.execute("SELECT Winner, \"Winner ID\" FROM schedule ORDER BY ROWID").fetchall()
+        assert rows == [("Georgia", "S00677"), ("Texas", "S01583"), ("Mystery St", "S01200")], f"Unexpected rows {rows}"
+        print("✓ Test passed: upserts match games by team names when their IDs change")
+    finally:
+        conn.close()
+
+def _baseline_schedule(conn):
+    # The schedule table as created by insert_data_into_table before the typed schema: untyped columns, text values
+    create_table(conn, ["Winner", "Loser", "Winner Points", "Loser Points", "Location", "Date", "Time", "Day", "Week", "Year", "Month", "Winner ID", "Loser ID"], "schedule")
+    games = [
+        ("Georgia", "Clemson", "34", "3", "N", "Aug 31, 2024", "12:00 PM", "31", "1", "2024", "8", "S00677", "S00397"),
+        ("Michigan", "Washington", "34", "13", "N", "Jan 8, 2024", "7:30 PM", "8", "15", "2024", "1", "S01092", "S01745"),
+        ("Texas", "Alabama", "34", "24", "@", "Sep 9, 2023", "7:00 PM", "9", "2", "2023", "9", "S01583", "S00016"),
+    ]
+    conn.executemany(f"INSERT INTO schedule VALUES ({', '.join(['?'] * 13)})", games)
+    conn.commit()
+
+def test_migrate_schedule_table_from_baseline():
+    conn = sqlite3.connect(":memory:")
+    try:
+        _baseline_schedule(conn)
+        assert migrate_schedule_table(conn), "The migration failed"
+        assert get_length_of_table(conn, "schedule") == 3, "Rows were lost in the migration"
+        seasons = conn.execute('SELECT Winner, "Season", typeof("Winner Points") FROM schedule ORDER BY ROWID').fetchall()
+        # The January bowl game belongs to the previous season
+        assert seasons == [("Georgia", 2024, "integer"), ("Michigan", 2023, "integer"), ("Texas", 2023, "integer")], f"Unexpected seasons {seasons}"
+        schema = conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'schedule' ORDER BY name").fetchall()
+        assert migrate_schedule_table(conn), "The second migration failed"
+        assert conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'schedule' ORDER BY name").fetchall() == schema, "The second migration changed the schema"
+        assert get_length_of_table(conn, "schedule") == 3, "The second migration changed the rows"
+        print("✓ Test passed: the baseline schedule table is migrated once, keeping its rows")
+    finally:
+        conn.close()
+
+def test_migrations_keep_the_callers_transaction():
+    conn = sqlite3.connect(":memory:")
+    try:
+        _baseline_schedule(conn)
+        create_table(conn, ["Note"], "notes")
+        conn.execute("INSERT INTO notes VALUES ('pending')")
+        assert conn.in_transaction, "The insert did not open a transaction"
+        assert migrate_schedule_table(conn), "The migration failed inside a transaction"
+        assert upsert_schedule(conn, _scraped_games()) == (2, 0, 1), "The upsert failed inside a transaction"
+        assert conn.in_transaction, "The caller's transaction was committed"
+        conn.rollback()
+        assert get_length_of_table(conn, "notes") == 0, "The caller's insert was committed"
+        assert "Season" not in get_table_columns(conn, "schedule"), "The migration was committed with the caller's transaction"
+
+        # Outside a transaction the migration commits itself
+        assert migrate_schedule_table(conn) and not conn.in_transaction, "The migration was left uncommitted"
+        conn.execute("INSERT INTO notes VALUES ('pending')")
+        conn.execute("CREATE TEMP TRIGGER fail_upsert BEFORE INSERT ON schedule BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+        assert upsert_schedule(conn, _scraped_games()) is None, "The failing upsert reported success"
+        conn.commit()
+        assert conn.execute("SELECT Note FROM notes").fetchall() == [("pending",)], "A failed upsert discarded the caller's insert"
+        print("✓ Test passed: migrations and upserts leave the caller's transaction alone")
+    finally:
+        conn.close()
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("BULK INSERT")
+    print("------------------------------------------------------------------------")
+    test_bulk_insert_from_dict_keeps_nan_as_null()
+    test_bulk_insert_from_tuples_reports_rejected_rows()
+    test_bulk_insert_keeps_the_callers_transaction()
+    print("------------------------------------------------------------------------")
+    print("SCHEDULE UPSERTS")
+    print("------------------------------------------------------------------------")
+    test_upsert_schedule_is_idempotent()
+    test_deduplicate_schedule_is_an_explicit_migration()
+    test_upsert_matches_games_whose_ids_were_resolved_later()
+    test_migrate_schedule_table_from_baseline()
+    test_migrations_keep_the_callers_transaction()
+    print("------------------------------------------------------------------------")
+    print("QUERIES")
+    print("------------------------------------------------------------------------")
+    test_query_db_result_formats_and_streaming()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+import sqlite3
+from datetime import date
+from elo_ranking import *
+
+
+
+def _elo_test_db(number_of_games: int = 300, seed: int = 3):
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    generator = random.Random(seed)
+    teams = [f"Team {i}" for i in range(12)]
+    games = []
+    for game in range(number_of_games):
+        # Two seasons of games, inserted out of date order
+        year, month = (2022, 9 + game % 3) if game < number_of_games // 2 else (2023, 9 + game % 3)
+        Winning_Team, Losing_Team = generator.sample(teams, 2)
+        Losing_Team_Points = generator.randint(0, 35)
+        games.append((Winning_Team, Losing_Team, Losing_Team_Points + generator.randint(1, 40), Losing_Team_Points, generator.choice(["", "@", "N"]), year, month, generator.randint(1, 28)))
+    generator.shuffle(games)
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Year, Month, Day) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', games)
+    conn.commit()
+    return conn
+
+def _replay_one_by_one(conn, as_of=None):
+    games = conn.execute('SELECT Year, Month, CAST(Day AS INTEGER) AS Day, Winner, Loser, "Winner Points", "Loser Points", Location FROM schedule ORDER BY Year, Month, CAST(Day AS INTEGER), ROWID').fetchall()
+    elo = EloRatings()
+    for year, month, day, Winning_Team, Losing_Team, Winning_Team_Points, Losing_Team_Points, location in games:
+        if as_of is not None and date(year, month, day) > as_of:
+            break
+        elo.start_season(game_season(year, month))
+        elo.update(Winning_Team, Losing_Team, Winning_Team_Points, Losing_Team_Points, location)
+    return elo.rankings()
+
+def test_mov_multiplier_follows_the_margin_buckets():
+    multipliers = [mov_multiplier(margin, 0) for margin in (3, 10, 24, 60)]
+    assert multipliers == sorted(multipliers) and multipliers[0] < multipliers[-1], f"Multipliers do not grow with the margin: {multipliers}"
+    assert mov_multiplier(60, 0) == 3.0, f"Expected a blowout multiplier of 3.0, but got {mov_multiplier(60, 0)}"
+    assert mov_multiplier(24, 0, 300) < mov_multiplier(24, 0) < mov_multiplier(24, 0, -300), "The favourite's win is not dampened"
+    print("✓ Test passed: margin-of-victory multipliers")
+
+def test_update_moves_ratings_zero_sum():
+    elo = EloRatings()
+    change = elo.update("A", "B", 31, 7, "N")
+    assert change > 0, f"The winner lost rating points: {change}"
+    assert elo.rankings() == {"A": INITIAL_RATING + change, "B": INITIAL_RATING - change}, f"Unexpected ratings {elo.rankings()}"
+    home_win = EloRatings().update("A", "B", 31, 7, "")
+    away_win = EloRatings().update("A", "B", 31, 7, "@")
+    assert home_win < change < away_win, "A home win should be worth less than a neutral one, and an away win more"
+    print("✓ Test passed: Elo updates are zero-sum and account for home field")
+
+def test_streaming_replay_matches_game_by_game():
+    conn = _elo_test_db()
+    expected = _replay_one_by_one(conn)
+    result = calculate_elo_rankings(conn=conn, use_checkpoints=False)
+    assert list(result) == list(expected), "Streaming order differs from the date order"
+    assert all(abs(result[team] - expected[team]) < 1e-9 for team in expected), f"Expected {expected}, but got {result}"
+    print("✓ Test passed: streaming replay matches the game-by-game ratings")
+
+def test_replay_from_checkpoints_matches_a_full_replay():
+    conn = _elo_test_db()
+    full = calculate_elo_ratings(conn=conn, checkpoint_interval=40)
+    checkpoints = conn.execute('SELECT "Games" FROM elo_checkpoints ORDER BY "Games"').fetchall()
+    assert [row[0] for row in checkpoints] == list(range(40, 300, 40)), f"Unexpected checkpoints {checkpoints}"
+
+    for as_of in (date(2022, 10, 15), date(2023, 9, 30), None):
+        restored = calculate_elo_ratings(as_of, conn=conn, checkpoint_interval=40)
+        expected = _replay_one_by_one(conn, as_of)
+        assert restored.rankings() == calculate_elo_ratings(as_of, conn=conn, use_checkpoints=False).rankings(), f"Checkpoint replay differs as of {as_of}"
+        assert all(abs(restored.rankings()[team] - expected[team]) < 1e-9 for team in expected), f"Unexpected ratings as of {as_of}"
+    assert restored.games_processed == full.games_processed == 300, f"Unexpected games processed {restored.games_processed}"
+
+    # A checkpoint is restored instead of replaying from the first game
+    elo = EloRatings()
+    assert load_checkpoint(conn, elo, date(2023, 9, 30)) and elo.games_processed > 0, "No checkpoint was restored"
+    print("✓ Test passed: replays from checkpoints match full replays")
+
+def test_checkpoints_are_dropped_when_the_schedule_changes():
+    conn = _elo_test_db()
+    calculate_elo_ratings(conn=conn, checkpoint_interval=50)
+    conn.execute('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Year, Month, Day) VALUES ("Team 1", "Team 2", 70, 0, "N", 2022, 8, 1)')
+    conn.commit()
+    result = calculate_elo_rankings(conn=conn, checkpoint_interval=50)
+    expected = _replay_one_by_one(conn)
+    assert all(abs(result[team] - expected[team]) < 1e-9 for team in expected), "Stale checkpoints were used after the schedule changed"
+    print("✓ Test passed: checkpoints are dropped when the schedule changes")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("ELO RANKING")
+    print("------------------------------------------------------------------------")
+    test_mov_multiplier_follows_the_margin_buckets()
+    test_update_moves_ratings_zero_sum()
+    test_streaming_replay_matches_game_by_game()
+    test_replay_from_checkpoints_matches_a_full_replay()
+    test_checkpoints_are_dropped_when_the_schedule_changes()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fetchers_cfb
+from fetchers_cfb import *
+
+
+
+class _StubResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode()
+
+class _StubSession:
+    # Answers every URL with its own text, or HTTP 500 for URLs containing "fail"
+    def __init__(self):
+        self.requests = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.requests.append((url, time.monotonic()))
+        if "fail" in url:
+            return _StubResponse(500, "")
+        return _StubResponse(200, f"<html>{url}</html>")
+
+    def close(self):
+        self.closed = True
+
+def test_rate_limiter_spaces_requests_per_host():
+    clock = [100.0]
+    sleeps = []
+    # The fake clock does not move while sleeping, so every reservation queues behind the previous one
+    fake_time = SimpleNamespace(monotonic=lambda: clock[0], sleep=sleeps.append)
+    real_time = fetchers_cfb.time
+    fetchers_cfb.time = fake_time
+    try:
+        limiter = RateLimiter(requests_per_minute=60)
+        for url in ["https://a.test/1", "https://a.test/2", "https://b.test/1", "https://a.test/3"]:
+            limiter.wait(url)
+        assert sleeps == [1.0, 2.0], f"Unexpected sleeps {sleeps}"
+        clock[0] = 110.0
+        limiter.wait("https://a.test/4")
+        assert sleeps == [1.0, 2.0], "A request after the interval had passed waited"
+    finally:
+        fetchers_cfb.time = real_time
+    print("✓ Test passed: the rate limiter spaces requests per host")
+
+def test_fetch_pages_fetches_each_url_once_with_spacing():
+    session = _StubSession()
+    urls = ["https://a.test/1", "https://a.test/2", "https://a.test/1", "https://b.test/fail", "https://a.test/3"]
+    # 600 requests a minute is one request to a host every 0.1 seconds
+    start = time.monotonic()
+    pages = fetch_pages(urls, max_workers=4, requests_per_minute=600, session=session, use_cache=False)
+    assert list(pages) == ["https://a.test/1", "https://a.test/2", "https://b.test/fail", "https://a.test/3"], f"Unexpected URLs {list(pages)}"
+    assert pages["https://a.test/2"] == "<html>https://a.test/2</html>", f"Unexpected page {pages['https://a.test/2']}"
+    assert pages["https://b.test/fail"] is None, "A failed page was not None"
+    requested = [url for url, _ in session.requests]
+    assert sorted(requested) == sorted(set(urls)), f"URLs were not requested exactly once: {requested}"
+    times = sorted(request_time for url, request_time in session.requests if url.startswith("https://a.test"))
+    # A worker can be scheduled late after its slot, so the k-th request is only guaranteed not to be early
+    offsets = [request_time - start for request_time in times]
+    assert all(offset >= 0.1 * k - 0.001 for k, offset in enumerate(offsets)), f"Requests to one host were not spaced: {offsets}"
+    assert not session.closed, "A session passed in by the caller was closed"
+    print("✓ Test passed: fetch_pages fetches each URL once, spaced per host")
+
+def test_fetch_pages_closes_its_own_session():
+    sessions = []
+    real_create_session = fetchers_cfb.create_session
+    fetchers_cfb.create_session = lambda pool_size=4: sessions.append(_StubSession()) or sessions[-1]
+    try:
+        pages = fetch_pages(["https://a.test/1", "https://a.test/fail"], requests_per_minute=6000, use_cache=False)
+    finally:
+        fetchers_cfb.create_session = real_create_session
+    assert len(sessions) == 1 and sessions[0].closed, "The fetcher's own session was not closed"
+    assert pages == {"https://a.test/1": "<html>https://a.test/1</html>", "https://a.test/fail": None}, f"Unexpected pages {pages}"
+    print("✓ Test passed: fetch_pages closes the session it created")
+
+def test_fetch_season_pages_marks_only_completed_seasons_immutable():
+    calls = []
+
+    def fake_fetch_pages(urls, **kwargs):
+        urls = list(urls)
+        calls.append((urls, kwargs))
+        return {url: f"<html>{url}</html>" for url in urls}
+
+    real_fetch_pages, real_current_season = fetchers_cfb.fetch_pages, fetchers_cfb.current_season
+    fetchers_cfb.fetch_pages, fetchers_cfb.current_season = fake_fetch_pages, lambda: 2024
+    try:
+        pages = fetch_season_pages([2023, 2024], ("schedule", "team_offense"), use_cache=False)
+    finally:
+        fetchers_cfb.fetch_pages, fetchers_cfb.current_season = real_fetch_pages, real_current_season
+    assert len(calls) == 1, "The seasons were not fetched in one batch"
+    expected_immutable = {URL_TEMPLATES["schedule"].format(year=2023), URL_TEMPLATES["team_offense"].format(year=2023)}
+    assert calls[0][1]["immutable_urls"] == expected_immutable, f"Unexpected immutable URLs {calls[0][1]['immutable_urls']}"
+    assert sorted(pages) == [(2023, "schedule"), (2023, "team_offense"), (2024, "schedule"), (2024, "team_offense")], f"Unexpected keys {sorted(pages)}"
+    assert pages[(2024, "schedule")] == f"<html>{URL_TEMPLATES['schedule'].format(year=2024)}</html>", "Pages were mapped to the wrong season"
+    print("✓ Test passed: only completed seasons are marked immutable")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("CONCURRENT FETCHING")
+    print("------------------------------------------------------------------------")
+    test_rate_limiter_spaces_requests_per_host()
+    test_fetch_pages_fetches_each_url_once_with_spacing()
+    test_fetch_pages_closes_its_own_session()
+    test_fetch_season_pages_marks_only_completed_seasons_immutable()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import sys
+import os
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import *
+
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def _serve_directory(directory):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_response_cache_revalidates_and_serves_offline():
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache_dir:
+        with open(os.path.join(site, "names.txt"), "w") as f:
+            f.write("Florida St.|Florida State|Florida St|\n")
+        server = _serve_directory(site)
+        url = f"http://127.0.0.1:{server.server_address[1]}/names.txt"
+        try:
+            cache = ResponseCache(cache_dir)
+            first = cache.fetch(url)
+            assert first == "Florida St.|Florida State|Florida St|\n", f"Unexpected body {first}"
+            assert cache.get_metadata(url)["last_modified"] is not None
+            # Served from the 304 revalidation
+            assert cache.fetch(url) == first
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert ResponseCache(cache_dir, offline=True).fetch(url) == first
+        assert ResponseCache(cache_dir, offline=True).fetch(url + "?missing") is None
+        print("✓ Test passed: response cache revalidation and offline mode")
+
+def test_response_cache_immutable_urls_skip_the_network():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResponseCache(cache_dir)
+        url = "http://127.0.0.1:9/cfb/years/2019-schedule.html"
+        cache.store(url, "<table id=\"schedule\"></table>")
+        assert cache.read_without_revalidation(url) is None
+        assert cache.mark_immutable(url)
+        # Nothing listens on port 9, so this only succeeds if the cache answers
+        assert cache.fetch(url) == "<table id=\"schedule\"></table>"
+        print("✓ Test passed: immutable URLs are served from the cache")
+
+def test_concurrent_writes_of_one_url_do_not_collide():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResponseCache(cache_dir)
+        url = "http://127.0.0.1:9/cfb/years/2024-schedule.html"
+        errors = []
+
+        def store(body):
+            try:
+                for _ in range(20):
+                    cache.store(url, body)
+            except OSError as e:
+                errors.append(e)
+
+        bodies = [f"<table id=\"schedule\">{index}</table>" for index in range(8)]
+        threads = [threading.Thread(target=store, args=(body,)) for body in bodies]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, f"Concurrent writes failed: {errors}"
+        assert cache.read(url) in bodies, "The cached body is not one of the written bodies"
+        leftovers = [name for directory, _, names in os.walk(cache_dir) for name in names if name.endswith(".tmp")]
+        assert not leftovers, f"Temporary files were left behind: {leftovers}"
+        print("✓ Test passed: concurrent writes of one URL do not collide")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("HTTP RESPONSE CACHE")
+    print("------------------------------------------------------------------------")
+    test_response_cache_revalidates_and_serves_offline()
+    test_response_cache_immutable_urls_skip_the_network()
+    test_concurrent_writes_of_one_url_do_not_collide()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cumulative import time budgets in milliseconds, about three times what was measured (~150 ms, mostly numpy)
+IMPORT_TIME_BUDGETS_MS = {
+    "ranking_system": 450,
+    "school_naming_information": 450,
+    "fetchers_cfb": 500,
+    "http_cache": 100,
+    "data_exchange": 450,
+    "ranking_history": 450,
+    "scoring_policies": 450,
+    "rating_solver": 450,
+    "season_simulator": 450,
+    "season_store": 450,
+}
+# Loaded only on the paths that need them: DataFrame ingest, HTTP fetches, the BeautifulSoup baseline parser, data exchange, and the direct rating solver
+LAZY_DEPENDENCIES = ("pandas", "requests", "bs4", "pyarrow", "scipy")
+
+
+
+def _import_times(module: str) -> dict:
+    """_summary_
+    Imports a module in a fresh interpreter under python -X importtime.
+
+    Returns:
+        dict: Dictionary mapping every module imported to its cumulative import time in milliseconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, cwd=REPO_ROOT)
+    assert result.returncode == 0, f"Importing {module} failed: {result.stderr}"
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def test_imports_do_not_load_heavy_dependencies():
+    for module in IMPORT_TIME_BUDGETS_MS:
+        times = _import_times(module)
+        loaded = [dependency for dependency in LAZY_DEPENDENCIES if dependency in times]
+        assert not loaded, f"Importing {module} loaded {loaded}"
+    print("✓ Test passed: pandas, requests, bs4, pyarrow, and scipy load lazily")
+
+def test_import_time_budget():
+    for module, budget_ms in IMPORT_TIME_BUDGETS_MS.items():
+        # The fastest of three runs, so a busy machine does not fail the budget
+        import_time_ms = min(_import_times(module)[module] for _ in range(3))
+        assert import_time_ms <= budget_ms, f"Importing {module} took {import_time_ms:.0f} ms, over its {budget_ms} ms budget"
+        print(f"✓ Test passed: {module} imports in {import_time_ms:.0f} ms (budget {budget_ms} ms)")
+
+def test_imports_open_no_connections():
+    script = (
+        "import sqlite3\n"
+        "connections = []\n"
+        "connect = sqlite3.connect\n"
+        "sqlite3.connect = lambda *args, **kwargs: connections.append(args) or connect(*args, **kwargs)\n"
+        "import ranking_system, school_naming_information, fetchers_cfb, season_store, scoring_policies, ranking_history, rating_solver, season_simulator, elo_ranking, data_exchange, rankings_service\n"
+        "print(len(connections))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=REPO_ROOT)
+    assert result.returncode == 0, f"The imports failed: {result.stderr}"
+    assert result.stdout.strip() == "0", f"Importing opened {result.stdout.strip()} connections"
+    print("✓ Test passed: importing opens no database connections")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("IMPORT TIME")
+    print("------------------------------------------------------------------------")
+    test_imports_do_not_load_heavy_dependencies()
+    test_import_time_budget()
+    test_imports_open_no_connections()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
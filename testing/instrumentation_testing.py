@@ -0,0 +1,119 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import sqlite3
+import subprocess
+import tempfile
+from instrumentation import *
+from db.db import bulk_insert_into_table, query_db
+from schedule_parser import parse_schedule
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+SCHEDULE_PAGE = """<table id="schedule"><tr><th>Rk</th></tr>
+<tr><th>1</th><td>1</td><td>Aug 24 2024</td><td>12:00 PM</td><td>Sat</td><td>Georgia Tech</td><td>24</td><td>N</td><td>Florida State</td><td>21</td><td></td></tr>
+<tr><th>2</th><td>16</td><td>Jan 20 2025</td><td>7:30 PM</td><td>Mon</td><td>Ohio State</td><td></td><td>N</td><td>Notre Dame</td><td></td><td></td></tr>
+</table>"""
+
+def _read_log(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_hooks_do_nothing_while_disabled():
+    disable()
+    reset()
+
+    @timed()
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3, "The decorated function returned the wrong value"
+    with timer("stage"):
+        count("counter", 5)
+    log("event", value=1)
+    assert snapshot() == {"timers": {}, "counters": {}}, f"Disabled hooks recorded {snapshot()}"
+    print("✓ Test passed: hooks record nothing while instrumentation is off")
+
+def test_timers_counters_and_sql_are_recorded_as_json_lines():
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, "log.jsonl")
+        reset()
+        enable(log_path)
+        try:
+            @timed("test.add")
+            def add(a, b):
+                return a + b
+
+            add(1, 2)
+            add(3, 4)
+            with timer("test.block", season=2024):
+                count("test.counter", 2)
+
+            conn = sqlite3.connect(":memory:")
+            trace_connection(conn)
+            conn.execute("CREATE TABLE games (Winner TEXT, Points INTEGER)")
+            bulk_insert_into_table(conn, {"Winner": ["A", "B", "C"], "Points": [1, 2, 3]}, "games")
+            query_db(conn, "SELECT * FROM games")
+            games = list(parse_schedule(SCHEDULE_PAGE))
+            summary = snapshot()
+        finally:
+            disable()
+
+        assert summary["timers"]["test.add"]["calls"] == 2, f"Unexpected timers {summary['timers']}"
+        assert summary["timers"]["db.db.query_db"]["calls"] == 1, f"query_db was not timed: {summary['timers']}"
+        assert summary["counters"]["test.counter"] == 2, f"Unexpected counters {summary['counters']}"
+        assert summary["counters"][ROWS_INSERTED] == 3 and summary["counters"][ROWS_REJECTED] == 0, f"Unexpected counters {summary['counters']}"
+        assert summary["counters"][SQL_STATEMENTS] >= 3, f"SQL statements were not counted: {summary['counters']}"
+        assert len(games) == 1 and summary["counters"][ROWS_PARSED] == 2, f"Unexpected parsed rows {summary['counters']}"
+
+        records = _read_log(log_path)
+        block = [record for record in records if record["event"] == "timer" and record["name"] == "test.block"]
+        assert len(block) == 1 and block[0]["season"] == 2024 and block[0]["ms"] >= 0, f"Unexpected block record {block}"
+        inserts = [record for record in records if record["event"] == "db.insert"]
+        assert inserts and inserts[0]["table"] == "games" and inserts[0]["inserted"] == 3, f"Unexpected insert records {inserts}"
+    reset()
+    print("✓ Test passed: timers, counters, and SQL statements are recorded as JSON lines")
+
+def test_profile_dumps_stats():
+    import pstats
+
+    with tempfile.TemporaryDirectory() as directory:
+        stats_path = os.path.join(directory, "run.prof")
+        with profile(stats_path, limit=0):
+            sorted(range(1000), key=lambda value: -value)
+        stats = pstats.Stats(stats_path)
+        assert any(function[2] == "sorted" or "sorted" in function[2] for function in stats.stats), "The profile did not record the block"
+    print("✓ Test passed: profile dumps cProfile stats")
+
+def test_command_line_runs_a_script_instrumented():
+    with tempfile.TemporaryDirectory() as directory:
+        script_path = os.path.join(directory, "pipeline.py")
+        log_path = os.path.join(directory, "log.jsonl")
+        with open(script_path, "w") as f:
+            f.write("import sqlite3\nfrom db.db import bulk_insert_into_table\nconn = sqlite3.connect(':memory:')\nconn.execute('CREATE TABLE t (a INTEGER)')\nbulk_insert_into_table(conn, {'a': [1, 2]}, 't')\n")
+        environment = {key: value for key, value in os.environ.items() if key not in (ENABLE_ENVIRONMENT_VARIABLE, LOG_ENVIRONMENT_VARIABLE)}
+        result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "instrumentation.py"), "--log", log_path, script_path], capture_output=True, text=True, env=environment, cwd=directory)
+        assert result.returncode == 0, f"The run failed: {result.stderr}"
+        summaries = [record for record in _read_log(log_path) if record["event"] == "summary"]
+        assert len(summaries) == 1, f"Expected one summary, but got {summaries}"
+        assert summaries[0]["counters"][ROWS_INSERTED] == 2, f"Unexpected summary {summaries[0]}"
+        assert "db.db.bulk_insert_into_table" in summaries[0]["timers"], f"Unexpected summary {summaries[0]}"
+    print("✓ Test passed: the command line instruments an unmodified script")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("INSTRUMENTATION")
+    print("------------------------------------------------------------------------")
+    test_hooks_do_nothing_while_disabled()
+    test_timers_counters_and_sql_are_recorded_as_json_lines()
+    test_profile_dumps_stats()
+    test_command_line_runs_a_script_instrumented()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import sqlite3
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ranking_history import *
+
+
+
+def _schedule_db():
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    games = [
+        ("Georgia", "Clemson", 34, 3, "Aug 31 2024", 1, 2024, 8, "S00677", "S00397"),
+        ("Texas", "Michigan", 31, 12, "Sep 7 2024", 2, 2024, 9, "S01583", "S01092"),
+        ("Georgia", "Kentucky", 13, 12, "Sep 14 2024", 3, 2024, 9, "S00677", "S00875"),
+        ("Texas", "Georgia", 30, 15, "Oct 19 2024", 8, 2024, 10, "S01583", "S00677"),
+    ]
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Date, Week, Year, Month, "Winner ID", "Loser ID") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', games)
+    conn.commit()
+    return conn
+
+def test_materialized_snapshots_are_cumulative_per_week():
+    conn = _schedule_db()
+    try:
+        assert materialize_rankings_history(conn) == 2 + 4 + 5 + 5
+        week_two = get_rankings_after_week(conn, 2024, 2)
+        expected = {"team_id": ["S00677", "S01583", "S01092", "S00397"], "score": [5.0, 4.0, -4.0, -5.0], "rank": [1, 2, 3, 4]}
+        assert week_two == expected, f"Expected {expected}, but got {week_two}"
+        history = get_team_rank_history(conn, "S00677")
+        assert history["score"] == [5.0, 5.0, 5.5, 3.5], f"Unexpected history {history}"
+        assert history["rank"] == [1, 1, 1, 2], f"Unexpected history {history}"
+        movement = get_rank_movement(conn, 2024, 8)
+        assert movement["team_id"][:2] == ["S01583", "S00677"] and movement["movement"][:2] == [1, -1], f"Unexpected movement {movement}"
+        print("✓ Test passed: weekly snapshots are cumulative")
+    finally:
+        conn.close()
+
+def test_failed_materialization_keeps_the_previous_snapshots():
+    conn = _schedule_db()
+    try:
+        materialize_rankings_history(conn)
+        assert not conn.in_transaction, "The snapshots were left uncommitted"
+        previous = conn.execute("SELECT * FROM rankings_history ORDER BY season, week, rank, team_id").fetchall()
+        conn.execute('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Week, Year, Month) VALUES (\'Clemson\', \'Texas\', 20, 10, 9, 2024, 10)')
+        conn.execute("CREATE TEMP TRIGGER fail_history BEFORE INSERT ON rankings_history BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+        conn.commit()
+        assert materialize_rankings_history(conn, [2024]) is None, "A failed materialization reported rows"
+        assert conn.execute("SELECT * FROM rankings_history ORDER BY season, week, rank, team_id").fetchall() == previous, "The previous snapshots were deleted"
+        print("✓ Test passed: a failed materialization keeps the previous snapshots")
+    finally:
+        conn.close()
+
+def test_tied_scores_share_a_rank():
+    weekly = calculate_weekly_rankings([1, 1], ["A", "C"], ["B", "D"], [10, 10], [3, 3])
+    assert weekly["rank"].tolist() == [1, 1, 3, 3], f"Unexpected ranks {weekly}"
+    print("✓ Test passed: tied scores share a rank")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("RANKINGS HISTORY")
+    print("------------------------------------------------------------------------")
+    test_materialized_snapshots_are_cumulative_per_week()
+    test_failed_materialization_keeps_the_previous_snapshots()
+    test_tied_scores_share_a_rank()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import sys
+import os
+import random
+import sqlite3
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ranking_system import *
+
+
+
+def _rank_games_one_by_one(games, running_rankings):
+    running_rankings = running_rankings.copy()
+    for Winning_Team, Losing_Team, Winning_Team_Points, Losing_Team_Points in games:
+        margin_of_victory_score = calculate_margin_of_victory_score(Winning_Team_Points, Losing_Team_Points)
+        running_rankings[Winning_Team] = running_rankings.get(Winning_Team, 0) + margin_of_victory_score
+        running_rankings[Losing_Team] = running_rankings.get(Losing_Team, 0) - margin_of_victory_score
+    return running_rankings
+
+def test_margin_of_victory_scores_match_scalar_buckets():
+    margins = list(range(0, 80))
+    result = calculate_margin_of_victory_scores(margins, [0] * len(margins)).tolist()
+    expected = [calculate_margin_of_victory_score(margin, 0) for margin in margins]
+    assert result == expected, f"Expected {expected}, but got {result}"
+    print("✓ Test passed: vectorized margin-of-victory buckets")
+
+def test_games_without_a_score_are_not_ranked():
+    try:
+        calculate_margin_of_victory_scores([30, None], [10, 3])
+        assert False, "A game without a score was scored"
+    except ValueError:
+        pass
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    # The second game has not been played yet
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Year, Month) VALUES (?, ?, ?, ?, ?, ?)',
+                     [("A", "B", 30, 10, 2024, 9), ("C", "D", None, None, 2024, 10)])
+    conn.commit()
+    assert calculate_running_rankings(2024, conn) == {"A": 4.0, "B": -4.0}, "A game without a score was ranked"
+    assert calculate_rankings_for_seasons(2024, 2024, conn=conn)[2024] == {"A": 4.0, "B": -4.0}, "A game without a score was ranked"
+    print("✓ Test passed: games without a score are not ranked")
+
+def test_rank_games_matches_game_by_game_totals():
+    generator = random.Random(7)
+    teams = [f"Team {i}" for i in range(40)]
+    games = []
+    for _ in range(500):
+        Winning_Team, Losing_Team = generator.sample(teams, 2)
+        Losing_Team_Points = generator.randint(0, 40)
+        games.append((Winning_Team, Losing_Team, Losing_Team_Points + generator.randint(1, 60), Losing_Team_Points))
+    previous = {"Team 3": 12.5, "Team 99": -4}
+    Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points = zip(*games)
+
+    result = rank_games(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, previous)
+    expected = _rank_games_one_by_one(games, previous)
+    assert list(result.items()) == list(expected.items()), "Vectorized totals or team order differ from the game-by-game loop"
+    assert previous == {"Team 3": 12.5, "Team 99": -4}, "Previous rankings were modified"
+    print("✓ Test passed: vectorized rankings match the game-by-game loop")
+
+def _seasons_test_db():
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    games = [
+        ("A", "B", 30, 3, 2022, 9), ("C", "A", 14, 10, 2022, 11), ("B", "C", 45, 0, 2023, 1),
+        ("D", "A", 21, 20, 2023, 9), ("B", "D", 28, 7, 2023, 10), ("A", "C", 60, 10, 2024, 9),
+    ]
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Year, Month) VALUES (?, ?, ?, ?, ?, ?)', games)
+    conn.commit()
+    return conn
+
+def test_rankings_for_seasons_carry_over():
+    conn = _seasons_test_db()
+    full = calculate_rankings_for_seasons(2022, 2024, conn=conn)
+    assert full[2022] == {"A": 4.0, "B": 2.0, "C": -6.0}, f"Unexpected 2022 rankings: {full[2022]}"
+    expected = rank_games(["D", "B"], ["A", "D"], [21, 28], [20, 7], full[2022])
+    assert list(full[2023].items()) == list(expected.items()), f"Full carry-over differs from chaining: {full[2023]}"
+
+    reset = calculate_rankings_for_seasons(2022, 2024, "reset", conn=conn)
+    assert list(reset[2023]) == ["D", "A", "B"], f"Reset rankings are not in first-played order: {list(reset[2023])}"
+    assert reset[2023] == {"D": -3.5, "A": -0.5, "B": 4.0}, f"Unexpected reset rankings: {reset[2023]}"
+    assert reset[2024] == {"A": 8.0, "C": -8.0}, f"Unexpected reset rankings: {reset[2024]}"
+
+    decayed = calculate_rankings_for_seasons(2022, 2023, 0.5, scoring=lambda W, L: np.ones(len(W)), conn=conn)
+    assert decayed[2023] == {"A": -1.0, "B": 1.0, "C": 0.0, "D": 0.0}, f"Unexpected decayed rankings: {decayed[2023]}"
+    print("✓ Test passed: multi-season rankings with carry-over")
+
+def test_rankings_for_seasons_validates_the_range_and_passes_locations():
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Year, Month) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     [("A", "B", 40, 10, "", 2024, 9), ("C", "D", 40, 10, "@", 2024, 9), ("E", "F", 40, 10, "N", 2024, 9)])
+    conn.commit()
+    try:
+        calculate_rankings_for_seasons(2024, 2023, conn=conn)
+        assert False, "An empty season range was accepted"
+    except ValueError as e:
+        assert "before first_season" in str(e), f"Unexpected error {e}"
+
+    from scoring_policies import compile_policy
+    policy = compile_policy({"type": "buckets", "location_weights": {"away": 2.0, "neutral": 0.5}})
+    rankings = calculate_rankings_for_seasons(2024, 2024, scoring=policy, conn=conn)[2024]
+    assert rankings["C"] == 2 * rankings["A"] and rankings["E"] == 0.5 * rankings["A"], f"Locations were not passed to the policy: {rankings}"
+    print("✓ Test passed: multi-season rankings validate the range and pass locations to the scoring")
+
+def _season_rankings(conn, year):
+    games = query_season_games(conn, year)
+    return rank_games(games["Winner"], games["Loser"], games["Winner Points"], games["Loser Points"])
+
+def test_accumulator_appends_match_a_full_recompute():
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    random.seed(7)
+    teams = [f"Team {index}" for index in range(12)]
+    accumulator = RankingAccumulator(conn, 2024)
+    applied = 0
+    for _ in range(5):
+        batch = []
+        for _ in range(20):
+            winner, loser = random.sample(teams, 2)
+            # One game in four belongs to another season and must be skipped
+            year, month = random.choice([(2024, 9), (2024, 11), (2025, 1), (2023, 10)])
+            batch.append((winner, loser, random.randint(20, 60), random.randint(0, 19), year, month))
+        conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Year, Month) VALUES (?, ?, ?, ?, ?, ?)', batch)
+        conn.commit()
+        applied += accumulator.update()
+        expected = _season_rankings(conn, 2024)
+        assert accumulator.running_rankings == expected, f"Incremental totals differ from a full recompute: {accumulator.running_rankings}"
+    assert applied == len(query_season_games(conn, 2024)["Winner"]), f"Applied {applied} games"
+    assert accumulator.update() == 0, "An update without new games applied games"
+    reloaded = RankingAccumulator(conn, 2024)
+    assert reloaded.running_rankings == accumulator.running_rankings and reloaded.last_rowid == accumulator.last_rowid, "The persisted state was not reloaded"
+    print("✓ Test passed: incremental accumulator updates match a full recompute")
+
+def test_accumulator_rebuilds_after_updates_and_deletes():
+    conn = _seasons_test_db()
+    accumulator = RankingAccumulator(conn, 2022)
+    assert accumulator.update() == 3
+    conn.execute('UPDATE schedule SET "Winner Points" = 50 WHERE Winner = \'C\'')
+    conn.commit()
+    assert accumulator.update() == 3, "The season was not rebuilt after an update"
+    assert accumulator.running_rankings == _season_rankings(conn, 2022), f"Stale totals after an update: {accumulator.running_rankings}"
+
+    conn.execute("DELETE FROM schedule WHERE Winner = 'B' AND Loser = 'C'")
+    conn.commit()
+    # A new process sees the delete too
+    reloaded = RankingAccumulator(conn, 2022)
+    assert reloaded.update() == 2, "The season was not rebuilt after a delete"
+    assert reloaded.running_rankings == _season_rankings(conn, 2022), f"Stale totals after a delete: {reloaded.running_rankings}"
+
+    # Appends, to this season or another, do not force a rebuild
+    conn.execute('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Year, Month) VALUES (\'C\', \'A\', 35, 0, 2022, 11)')
+    conn.execute('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Year, Month) VALUES (\'A\', \'B\', 35, 0, 2024, 10)')
+    conn.commit()
+    assert reloaded.update() == 1, "Appends rebuilt the season"
+    assert reloaded.running_rankings == _season_rankings(conn, 2022), f"Unexpected totals after an append: {reloaded.running_rankings}"
+    print("✓ Test passed: the accumulator rebuilds after rows are updated or deleted")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("RANKING ENGINE")
+    print("------------------------------------------------------------------------")
+    test_margin_of_victory_scores_match_scalar_buckets()
+    test_games_without_a_score_are_not_ranked()
+    test_rank_games_matches_game_by_game_totals()
+    test_rankings_for_seasons_carry_over()
+    test_rankings_for_seasons_validates_the_range_and_passes_locations()
+    test_accumulator_appends_match_a_full_recompute()
+    test_accumulator_rebuilds_after_updates_and_deletes()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
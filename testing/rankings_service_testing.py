@@ -0,0 +1,198 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+import http.client
+import json
+import sqlite3
+import tempfile
+import threading
+from rankings_service import *
+from ranking_system import calculate_running_rankings
+from ranking_history import materialize_rankings_history
+from benchmarks.load_test_rankings_service import run_load
+
+
+
+def _service_test_db():
+    # The service runs on the event loop's thread
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    create_schedule_table(conn)
+    games = [
+        ("Ohio State", "Michigan", 42, 10, "", 2024, 11, "30", 14, "S1", "S2"),
+        ("Michigan", "Texas", 24, 21, "@", 2024, 9, "7", 2, "S2", "S3"),
+        ("Texas", "Ohio State", 28, 14, "N", 2024, 9, "14", 3, "S3", "S1"),
+        ("Ohio State", "Texas", 28, 14, "N", 2025, 1, "10", 16, "S1", "S3"),
+    ]
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Year, Month, Day, Week, "Winner ID", "Loser ID") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', games)
+    create_table(conn, ["ID", "Canonical Name", "Aliases"], "schools")
+    conn.executemany("INSERT INTO schools VALUES (?, ?, ?)", [("S1", "Ohio State", "Ohio St., OSU"), ("S2", "Michigan", "Mich"), ("S3", "Texas", "UT")])
+    conn.commit()
+    ensure_schedule_version_tracking(conn)
+    return conn
+
+def _start_in_thread(service):
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+
+    return server.sockets[0].getsockname()[1], stop
+
+def _get(connection, path, method="GET"):
+    connection.request(method, path)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+def test_lru_evicts_least_recently_used_and_invalidates_old_versions():
+    cache = RankingsCache(2)
+    cache.set_schedule_version(1)
+    cache.put((2023, "default", 1), "a")
+    cache.put((2024, "default", 1), "b")
+    assert cache.get((2023, "default", 1)) == "a", "Entry missing"
+    cache.put((2024, "log", 1), "c")
+    assert cache.get((2024, "default", 1)) is None and len(cache) == 2, "The least recently used entry was not evicted"
+    cache.set_schedule_version(2)
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1, f"Entries of the old version were kept: {cache.stats()}"
+    assert cache.stats()["evictions"] == 1 and cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1, f"Unexpected statistics {cache.stats()}"
+    print("✓ Test passed: the LRU evicts the least recently used entry and drops old versions")
+
+def test_rankings_are_cached_until_the_schedule_changes():
+    conn = _service_test_db()
+    service = RankingsService(conn, policies={"default": DEFAULT_POLICY})
+    status, body = service.handle_request("GET", "/rankings/2024")
+    document = json.loads(body)
+    expected = calculate_running_rankings(2024, conn)
+    assert status == 200 and {row["team"]: row["score"] for row in document["rankings"]} == expected, f"Expected {expected}, but got {document}"
+    assert [row["rank"] for row in document["rankings"]] == [1, 2, 3] and document["rankings"][0]["team"] == max(expected, key=expected.get), "Teams are not ranked best first"
+
+    _, limited = service.handle_request("GET", "/rankings/2024?limit=1")
+    assert len(json.loads(limited)["rankings"]) == 1, "The limit was not applied"
+    assert service.cache.stats()["hits"] == 1 and service.cache.stats()["misses"] == 1, f"The second request was not a cache hit: {service.cache.stats()}"
+
+    conn.execute('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Year, Month, Day, Week) VALUES ("Michigan", "Ohio State", 60, 0, "", 2024, 10, "5", 6)')
+    conn.commit()
+    updated = json.loads(service.handle_request("GET", "/rankings/2024")[1])
+    assert updated["schedule_version"] > document["schedule_version"], "The schedule version did not change"
+    assert {row["team"]: row["score"] for row in updated["rankings"]} == calculate_running_rankings(2024, conn), "Stale rankings were served after the schedule changed"
+    assert service.cache.stats()["invalidations"] == 1, f"Unexpected statistics {service.cache.stats()}"
+    assert service.handle_request("GET", "/rankings/2024?policy=unknown")[0] == 400, "An unknown policy was accepted"
+    print("✓ Test passed: rankings are cached until the schedule changes")
+
+def test_endpoints_over_http():
+    conn = _service_test_db()
+    materialize_rankings_history(conn)
+    port, stop = _start_in_thread(RankingsService(conn, policies={"default": DEFAULT_POLICY}))
+    try:
+        # Every request reuses one keep-alive connection
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        status, health = _get(connection, "/health")
+        assert status == 200 and health["status"] == "ok", f"Unexpected health {health}"
+        status, rankings = _get(connection, "/rankings/2024?limit=2")
+        assert status == 200 and len(rankings["rankings"]) == 2 and rankings["teams"] == 3, f"Unexpected rankings {rankings}"
+        status, resolved = _get(connection, "/resolve?name=Ohio%20St.")
+        assert status == 200 and resolved["id"] == "S1" and resolved["canonical_name"] == "Ohio State", f"Unexpected resolution {resolved}"
+        status, history = _get(connection, "/teams/Ohio%20State/history?season=2024")
+        assert status == 200 and history["team_id"] == "S1" and [row["week"] for row in history["history"]] == [3, 14, 16], f"Unexpected history {history}"
+        assert _get(connection, "/resolve?name=Nowhere%20Tech")[0] == 404, "An unknown school resolved"
+        assert _get(connection, "/nowhere")[0] == 404, "An unknown path was served"
+        assert _get(connection, "/health", method="POST")[0] == 405, "A POST was accepted"
+        connection.close()
+    finally:
+        stop()
+    print("✓ Test passed: endpoints over HTTP with keep-alive")
+
+def _service_file_db(path, winner_points):
+    conn = sqlite3.connect(path)
+    create_schedule_table(conn)
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Year, Month, Day, Week) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     [("Ohio State", "Michigan", winner_points, 10, "", 2024, 11, "30", 14), ("Michigan", "Texas", 24, 21, "@", 2024, 9, "7", 2)])
+    conn.commit()
+    conn.close()
+
+def test_open_read_only_writes_nothing():
+    with tempfile.TemporaryDirectory() as directory:
+        # URI syntax in the path must not be read as a query or fragment
+        path = os.path.join(directory, "odd name?#%.db")
+        _service_file_db(path, 42)
+        conn = open_read_only(path)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+            assert "schedule" in tables and "schedule_version" not in tables, f"Opening read-only changed the schema: {tables}"
+            try:
+                conn.execute("CREATE TABLE written (x)")
+                assert False, "The connection could write"
+            except sqlite3.OperationalError:
+                pass
+        finally:
+            conn.close()
+        assert os.listdir(directory) == ["odd name?#%.db"], f"Another file was opened: {os.listdir(directory)}"
+        assert prepare_database(path), "The database was not prepared"
+        conn = open_read_only(path)
+        try:
+            assert conn.execute("SELECT version FROM schedule_version").fetchone() is not None, "Version tracking was not set up"
+        finally:
+            conn.close()
+    print("✓ Test passed: open_read_only writes nothing and accepts any path")
+
+def test_replaced_database_is_not_served_from_the_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        path, replacement = os.path.join(directory, "served.db"), os.path.join(directory, "replacement.db")
+        # Both files have the same schedule version but different scores
+        _service_file_db(path, 42)
+        _service_file_db(replacement, 7)
+        prepare_database(path)
+        prepare_database(replacement)
+        service = RankingsService(open_read_only(path), policies={"default": DEFAULT_POLICY})
+        try:
+            before = json.loads(service.handle_request("GET", "/rankings/2024")[1])
+            os.replace(replacement, path)
+            after = json.loads(service.handle_request("GET", "/rankings/2024")[1])
+            assert after["schedule_version"] == before["schedule_version"], "The files were expected to have the same schedule version"
+            conn = sqlite3.connect(path)
+            try:
+                expected = calculate_running_rankings(2024, conn)
+            finally:
+                conn.close()
+            assert {row["team"]: row["score"] for row in after["rankings"]} == expected, "Rankings of the replaced file were served"
+            assert service.cache.stats()["misses"] == 2, f"The replaced file was served from the cache: {service.cache.stats()}"
+        finally:
+            service.conn.close()
+    print("✓ Test passed: a replaced database file is not served from the cache")
+
+def test_load_test_runs_against_the_service():
+    conn = _service_test_db()
+    service = RankingsService(conn, policies={"default": DEFAULT_POLICY})
+    port, stop = _start_in_thread(service)
+    try:
+        results = asyncio.run(run_load("127.0.0.1", port, ["/rankings/2024", "/resolve?name=OSU", "/health"], connections=4, duration=0.5))
+    finally:
+        stop()
+    assert results["requests"] > 0 and set(results["statuses"]) == {200}, f"Unexpected results {results}"
+    assert results["cache"]["misses"] == 1 and results["cache"]["hits"] > 0, f"Rankings were recomputed under load: {results['cache']}"
+    print(f"✓ Test passed: load test ran {results['requests_per_second']:.0f} requests/s")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("RANKINGS SERVICE")
+    print("------------------------------------------------------------------------")
+    test_lru_evicts_least_recently_used_and_invalidates_old_versions()
+    test_rankings_are_cached_until_the_schedule_changes()
+    test_endpoints_over_http()
+    test_open_read_only_writes_nothing()
+    test_replaced_database_is_not_served_from_the_cache()
+    test_load_test_runs_against_the_service()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
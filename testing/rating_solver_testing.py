@@ -0,0 +1,75 @@
+import sys
+import os
+import random
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rating_solver import *
+
+
+
+def _random_season(number_of_teams=25, number_of_games=150, seed=3):
+    generator = random.Random(seed)
+    teams = [f"Team {i}" for i in range(number_of_teams)]
+    games = []
+    for _ in range(number_of_games):
+        Winning_Team, Losing_Team = generator.sample(teams, 2)
+        Losing_Team_Points = generator.randint(0, 35)
+        games.append((Winning_Team, Losing_Team, Losing_Team_Points + generator.randint(1, 35), Losing_Team_Points))
+    return [list(column) for column in zip(*games)]
+
+def _dense(matrix):
+    return np.array([matrix.dot(column) for column in np.eye(matrix.size)]).T
+
+def test_colley_ratings_match_dense_solve():
+    Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points = _random_season()
+    graph = build_game_graph(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points)
+    matrix, b = build_colley_system(graph)
+    expected = dict(zip(graph["teams"], np.linalg.solve(_dense(matrix), b)))
+    result = solve_ratings(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, "colley")
+    assert all(abs(result[team] - expected[team]) < 1e-8 for team in expected), "Colley ratings differ from the dense solve"
+    # Colley ratings always average 1/2
+    assert abs(sum(result.values()) - len(result) / 2) < 1e-8
+    assert list(result.values()) == sorted(result.values(), reverse=True)
+    print("✓ Test passed: Colley ratings match a dense solve")
+
+def test_massey_ratings_are_minimum_norm_solution():
+    Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points = _random_season()
+    graph = build_game_graph(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points)
+    matrix, b = build_massey_system(graph)
+    expected = dict(zip(graph["teams"], np.linalg.lstsq(_dense(matrix), b, rcond=None)[0]))
+    result = solve_ratings(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, "massey")
+    assert all(abs(result[team] - expected[team]) < 1e-6 for team in expected), "Massey ratings differ from the least-squares solve"
+    assert abs(sum(result.values())) < 1e-6
+    print("✓ Test passed: Massey ratings match the minimum-norm solve")
+
+def test_teams_without_games_are_rated():
+    result = solve_ratings(["Georgia"], ["Alabama"], [41], [34], "colley", teams=["Idle State"])
+    rounded = {team: round(rating, 9) for team, rating in result.items()}
+    assert list(rounded.items()) == [("Georgia", 0.625), ("Idle State", 0.5), ("Alabama", 0.375)], f"Unexpected ratings {result}"
+    print("✓ Test passed: teams without games keep the neutral rating")
+
+def test_massey_direct_solve_handles_disconnected_groups():
+    # Two groups of teams that never played each other, plus a school without games
+    arguments = (["A", "C"], ["B", "D"], [30, 20], [10, 10], "massey")
+    expected = {"A": 10.0, "B": -10.0, "C": 5.0, "D": -5.0, "Idle State": 0.0}
+    for solver in SOLVERS:
+        result = solve_ratings(*arguments, solver, teams=["Idle State"])
+        assert all(np.isfinite(rating) for rating in result.values()), f"The {solver} solver returned non-finite ratings {result}"
+        assert all(abs(result[team] - rating) < 1e-8 for team, rating in expected.items()), f"Unexpected {solver} ratings {result}"
+    print("✓ Test passed: Massey ratings of disconnected groups sum to zero per group")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("RATING SOLVER")
+    print("------------------------------------------------------------------------")
+    test_colley_ratings_match_dense_solve()
+    test_massey_ratings_are_minimum_norm_solution()
+    test_teams_without_games_are_rated()
+    test_massey_direct_solve_handles_disconnected_groups()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
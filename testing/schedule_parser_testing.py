@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from schedule_parser import *
+
+
+
+SCHEDULE_PAGE = """<html><body>
+<table id="standings"><tr><td>1</td><td>Not a game</td></tr></table>
+<table class="sortable stats_table" id="schedule">
+<thead><tr><th>Rk</th><th>Wk</th><th>Date</th><th>Time</th><th>Day</th><th>Winner</th><th>Pts</th><th></th><th>Loser</th><th>Pts</th><th>Notes</th></tr></thead>
+<tbody>
+<tr><th>1</th><td>1</td><td><a href="#">Aug 24, 2024</a></td><td>12:00 PM</td><td>Sat</td><td><a href="#">Georgia Tech</a></td><td>24</td><td>N</td><td><a href="#">(10)&nbsp;Florida State</a></td><td>21</td><td>Aer Lingus Classic</td></tr>
+<tr class="thead"><th>Rk</th><th>Wk</th><th>Date</th></tr>
+<tr><th>2</th><td>1</td><td>Aug 24 2024</td><td>4:00 PM</td><td>Sat</td><td>Montana State</td><td>35</td><td>@</td><td>New Mexico</td><td>31</td><td></td></tr>
+<tr><th>3</th><td>16</td><td>Jan 20 2025</td><td>7:30 PM</td><td>Mon</td><td>Ohio State</td><td></td><td>N</td><td>Notre Dame</td><td></td><td></td></tr>
+</tbody></table>
+<table id="schedule_footer"><tr><td>1</td><td>Aug 24 2024</td></tr></table>
+</body></html>"""
+
+def _backends():
+    return ["html.parser", "lxml"] if etree is not None else ["html.parser"]
+
+def test_parse_schedule_yields_typed_played_games():
+    for backend in _backends():
+        games = list(parse_schedule(SCHEDULE_PAGE, backend))
+        expected = [
+            ScheduleGame(1, "Aug 24, 2024", "12:00 PM", "Sat", "Georgia Tech", 24, "N", "Florida State", 21, "Aer Lingus Classic", 2024, 8, 24),
+            ScheduleGame(1, "Aug 24 2024", "4:00 PM", "Sat", "Montana State", 35, "@", "New Mexico", 31, "", 2024, 8, 24),
+        ]
+        assert games == expected, f"{backend}: expected {expected}, but got {games}"
+        print(f"✓ Test passed: {backend} parses the schedule table")
+
+def test_parse_schedule_accepts_chunks():
+    chunks = [SCHEDULE_PAGE[start:start + 50] for start in range(0, len(SCHEDULE_PAGE), 50)]
+    for backend in _backends():
+        games = list(parse_schedule(iter(chunks), backend))
+        assert [game.winner for game in games] == ["Georgia Tech", "Montana State"], f"{backend}: unexpected games {games}"
+        print(f"✓ Test passed: {backend} parses a chunked page")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("SCHEDULE PARSER")
+    print("------------------------------------------------------------------------")
+    test_parse_schedule_yields_typed_played_games()
+    test_parse_schedule_accepts_chunks()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import sys
 import os
+import tempfile
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from school_naming_information import *
 
@@ -133,6 +134,195 @@ def test_get_school_naming_information_indiana_state():
         # Change back to original directory
         os.chdir(original_dir)
 
+def _build_schools_db(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute('CREATE TABLE schools ("ID", "Canonical Name", "Aliases")')
+    conn.executemany("INSERT INTO schools VALUES (?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+def test_school_name_resolver_exact_and_alias_hits():
+    conn = _build_schools_db([
+        ("S00627", "Florida St.", "Florida State, Florida St, "),
+        ("S00629", "Florida", None),
+    ])
+    try:
+        resolver = SchoolNameResolver()
+        assert resolver.load(conn)
+        assert resolver.lookup("Florida") == ("Florida", [], "S00629")
+        assert resolver.lookup("Florida St") == ("Florida St.", ["Florida State", " Florida St"], "S00627")
+        assert resolver.lookup("Miami") is None
+        print("✓ Test passed: resolver canonical and alias hits")
+    finally:
+        conn.close()
+
+def test_school_name_resolver_invalidate():
+    conn = _build_schools_db([("S00827", "Indiana", None)])
+    try:
+        resolver = SchoolNameResolver()
+        resolver.load(conn)
+        conn.execute("UPDATE schools SET Aliases = 'IU, ' WHERE ID = 'S00827'")
+        assert resolver.lookup("IU") is None
+        resolver.invalidate()
+        assert not resolver.is_loaded
+        resolver.load(conn)
+        assert resolver.lookup("IU") == ("Indiana", ["IU"], "S00827")
+        print("✓ Test passed: resolver reloads after invalidate")
+    finally:
+        conn.close()
+
+def test_school_name_resolver_fuzzy_match_is_learned():
+    conn = _build_schools_db([
+        ("S00627", "Florida St.", "Florida State, Florida St, "),
+        ("S00629", "Florida", None),
+        ("S01134", "Mississippi St.", "Mississippi State, "),
+    ])
+    with tempfile.TemporaryDirectory() as directory:
+        names_file_path = os.path.join(directory, "names.txt")
+        with open(names_file_path, "w", encoding="utf-8") as f:
+            f.write("Mississippi St.|Mississippi State|Miss State|\nNot A School|\n")
+        try:
+            resolver = SchoolNameResolver(names_file_path, learn_aliases=True)
+            resolver.load(conn)
+            candidates = resolver.candidates("Misissippi St", 2)
+            assert candidates[0][2] == "S01134" and candidates[0][3] > candidates[1][3], f"Unexpected candidates {candidates}"
+            assert resolver.lookup("Misissippi St") == ("Mississippi St.", ["Mississippi State"], "S01134")
+            assert resolver.lookup("Floride") is None, "An ambiguous fuzzy match was accepted"
+            learned = query_db(conn, 'SELECT "Alias", "ID" FROM school_aliases_learned')
+            assert learned == {"Alias": ["misissippi st"], "ID": ["S01134"]}, f"Unexpected learned aliases {learned}"
+
+            reloaded = SchoolNameResolver(names_file_path, learn_aliases=False)
+            reloaded.load(conn)
+            assert reloaded._alias_index.get("misissippi st") == ("Mississippi St.", ("Mississippi State",), "S01134"), "The learned alias is not an exact hit"
+            print("✓ Test passed: resolver learns confident fuzzy matches")
+        finally:
+            conn.close()
+
+def test_rank_prefixed_names_resolve_without_learning():
+    conn = _build_schools_db([
+        ("S00627", "Florida St.", "Florida State, Florida St, "),
+        ("S00629", "Florida", None),
+        ("S01134", "Mississippi St.", "Mississippi State, "),
+    ])
+    with tempfile.TemporaryDirectory() as directory:
+        names_file_path = os.path.join(directory, "names.txt")
+        with open(names_file_path, "w", encoding="utf-8") as f:
+            f.write("")
+        try:
+            resolver = SchoolNameResolver(names_file_path, learn_aliases=True)
+            resolver.load(conn)
+            assert normalize_school_name(" (10) Florida State*, ") == "Florida State"
+            assert resolver.lookup("(10) Florida State") == ("Florida St.", ["Florida State", " Florida St"], "S00627")
+            assert resolver.lookup("(1) Florida St.") == ("Florida St.", ["Florida State", " Florida St"], "S00627")
+            assert resolver.lookup("Florida*") == ("Florida", [], "S00629")
+            assert not get_table_columns(conn, "school_aliases_learned"), "An exact match after normalizing was learned"
+
+            # A fuzzy match is learned without its ranking prefix
+            assert resolver.lookup("(3) Misissippi St") == ("Mississippi St.", ["Mississippi State"], "S01134")
+            learned = query_db(conn, 'SELECT "Alias" FROM school_aliases_learned')
+            assert learned == {"Alias": ["misissippi st"]}, f"Unexpected learned aliases {learned}"
+
+            # Resolvers do not learn unless asked to
+            quiet = SchoolNameResolver(names_file_path)
+            quiet.load(conn)
+            assert quiet.lookup("(7) Missisippi St") is not None
+            assert query_db(conn, 'SELECT "Alias" FROM school_aliases_learned') == learned, "A resolver learned by default"
+            print("✓ Test passed: rank-prefixed names resolve without learning aliases")
+        finally:
+            conn.close()
+
+SCHEDULE_CSV = """Rk,Wk,Date,Time,Day,Winner,Pts,,Loser,Pts,Notes
+1,1,Aug 24 2024,12:00 PM,Sat,Georgia Tech,24,N,(10) Florida State,21,
+2,1,Aug 31 2024,7:30 PM,Sat,(1) Georgia,34,N,Clemson,3,
+3,2,Sep 7 2024,3:30 PM,Sat,Nowhere Tech,20,,Florida,17,
+4,16,Jan 1 2025,5:00 PM,Wed,(5) Georgia,39,N,(4) Florida State,31,Peach Bowl
+"""
+
+def _import_test_resolver(directory):
+    conn = _build_schools_db([
+        ("S00627", "Florida St.", "Florida State, Florida St, "),
+        ("S00629", "Florida", None),
+        ("S00677", "Georgia", None),
+        ("S00680", "Georgia Tech", None),
+        ("S00397", "Clemson", None),
+    ])
+    names_file_path = os.path.join(directory, "names.txt")
+    with open(names_file_path, "w", encoding="utf-8") as f:
+        f.write("")
+    resolver = SchoolNameResolver(names_file_path, learn_aliases=False)
+    resolver.load(conn)
+    return conn, resolver
+
+def _prepare_schedule_row_by_row(schedule, resolver):
+    # The row-by-row loop prepare_schedule_from_csv replaced, with values cast to the typed schedule columns
+    rows = []
+    for _, row in schedule.iterrows():
+        Winner = row["Winner"]
+        Loser = row["Loser"]
+        if Winner[0] == "(":
+            Winner = Winner[Winner.find(")") + 2:]
+        if Loser[0] == "(":
+            Loser = Loser[Loser.find(")") + 2:]
+        winner_information = resolver.lookup(Winner)
+        loser_information = resolver.lookup(Loser)
+        date_parts = row["Date"].split(" ")
+        rows.append([
+            Winner, Loser, row["Pts"], row["Pts.1"], row["Unnamed: 7"], row["Date"], row["Time"], int(date_parts[1]), row["Wk"],
+            int(date_parts[2]), month_number_from_month_abbreviation(date_parts[0]),
+            None if winner_information is None else winner_information[2], None if loser_information is None else loser_information[2],
+        ])
+    return rows
+
+def test_prepare_schedule_from_csv_matches_row_by_row():
+    import pandas as pd
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn, resolver = _import_test_resolver(directory)
+        csv_path = os.path.join(directory, "schedule.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write(SCHEDULE_CSV)
+        try:
+            schedule = pd.read_csv(csv_path)
+            prepared = prepare_schedule_from_csv(schedule, resolver)
+            assert list(prepared.columns) == SCHEDULE_COLUMNS, f"Unexpected columns {list(prepared.columns)}"
+            # NaN and None both mean a missing value, as bulk inserts store either as NULL
+            rows = [[None if pd.isna(value) else value for value in row] for row in prepared.itertuples(index=False)]
+            expected = [[None if pd.isna(value) else value for value in row] for row in _prepare_schedule_row_by_row(schedule, resolver)]
+            assert rows == expected, f"Expected {expected}, but got {rows}"
+            assert [row[0] for row in rows] == ["Georgia Tech", "Georgia", "Nowhere Tech", "Georgia"], "Rank prefixes were not stripped"
+            assert [(row[9], row[10], row[7]) for row in rows] == [(2024, 8, 24), (2024, 8, 31), (2024, 9, 7), (2025, 1, 1)], "Dates were not split"
+            assert rows[2][11] is None and rows[2][12] == "S00629", "An unresolved team did not get a None ID"
+        finally:
+            conn.close()
+    print("✓ Test passed: CSV preparation matches the row-by-row import")
+
+def test_update_schedule_with_ID_information_imports_the_csv():
+    with tempfile.TemporaryDirectory() as directory:
+        conn, resolver = _import_test_resolver(directory)
+        csv_path = os.path.join(directory, "schedule.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write(SCHEDULE_CSV)
+        try:
+            assert update_schedule_with_ID_information(csv_path, conn, resolver) == (4, 0, 0)
+            games = conn.execute('SELECT Winner, Loser, "Winner ID", "Loser ID", "Season", Location FROM schedule ORDER BY ROWID').fetchall()
+            assert games == [
+                ("Georgia Tech", "Florida State", "S00680", "S00627", 2024, "N"),
+                ("Georgia", "Clemson", "S00677", "S00397", 2024, "N"),
+                ("Nowhere Tech", "Florida", None, "S00629", 2024, None),
+                ("Georgia", "Florida State", "S00677", "S00627", 2024, "N"),
+            ], f"Unexpected games {games}"
+
+            # Importing the CSV again updates the stored games instead of adding them twice
+            assert update_schedule_with_ID_information(csv_path, conn, resolver) == (0, 0, 4), "A repeated import wrote games"
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.write(SCHEDULE_CSV.replace("Clemson,3,", "Clemson,7,"))
+            assert update_schedule_with_ID_information(csv_path, conn, resolver) == (0, 1, 3), "A corrected score was not updated"
+            assert get_length_of_table(conn, "schedule") == 4, "The import added duplicate games"
+            assert conn.execute('SELECT "Loser Points" FROM schedule WHERE Loser = \'Clemson\'').fetchone() == (7,), "The corrected score was not stored"
+        finally:
+            conn.close()
+    print("✓ Test passed: the CSV import stores resolved IDs and NULL for unresolved teams, and can be repeated")
+
 def main():
     print("------------------------------------------------------------------------")
     print("TESTING STARTED")
@@ -155,6 +345,18 @@ def main():
     test_get_school_naming_information_indiana()
     test_get_school_naming_information_indiana_state()
     print("------------------------------------------------------------------------")
+    print("RESOLVER INDEX")
+    print("------------------------------------------------------------------------")
+    test_school_name_resolver_exact_and_alias_hits()
+    test_school_name_resolver_invalidate()
+    test_school_name_resolver_fuzzy_match_is_learned()
+    test_rank_prefixed_names_resolve_without_learning()
+    print("------------------------------------------------------------------------")
+    print("CSV IMPORT")
+    print("------------------------------------------------------------------------")
+    test_prepare_schedule_from_csv_matches_row_by_row()
+    test_update_schedule_with_ID_information_imports_the_csv()
+    print("------------------------------------------------------------------------")
 
     
 
@@ -0,0 +1,76 @@
+import sys
+import os
+import json
+import random
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scoring_policies import *
+from ranking_system import calculate_margin_of_victory_score, rank_games
+
+
+
+def test_default_policy_matches_scalar_buckets():
+    margins = np.arange(0, 130)
+    result = DEFAULT_POLICY(margins, np.zeros(len(margins))).tolist()
+    expected = [calculate_margin_of_victory_score(margin, 0) for margin in margins]
+    assert result == expected, f"Expected {expected}, but got {result}"
+    print("✓ Test passed: default policy matches the margin-of-victory buckets")
+
+def test_policy_types_and_location_weights():
+    capped = compile_policy({"type": "capped", "cap": 28, "scale": 0.5})
+    assert capped([10, 50], [0, 0]).tolist() == [5.0, 14.0], "Capped policy is wrong"
+    log = compile_policy({"type": "log"})
+    assert np.allclose(log([7], [0]), np.log(8)), "Log policy is wrong"
+    road = compile_policy({"type": "buckets", "location_weights": {"away": 2.0, "neutral": 1.5}})
+    result = road([7, 7, 7, 7], [0, 0, 0, 0], ["", "@", "N", None]).tolist()
+    assert result == [1.0, 2.0, 1.5, 1.0], f"Location weights are wrong: {result}"
+    try:
+        compile_policy({"type": "cubic"})
+        assert False, "An unknown policy type was accepted"
+    except ValueError:
+        pass
+    print("✓ Test passed: capped, log, and location-weighted policies")
+
+def test_evaluate_policies_matches_one_policy_at_a_time():
+    generator = random.Random(11)
+    teams = [f"Team {i}" for i in range(30)]
+    games = []
+    for _ in range(300):
+        Winning_Team, Losing_Team = generator.sample(teams, 2)
+        Losing_Team_Points = generator.randint(0, 40)
+        games.append((Winning_Team, Losing_Team, Losing_Team_Points + generator.randint(1, 70), Losing_Team_Points, generator.choice(["", "@", "N"])))
+    Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, Locations = zip(*games)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "policies.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"default": {"type": "buckets"}, "log": {"type": "log", "scale": 2}, "road": {"type": "capped", "cap": 21, "location_weights": {"away": 1.25}}}, f)
+        policies = load_policies(path)
+
+    result = evaluate_policies(policies, Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points, Locations)
+    expected_default = rank_games(Winning_Teams, Losing_Teams, Winning_Team_Points, Losing_Team_Points)
+    assert list(result["default"].items()) == list(expected_default.items()), "Default policy rankings differ from rank_games"
+    for name, policy in policies.items():
+        scores = policy(Winning_Team_Points, Losing_Team_Points, Locations)
+        expected = {}
+        for (Winning_Team, Losing_Team, *_), score in zip(games, scores):
+            expected[Winning_Team] = expected.get(Winning_Team, 0) + score
+            expected[Losing_Team] = expected.get(Losing_Team, 0) - score
+        assert all(abs(result[name][team] - expected[team]) < 1e-9 for team in expected), f"Batched rankings differ for {name}"
+    print("✓ Test passed: batched policy evaluation")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("SCORING POLICIES")
+    print("------------------------------------------------------------------------")
+    test_default_policy_matches_scalar_buckets()
+    test_policy_types_and_location_weights()
+    test_evaluate_policies_matches_one_policy_at_a_time()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
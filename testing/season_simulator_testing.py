@@ -0,0 +1,44 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from season_simulator import *
+
+
+
+PLAYED_GAMES = {
+    "Winner": ["Georgia", "Georgia", "Texas", "Alabama", "Texas", "Georgia"],
+    "Loser": ["Alabama", "Texas", "Alabama", "Vanderbilt", "Vanderbilt", "Vanderbilt"],
+    "Winner Points": [41, 30, 35, 42, 45, 38],
+    "Loser Points": [34, 15, 13, 10, 3, 7],
+}
+REMAINING_GAMES = [("Georgia", "Vanderbilt"), ("Texas", "Alabama"), ("Alabama", "Tennessee")]
+
+def test_simulation_is_deterministic_across_worker_counts():
+    one_worker = simulate_rankings(PLAYED_GAMES, REMAINING_GAMES, number_of_simulations=3000, batch_size=700, workers=1, seed=11)
+    two_workers = simulate_rankings(PLAYED_GAMES, REMAINING_GAMES, number_of_simulations=3000, batch_size=700, workers=2, seed=11)
+    assert one_worker.teams == two_workers.teams
+    assert np.array_equal(one_worker.rank_counts, two_workers.rank_counts), "Worker count changed the simulated ranks"
+    print("✓ Test passed: simulations are deterministic across worker counts")
+
+def test_rank_counts_cover_every_simulation():
+    simulation = simulate_rankings(PLAYED_GAMES, REMAINING_GAMES, number_of_simulations=1000, batch_size=300, workers=1)
+    assert simulation.number_of_simulations == 1000
+    assert (simulation.rank_counts.sum(axis=0) == 1000).all(), "Every rank should be taken once per simulation"
+    assert (simulation.rank_counts.sum(axis=1) == 1000).all(), "Every team should get one rank per simulation"
+    assert list(simulation.mean_ranks())[0] == "Georgia"
+    print("✓ Test passed: rank counts cover every simulation")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("SEASON SIMULATOR")
+    print("------------------------------------------------------------------------")
+    test_simulation_is_deterministic_across_worker_counts()
+    test_rank_counts_cover_every_simulation()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
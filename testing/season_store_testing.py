@@ -0,0 +1,117 @@
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from season_store import *
+from ranking_system import rank_games
+
+
+
+def _schedule_db():
+    conn = sqlite3.connect(":memory:")
+    create_schedule_table(conn)
+    games = [
+        ("Georgia", "Clemson", 34, 3, "", 1, 2024, 8, "31", "S00677", "S00397"),
+        ("Texas", "Michigan", 31, 12, "@", 2, 2024, 9, "7", "S01583", "S01092"),
+        ("Georgia", "Texas", 22, 19, "N", 15, 2025, 1, "1", "S00677", "S01583"),
+        ("Utah", "Nobody Tech", 40, 0, "", 1, 2023, 9, "2", "S01620", None),
+    ]
+    conn.executemany('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Location, Week, Year, Month, Day, "Winner ID", "Loser ID") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', games)
+    conn.commit()
+    return conn
+
+def test_schedule_version_changes_with_the_schedule():
+    conn = _schedule_db()
+    version = get_schedule_version(conn)
+    assert get_schedule_version(conn) == version, "Version changed without a schedule change"
+    conn.execute('UPDATE schedule SET "Winner Points" = 35 WHERE Winner = \'Georgia\' AND Week = 1')
+    conn.execute("DELETE FROM schedule WHERE Winner = 'Utah'")
+    conn.commit()
+    assert get_schedule_version(conn) == version + 2, "Update and delete were not tracked"
+    print("✓ Test passed: schedule version tracks changes")
+
+def test_store_round_trips_through_the_cache_file():
+    conn = _schedule_db()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "season_store.bin")
+        store = load_season_store(conn, path)
+        assert isinstance(store.columns["winner_id"], np.memmap), "Columns are not memory-mapped"
+        assert store.seasons == [2023, 2024], f"Unexpected seasons {store.seasons}"
+        season = store.season(2024)
+        assert season["winner_id"].tolist() == [677, 1583, 677], f"Unexpected winners {season['winner_id']}"
+        assert season["location"].tolist() == [0, 1, 2] and season["day"].tolist() == [31, 7, 1], "Location or day were not stored"
+        assert store.season(2023)["loser_id"].tolist() == [-1], "A missing ID is not -1"
+        assert store.season(2030)["season"].tolist() == [], "An unknown season is not empty"
+
+        assert load_season_store(conn, path).schedule_version == store.schedule_version, "The store was rebuilt without a change"
+        conn.execute('INSERT INTO schedule (Winner, Loser, "Winner Points", "Loser Points", Year, Month, "Winner ID", "Loser ID") VALUES (\'Clemson\', \'Texas\', 20, 10, 2024, 11, \'S00397\', \'S01583\')')
+        conn.commit()
+        rebuilt = load_season_store(conn, path)
+        assert rebuilt.schedule_version > store.schedule_version and rebuilt.number_of_games == 5, "The store was not rebuilt after a change"
+        del store, season, rebuilt
+    print("✓ Test passed: store round-trips through the memory-mapped file")
+
+class _FailingColumn:
+    def tobytes(self):
+        raise OSError("disk full")
+
+def test_concurrent_saves_use_their_own_temporary_files():
+    store = SeasonStore.from_connection(_schedule_db())
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "season_store.bin")
+        errors = []
+
+        def save():
+            try:
+                for _ in range(20):
+                    store.save(path)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, f"Concurrent saves failed: {errors}"
+        opened = SeasonStore.open(path)
+        assert opened is not None and opened.number_of_games == store.number_of_games, "The saved file is not a valid store"
+        del opened
+
+        failing = SeasonStore(dict(store.columns, loser_points=_FailingColumn()), store.schedule_version)
+        try:
+            failing.save(path)
+            assert False, "A failed save did not raise"
+        except OSError:
+            pass
+        assert os.listdir(directory) == ["season_store.bin"], f"Temporary files were left behind: {os.listdir(directory)}"
+    print("✓ Test passed: concurrent saves use their own temporary files")
+
+def test_rank_season_from_store_matches_rank_games():
+    conn = _schedule_db()
+    store = SeasonStore.from_connection(conn)
+    games = query_db(conn, 'SELECT "Winner ID", "Loser ID", "Winner Points", "Loser Points" FROM schedule WHERE Season = 2024')
+    expected = rank_games(games["Winner ID"], games["Loser ID"], games["Winner Points"], games["Loser Points"])
+    result = rank_season_from_store(store, 2024)
+    assert result == expected, f"Expected {expected}, but got {result}"
+    assert list(result.values()) == sorted(result.values(), reverse=True), "Rankings are not best first"
+    assert rank_season_from_store(store, 2023) == {}, "A game with an unresolved team was ranked"
+    print("✓ Test passed: store rankings match rank_games")
+
+def main():
+    print("------------------------------------------------------------------------")
+    print("TESTING STARTED")
+    print("------------------------------------------------------------------------")
+    print("SEASON STORE")
+    print("------------------------------------------------------------------------")
+    test_schedule_version_changes_with_the_schedule()
+    test_store_round_trips_through_the_cache_file()
+    test_concurrent_saves_use_their_own_temporary_files()
+    test_rank_season_from_store_matches_rank_games()
+    print("------------------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()